@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Compare per-file invocations with serial and parallel batch compiles."""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MAIN = ROOT / 'main.py'
+TARGET = ['-s', 'Darwin', '-a', 'arm64']
+
+
+def generate(directory: Path, files: int, terms: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    paths = []
+    for index in range(files):
+        path = directory / f'input{index:05}.c'
+        path.write_text(' '.join(
+            [str(rng.randrange(1000))] +
+            [f'{rng.choice("+-*/")} {rng.randrange(1, 1000)}' for _ in range(terms)]
+        ) + '\n')
+        paths.append(path)
+    return paths
+
+
+def run(*args) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, str(MAIN), *TARGET, *map(str, args)], check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--terms', type=int, default=1000)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[os.cpu_count()])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        paths = generate(directory, args.files, args.terms)
+        output = directory / 'out'
+        output.mkdir()
+
+        timings = [('per-file', sum(
+            run(path, '-o', output / f'{path.stem}.s')
+            for path in paths
+        ))]
+        pattern = directory / '*.c'
+        for jobs in [1] + args.jobs:
+            timings.append((
+                f'batch -j{jobs}',
+                run('--batch', pattern, '-j', jobs, '--output-dir', output),
+            ))
+
+    print(f'{"mode":<12} {"seconds":>8} {"files/s":>9} {"speedup":>8}')
+    for mode, seconds in timings:
+        print(
+            f'{mode:<12} {seconds:>8.2f} {args.files / seconds:>9.1f} '
+            f'{timings[0][1] / seconds:>7.2f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Measure what interning saves on inputs with repeated subexpressions."""
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from puroboros.context import Context  # noqa: E402
+from puroboros.expr import Parser  # noqa: E402
+from puroboros.gen import CodeGenerator  # noqa: E402
+from puroboros.scan import Scanner  # noqa: E402
+from puroboros.tree import (  # noqa: E402
+    ASTArena,
+    InterningArena,
+    InterningObjectTree,
+    ObjectTree,
+)
+
+SUBEXPRESSIONS = ['2 * 3', '4 / 2', '7 * 8 - 1', '9 - 1', '10 * 10 / 3']
+
+
+def generate(terms: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return ' + '.join(rng.choice(SUBEXPRESSIONS) for _ in range(terms))
+
+
+def parse(tree, source: str):
+    context = Context()
+    context.infile = StringIO(source)
+    node, _ = Parser(Scanner(context), tree).bin_expr()
+    return node
+
+
+def memory(tree_class, source: str) -> int:
+    gc.collect()
+    tracemalloc.start()
+    tree = tree_class()
+    node = parse(tree, source)  # noqa: F841
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def instructions(tree_class, source: str, ir: bool) -> int:
+    tree = tree_class()
+    node = parse(tree, source)
+    generator = CodeGenerator('Darwin', 'arm64', ir=ir)
+    generator.generate(node, tree)
+    return sum(
+        not line.startswith('.') and not line.endswith(':')
+        for line in generator.assembly.output.splitlines()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--terms', type=int, nargs='+', default=[10 ** 3, 10 ** 4])
+    args = parser.parse_args()
+
+    print(
+        f'{"terms":>8} {"objects [B]":>12} {"interned [B]":>13} '
+        f'{"arena [B]":>10} {"interned [B]":>13} {"direct":>8} {"interned":>9}'
+    )
+    for terms in args.terms:
+        source = generate(terms)
+        print(
+            f'{terms:>8} '
+            f'{memory(ObjectTree, source):>12} '
+            f'{memory(InterningObjectTree, source):>13} '
+            f'{memory(ASTArena, source):>10} '
+            f'{memory(InterningArena, source):>13} '
+            f'{instructions(ObjectTree, source, False):>8} '
+            f'{instructions(InterningObjectTree, source, True):>9}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Count ARM64 instructions before and after the peephole pass."""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from puroboros.context import Context  # noqa: E402
+from puroboros.exceptions import ParserError, ScannerError  # noqa: E402
+from puroboros.expr import Parser  # noqa: E402
+from puroboros.gen import CodeGenerator  # noqa: E402
+from puroboros.scan import Scanner  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure(path: Path) -> dict:
+    with open(path, 'rt') as infile:
+        context = Context()
+        context.infile = infile
+        node, _ = Parser(Scanner(context)).bin_expr()
+
+    generator = CodeGenerator('Darwin', 'arm64', peephole=True)
+    generator.generate(node)
+    return generator.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('files', type=Path, nargs='*')
+    args = parser.parse_args()
+
+    files = args.files or sorted((ROOT / 'tests_input').iterdir())
+    print(f'{"file":<12} {"before":>7} {"after":>7} {"saved":>6}')
+    for path in files:
+        try:
+            stats = measure(path)
+        except (ParserError, ScannerError) as error:
+            print(f'{path.name:<12} {error}')
+            continue
+        before = stats['instructions before peephole']
+        after = stats['instructions after peephole']
+        print(f'{path.name:<12} {before:>7} {after:>7} {before - after:>6}')
+
+
+if __name__ == '__main__':
+    main()
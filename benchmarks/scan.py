@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Compare the regex and NumPy scanner backends on generated inputs."""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from puroboros.context import Context  # noqa: E402
+from puroboros.npscan import NumpyScanner  # noqa: E402
+from puroboros.scan import Scanner  # noqa: E402
+
+
+def generate(size: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    parts = [str(rng.randrange(1000))]
+    length = len(parts[0])
+    while length < size:
+        part = f' {rng.choice("+-*/")} {rng.randrange(1000)}'
+        if rng.random() < 0.05:
+            part += '\n'
+        parts.append(part)
+        length += len(part)
+    return ''.join(parts).encode()
+
+
+def run(scanner_class, source: bytes) -> None:
+    context = Context()
+    context.buffer = source
+    for _ in scanner_class(context).tokens():
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--sizes',
+        type=int,
+        nargs='+',
+        default=[1 << 10, 1 << 14, 1 << 17, 1 << 20, 1 << 23],
+    )
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'{"bytes":>10} {"regex [s]":>10} {"numpy [s]":>10} {"speedup":>8}')
+    for size in args.sizes:
+        source = generate(size)
+        times = [
+            min(timeit.repeat(lambda: run(cls, source), number=1, repeat=args.repeat))
+            for cls in (Scanner, NumpyScanner)
+        ]
+        print(f'{size:>10} {times[0]:>10.4f} {times[1]:>10.4f} {times[0] / times[1]:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
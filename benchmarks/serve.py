@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Compare cold compiler invocations with requests to a warm server."""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from puroboros.client import Client  # noqa: E402
+
+TARGET = ['-s', 'Darwin', '-a', 'arm64']
+
+
+def timed(function, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--terms', type=int, default=100)
+    args = parser.parse_args()
+
+    source = ' + '.join(str(i) for i in range(args.terms))
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        path = directory / 'input.c'
+        path.write_text(source + '\n')
+        output = directory / 'output.s'
+        socket_path = str(directory / 'server.sock')
+
+        server = subprocess.Popen(
+            [sys.executable, str(ROOT / 'main.py'), 'serve', '--socket', socket_path],
+            stderr=subprocess.PIPE,
+        )
+        try:
+            # The server reports once it is listening.
+            server.stderr.readline()
+            cold = timed(lambda: subprocess.run(
+                [sys.executable, str(ROOT / 'main.py'), *TARGET, str(path), '-o', str(output)],
+                check=True,
+            ), args.repeat)
+            client = timed(lambda: subprocess.run(
+                [sys.executable, '-m', 'puroboros.client', '--socket', socket_path,
+                 *TARGET, str(path), '-o', str(output)],
+                check=True,
+                cwd=ROOT,
+            ), args.repeat)
+            with Client(socket_path) as connection:
+                warm = timed(
+                    lambda: connection.compile(source, system='Darwin', arch='arm64'),
+                    args.repeat,
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f'{"mode":<22} {"median [ms]":>12} {"p95 [ms]":>9}')
+    for mode, timings in [
+        ('cold main.py', cold),
+        ('client process', client),
+        ('persistent connection', warm),
+    ]:
+        p95 = sorted(timings)[int(0.95 * (len(timings) - 1))]
+        print(f'{mode:<22} {statistics.median(timings) * 1000:>12.2f} {p95 * 1000:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Compare the memory held by object and arena syntax trees."""
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from puroboros.context import Context  # noqa: E402
+from puroboros.expr import Parser  # noqa: E402
+from puroboros.scan import Scanner  # noqa: E402
+from puroboros.tree import ASTArena, ObjectTree  # noqa: E402
+
+
+def generate(terms: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = [str(rng.randrange(1000))]
+    for _ in range(terms - 1):
+        parts.append(f'{rng.choice("+-*/")} {rng.randrange(1000)}')
+    return ' '.join(parts)
+
+
+def measure(tree, source: str) -> int:
+    context = Context()
+    context.infile = StringIO(source)
+    parser = Parser(Scanner(context), tree)
+
+    gc.collect()
+    tracemalloc.start()
+    node, _ = parser.bin_expr()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--terms', type=int, nargs='+', default=[10 ** 3, 10 ** 5])
+    args = parser.parse_args()
+
+    print(f'{"nodes":>10} {"objects [B]":>12} {"arena [B]":>12} {"ratio":>6}')
+    for terms in args.terms:
+        source = generate(terms)
+        objects = measure(ObjectTree(), source)
+        arena = measure(ASTArena(), source)
+        print(f'{2 * terms - 1:>10} {objects:>12} {arena:>12} {objects / arena:>5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
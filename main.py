@@ -1,32 +1,283 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
+import glob
+import mmap
+import os
 import platform
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+from puroboros.cache import CompilationCache
+from puroboros.client import DEFAULT_SOCKET
 from puroboros.context import Context
+from puroboros.driver import ERRORS as COMPILE_ERRORS, compile_tree, new_tree
 from puroboros.expr import Parser
-from puroboros.gen import CodeGenerator
-from puroboros.scan import Scanner
+from puroboros.opt.manager import PassManager
+from puroboros.scan import ScannerFactory
 
+# Failures reported per file in batch mode.
+ERRORS = (OSError, *COMPILE_ERRORS)
+SUFFIXES = {'asm': '.s', 'obj': '.o', 'bin': '.bin'}
+
+
+def parse(args, tree):
+    context = Context()
+
+    if args.mmap:
+        with open(args.file, 'rb') as infile:
+            # Empty files cannot be mapped.
+            if not os.fstat(infile.fileno()).st_size:
+                context.buffer = b''
+                return Parser(ScannerFactory.create(context, args.scanner), tree).bin_expr()
+            # The map is unmapped once the last view of it (held by the
+            # scanner or by a traceback) is released.
+            context.buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+            return Parser(ScannerFactory.create(context, args.scanner), tree).bin_expr()
 
-def compile(args):
     with open(args.file, 'rt') as infile:
-        context = Context()
         context.infile = infile
-        scanner = Scanner(context)
-        parser = Parser(scanner)
-        node, _ = parser.bin_expr()
+        return Parser(ScannerFactory.create(context, args.scanner), tree).bin_expr()
+
+
+def compile(args) -> dict:
+    # --dump-ir needs the IR, which only a real compile produces.
+    if args.cache_dir is None or args.dump_ir:
+        return generate(args)
+
+    cache = CompilationCache(args.cache_dir, args.cache_size)
+    with open(args.file, 'rb') as infile:
+        key = CompilationCache.key(
+            infile,
+            system=args.system,
+            arch=args.arch,
+            optimize=args.optimize,
+            output_format=args.output_format,
+            rebalance=args.rebalance,
+            intern=args.intern,
+            ir=args.ir,
+            peephole=args.peephole,
+            schedule=args.schedule,
+        )
+    if (data := cache.get(key)) is not None:
+        # A hit skips scanning, parsing and code generation.
+        with open(args.output, 'wb') as outfile:
+            outfile.write(data)
+        return cache.stats()
+
+    stats = generate(args)
+    with open(args.output, 'rb') as infile:
+        cache.put(key, infile.read())
+    return {**stats, **cache.stats()}
+
+
+def generate(args) -> dict:
+    tree = new_tree(args.arena, args.intern)
+    node, _ = parse(args, tree)
+
+    # Output is streamed to the file as it is generated, so a failed
+    # compile removes what was written.
+    mode = 'wt' if args.output_format == 'asm' else 'wb'
+    outfile = open(args.output, mode)
+    try:
+        with outfile:
+            generator, stats = compile_tree(
+                tree,
+                node,
+                outfile,
+                args.system,
+                args.arch,
+                optimize=args.optimize,
+                output_format=args.output_format,
+                rebalance=args.rebalance,
+                intern=args.intern,
+                ir=args.ir or args.dump_ir,
+                peephole=args.peephole,
+                schedule=args.schedule,
+            )
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(args.output)
+        raise
+
+    if args.dump_ir:
+        print(generator.ir, file=sys.stderr)
+    return stats
+
+
+def report(stats: dict) -> None:
+    for name, value in stats.items():
+        print(f'{name}: {value}', file=sys.stderr)
+
+
+def expand(patterns, manifest=None) -> list:
+    patterns = list(patterns)
+    if manifest is not None:
+        # One path or pattern per line, relative to the manifest.
+        root = os.path.dirname(manifest)
+        with open(manifest, 'rt') as infile:
+            for line in infile:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    patterns.append(os.path.join(root, line))
+
+    paths = []
+    for pattern in patterns:
+        # A pattern without matches is kept, so it fails as a file.
+        matches = sorted(glob.glob(pattern, recursive=True))
+        paths.extend(matches or [pattern])
+    return list(dict.fromkeys(paths))
+
+
+def output_path(path: str, args) -> str:
+    output = os.path.splitext(path)[0] + SUFFIXES[args.output_format]
+    if args.output_dir is not None:
+        output = os.path.join(args.output_dir, os.path.basename(output))
+    return output
+
 
-    generator = CodeGenerator(args.system, args.arch)
-    generator.generate(node)
+def compile_one(args) -> tuple:
+    try:
+        stats = compile(args)
+    except ERRORS as error:
+        return args.file, f'{type(error).__name__}: {error}', {}
+    return args.file, None, stats
 
-    with open(args.output, 'wt') as outfile:
-        outfile.write(generator.assembly.output)
+
+def batch(args) -> int:
+    paths = expand(args.file, args.manifest)
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+    # Each file is compiled from scratch, with its own Context and
+    # CodeGenerator, wherever it runs.
+    jobs = [
+        argparse.Namespace(**{
+            **vars(args),
+            'file': path,
+            'output': output_path(path, args),
+        })
+        for path in paths
+    ]
+    # Inputs that would write the same output all fail rather than
+    # overwrite one another in whatever order the workers finish; so
+    # does one whose output is an input, such as x.s compiled to asm.
+    outputs = {}
+    for job in jobs:
+        outputs.setdefault(os.path.abspath(job.output), []).append(job.file)
+    sources = {os.path.abspath(path) for path in paths}
+    collisions = []
+    for output, inputs in outputs.items():
+        if len(inputs) > 1:
+            error = f'{len(inputs)} inputs would write {output}'
+            collisions += [(path, error, {}) for path in inputs]
+        elif output in sources:
+            collisions.append((inputs[0], f'Output {output} would overwrite an input', {}))
+    colliding = {path for path, _, _ in collisions}
+    jobs = [job for job in jobs if job.file not in colliding]
+
+    start = time.perf_counter()
+    workers = os.cpu_count() if args.jobs is None else args.jobs
+    if workers == 1:
+        results = list(map(compile_one, jobs))
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            # Several files per task amortize the pickling round trips.
+            chunksize = max(1, len(jobs) // (workers * 4))
+            results = list(executor.map(compile_one, jobs, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+    results += collisions
+
+    failed = 0
+    # Per-file cache counters add up; other per-file stats do not.
+    cache = {}
+    for path, error, stats in results:
+        if error is not None:
+            print(f'{path}: {error}', file=sys.stderr)
+            failed += 1
+        for name, value in stats.items():
+            if name.startswith('cache '):
+                cache[name] = cache.get(name, 0) + value
+
+    if args.stats:
+        report({
+            'files compiled': len(results) - failed,
+            'files failed': failed,
+            'workers': workers,
+            'elapsed seconds': f'{elapsed:.3f}',
+            'files per second': f'{len(results) / elapsed:.1f}' if elapsed else 'inf',
+            **cache,
+        })
+    return failed
+
+
+def serve(argv) -> None:
+    parser = argparse.ArgumentParser(
+        prog='main.py serve',
+        description='Serve compile requests over a Unix socket',
+    )
+    parser.add_argument('--socket', type=str, help='socket path', default=DEFAULT_SOCKET)
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        help='worker processes for concurrent compiles',
+        default=1,
+    )
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+
+    # Imported here so that one-off compiles do not pay for asyncio.
+    import asyncio
+    from puroboros.server import CompileServer
+
+    server = CompileServer(args.socket, args.jobs)
+    # Stop on SIGTERM the way Ctrl-C does, which removes the socket.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(server.serve(
+            lambda: print(f'listening on {args.socket}', file=sys.stderr),
+        ))
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['serve']:
+        serve(sys.argv[2:])
+        sys.exit()
+
     parser = argparse.ArgumentParser(description='Puroboros C compiler')
-    parser.add_argument('file', type=str, help='input path')
+    parser.add_argument(
+        'file',
+        type=str,
+        nargs='*',
+        help='input path, or paths and glob patterns with --batch',
+    )
     parser.add_argument('-o', '--output', type=str, help='output path', default='a.out')
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='compile every input to its own output file',
+    )
+    parser.add_argument(
+        '--manifest',
+        type=str,
+        help='file listing batch inputs, one path or pattern per line (implies --batch)',
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        help='batch worker processes (default: one per CPU)',
+    )
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        help='directory for batch outputs (default: next to each input)',
+    )
     parser.add_argument(
         '-s',
         '--system',
@@ -37,6 +288,95 @@ if __name__ == '__main__':
     parser.add_argument(
         '-a', '--arch', type=str, help='architecture type', default=platform.machine()
     )
+    parser.add_argument(
+        '-O',
+        dest='optimize',
+        type=int,
+        choices=sorted(PassManager.LEVELS),
+        help='optimization level',
+        default=0,
+    )
+    parser.add_argument(
+        '-f',
+        '--format',
+        dest='output_format',
+        type=str,
+        choices=['asm', 'obj', 'bin'],
+        help='output assembly, an object file or raw machine code',
+        default='asm',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        help='reuse outputs of identical compiles stored in this directory',
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        help='cache size bound in bytes; least recently used entries go first',
+        default=1 << 30,
+    )
+    parser.add_argument(
+        '--mmap',
+        action='store_true',
+        help='memory-map the input and scan it as bytes',
+    )
+    parser.add_argument(
+        '--scanner',
+        type=str,
+        choices=['auto', 'python', 'numpy'],
+        help='scanner backend',
+        default='auto',
+    )
+    parser.add_argument(
+        '--peephole',
+        action='store_true',
+        help='run the peephole pass over the generated assembly (on at -O1)',
+    )
+    parser.add_argument(
+        '--schedule',
+        action='store_true',
+        help='reorder instructions to hide latencies (on at -O1)',
+    )
+    parser.add_argument(
+        '--arena',
+        action='store_true',
+        help='store the syntax tree in compact parallel arrays',
+    )
+    parser.add_argument(
+        '--rebalance',
+        action='store_true',
+        help='rebalance chains of + and * to shorten dependency chains',
+    )
+    parser.add_argument(
+        '--intern',
+        action='store_true',
+        help='share structurally identical subtrees (implies --ir)',
+    )
+    parser.add_argument(
+        '--ir',
+        action='store_true',
+        help='generate code through the three-address IR',
+    )
+    parser.add_argument(
+        '--dump-ir',
+        action='store_true',
+        help='print the optimized IR to stderr (implies --ir)',
+    )
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='print code generation statistics to stderr',
+    )
     args = parser.parse_args()
 
-    compile(args)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if args.batch or args.manifest is not None:
+        sys.exit(1 if batch(args) else 0)
+    if len(args.file) != 1:
+        parser.error('exactly one input file is required without --batch')
+    args.file = args.file[0]
+    stats = compile(args)
+    if args.stats:
+        report(stats)
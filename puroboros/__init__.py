@@ -0,0 +1,3 @@
+# Part of every compilation cache key; bump it whenever the generated
+# code changes for the same input.
+__version__ = '0.1.0'
@@ -1,20 +1,78 @@
 from abc import ABCMeta, abstractmethod
-from io import StringIO
 
+from puroboros.asm.frame import StackFrame
+from puroboros.asm.instruction import Instruction
 from puroboros.asm.register import Register, RegisterManager, RegisterMeta
+from puroboros.asm.writer import TextWriter
+from puroboros.exceptions import CodeGenerationError
 
 
-AssemblyMeta = type('AssemblyMeta', (ABCMeta, RegisterMeta), {})
+class AssemblyMeta(ABCMeta, RegisterMeta):
+    def __new__(cls, name, bases, attrs, **kwargs):
+        new_class = super().__new__(cls, name, bases, attrs, **kwargs)
+        meta = getattr(new_class, 'Meta', None)
+        new_class._meta.update({
+            'peephole': getattr(meta, 'peephole', None),
+            'scheduler': getattr(meta, 'scheduler', None),
+            'formats': getattr(meta, 'formats', {}),
+        })
+        return new_class
 
 
 class AssemblyBase(metaclass=AssemblyMeta):
-    def __init__(self) -> None:
+    # Pending instructions are written out once this many accumulate.
+    FLUSH_THRESHOLD = 1 << 12
+
+    def __init__(self, sink=None, output_format='asm') -> None:
         self.registers = RegisterManager(self._meta['registers'])
-        self.outstream = StringIO()
+        self.frame = StackFrame()
+        self.instructions = []
+        self.optimizers = []
+        self.sink = None if sink is None else self._writer(output_format)(sink)
+
+    def _writer(self, output_format: str):
+        if output_format == 'asm':
+            return TextWriter
+        if (writer := self._meta['formats'].get(output_format)) is None:
+            msg = f'Unsupported output format {output_format}'
+            raise CodeGenerationError(msg)
+        return writer
 
     @property
     def output(self) -> str:
-        return self.outstream.getvalue()
+        # The whole program without a sink; with one, what is not yet
+        # flushed to it.
+        if not self.instructions:
+            return ''
+        return '\n'.join(map(str, self.instructions)) + '\n'
+
+    def emit(self, opcode: str, *operands) -> None:
+        self.instructions.append(Instruction(opcode, *map(str, operands)))
+        if self.sink is not None and len(self.instructions) >= self.FLUSH_THRESHOLD:
+            self.flush()
+
+    def set_passes(self, *passes: str) -> None:
+        self.optimizers = [
+            self._meta[name]()
+            for name in passes
+            if self._meta.get(name) is not None
+        ]
+
+    def flush(self, final: bool = False) -> None:
+        for optimizer in self.optimizers:
+            self.instructions = optimizer.run(self.instructions, final)
+        if self.sink is None:
+            return
+        self.sink.write(self.instructions)
+        self.instructions = []
+        if final:
+            self.sink.flush()
+
+    def optimizer_stats(self) -> dict:
+        stats = {}
+        for optimizer in self.optimizers:
+            stats.update(optimizer.stats())
+        return stats
 
 
 class Assembly(AssemblyBase):
@@ -37,3 +95,34 @@ class Assembly(AssemblyBase):
     @abstractmethod
     def div(self, r1: Register, r2: Register) -> Register:
         pass
+
+    @abstractmethod
+    def copy(self, register: Register) -> Register:
+        pass
+
+    def accepts_immediate(self, operation: str, value: int) -> bool:
+        return False
+
+    @abstractmethod
+    def add_immediate(self, r1: Register, value: int) -> Register:
+        pass
+
+    @abstractmethod
+    def sub_immediate(self, r1: Register, value: int) -> Register:
+        pass
+
+    @abstractmethod
+    def mul_immediate(self, r1: Register, value: int) -> Register:
+        pass
+
+    @abstractmethod
+    def div_immediate(self, r1: Register, value: int) -> Register:
+        pass
+
+    @abstractmethod
+    def spill(self, register: Register) -> int:
+        pass
+
+    @abstractmethod
+    def reload(self, slot: int) -> Register:
+        pass
@@ -1,53 +1,172 @@
-from io import StringIO
-
 from puroboros.asm.base import Assembly
+from puroboros.asm.darwin.immediate import add_immediate, move_wide
+from puroboros.asm.darwin.peephole import Peephole
+from puroboros.asm.darwin.schedule import Scheduler
+from puroboros.asm.darwin.writer import MachOWriter, RawWriter
+from puroboros.asm.magic import signed_magic
 from puroboros.asm.register import Register
+from puroboros.exceptions import CodeGenerationError
+from puroboros.opt.fold import wrap
 
 
 class DarwinARM64(Assembly):
     class Meta:
         registers = ['x8', 'x9', 'x10', 'x11']
+        peephole = Peephole
+        scheduler = Scheduler
+        formats = {'obj': MachOWriter, 'bin': RawWriter}
 
     def preamble(self) -> None:
-        self.outstream.writelines([
-            '.global _start\n',
-            '.align 4\n',
-            '_start:\n',
-        ])
+        self.emit('.global', '_start')
+        self.emit('.align', '4')
+        self.emit('_start:')
 
     def postamble(self) -> None:
-        self.outstream.writelines([
-            'mov x0, #0\n',
-            'mov x16, #1\n',
-            'svc #0x80\n',
-        ])
+        # add takes a 12-bit immediate, optionally shifted left by 12.
+        high, low = divmod(self.frame.size, 4096)
+        if high:
+            self.emit('add', 'sp', 'sp', f'#{high}', 'lsl #12')
+        if low:
+            self.emit('add', 'sp', 'sp', f'#{low}')
+        self.emit('mov', 'x0', '#0')
+        self.emit('mov', 'x16', '#1')
+        self.emit('svc', '#0x80')
 
     def load(self, value: int) -> Register:
         r = self.registers.allocate()
-        code = f'mov {r}, #{value}\n'
-        self.outstream.write(code)
+        # A single movz or movn covers 16 bits; wider values are patched
+        # together with movk.
+        if -(1 << 16) <= value < 1 << 16:
+            self.emit('mov', r, f'#{value}')
+        else:
+            self._move_wide(r, value)
+        return r
+
+    def copy(self, register: Register) -> Register:
+        r = self.registers.allocate()
+        self.emit('mov', r, register)
         return r
 
     def add(self, r1: Register, r2: Register) -> Register:
-        code = f'add {r1}, {r1}, {r2}\n'
-        self.outstream.write(code)
+        self.emit('add', r1, r1, r2)
         self.registers.free(r2)
         return r1
 
     def sub(self, r1: Register, r2: Register) -> Register:
-        code = f'sub {r1}, {r1}, {r2}\n'
-        self.outstream.write(code)
+        self.emit('sub', r1, r1, r2)
         self.registers.free(r2)
         return r1
 
     def mul(self, r1: Register, r2: Register) -> Register:
-        code = f'mul {r1}, {r1}, {r2}\n'
-        self.outstream.write(code)
+        self.emit('mul', r1, r1, r2)
         self.registers.free(r2)
         return r1
 
     def div(self, r1: Register, r2: Register) -> Register:
-        code = f'sdiv {r1}, {r1}, {r2}\n'
-        self.outstream.writelines(code)
+        self.emit('sdiv', r1, r1, r2)
         self.registers.free(r2)
         return r1
+
+    def accepts_immediate(self, operation: str, value: int) -> bool:
+        # Registers hold 64 bits, so a literal is used as it wraps.
+        value = wrap(value)
+        match operation:
+            case 'add' | 'sub':
+                return add_immediate(abs(value)) is not None
+            case 'mul':
+                return value == 0 or self._power_of_two(abs(value))
+            case 'div':
+                return value != 0
+        return False
+
+    def add_immediate(self, r1: Register, value: int) -> Register:
+        value = wrap(value)
+        opcode = 'add' if value >= 0 else 'sub'
+        self.emit(opcode, r1, r1, *self._immediate('add', value))
+        return r1
+
+    def sub_immediate(self, r1: Register, value: int) -> Register:
+        value = wrap(value)
+        opcode = 'sub' if value >= 0 else 'add'
+        self.emit(opcode, r1, r1, *self._immediate('sub', value))
+        return r1
+
+    def mul_immediate(self, r1: Register, value: int) -> Register:
+        value = wrap(value)
+        self._immediate('mul', value)
+        if value == 0:
+            self.emit('mov', r1, '#0')
+            return r1
+        if shift := abs(value).bit_length() - 1:
+            self.emit('lsl', r1, r1, f'#{shift}')
+        if value < 0:
+            self.emit('neg', r1, r1)
+        return r1
+
+    def div_immediate(self, r1: Register, value: int) -> Register:
+        value = wrap(value)
+        self._immediate('div', value)
+        # x16 and x17 are the intra-procedure-call scratch registers.
+        if abs(value) == 1:
+            pass
+        elif self._power_of_two(abs(value)):
+            # Bias negative dividends by 2**k - 1 so the shift rounds
+            # toward zero, as C division does.
+            shift = abs(value).bit_length() - 1
+            self.emit('asr', 'x16', r1, '#63')
+            self.emit('add', 'x16', r1, 'x16', f'lsr #{64 - shift}')
+            self.emit('asr', r1, 'x16', f'#{shift}')
+        else:
+            magic, shift = signed_magic(value)
+            self._move_wide('x16', magic)
+            self.emit('smulh', 'x16', r1, 'x16')
+            if value > 0 and magic < 0:
+                self.emit('add', 'x16', 'x16', r1)
+            elif value < 0 and magic > 0:
+                self.emit('sub', 'x16', 'x16', r1)
+            if shift:
+                self.emit('asr', 'x16', 'x16', f'#{shift}')
+            self.emit('add', r1, 'x16', 'x16', 'lsr #63')
+            return r1
+        if value < 0:
+            self.emit('neg', r1, r1)
+        return r1
+
+    def _immediate(self, operation: str, value: int) -> tuple:
+        if not self.accepts_immediate(operation, value):
+            msg = f'No {operation} immediate form for {value}'
+            raise CodeGenerationError(msg)
+        return add_immediate(abs(value)) or ()
+
+    def _move_wide(self, register, value: int) -> None:
+        for opcode, *operands in move_wide(value):
+            self.emit(opcode, register, *operands)
+
+    @staticmethod
+    def _power_of_two(value: int) -> bool:
+        return value > 0 and value & value - 1 == 0
+
+    def spill(self, register: Register) -> int:
+        slot = self.frame.allocate()
+        if size := self.frame.grow():
+            self.emit('sub', 'sp', 'sp', f'#{size}')
+        self.emit('str', register, self._slot_address(slot))
+        self.registers.free(register)
+        return slot
+
+    def reload(self, slot: int) -> Register:
+        r = self.registers.allocate()
+        self.emit('ldr', r, self._slot_address(slot))
+        self.frame.release(slot)
+        return r
+
+    def _slot_address(self, slot: int) -> str:
+        offset = self.frame.offset(slot)
+        # ldr/str take an unsigned 12-bit offset scaled by 8.
+        if offset < 4096 * 8:
+            return f'[sp, #{offset}]'
+        if offset < 1 << 16:
+            self.emit('mov', 'x17', f'#{offset}')
+            return '[sp, x17]'
+        msg = 'Stack frame too large'
+        raise CodeGenerationError(msg)
@@ -0,0 +1,35 @@
+import re
+from typing import Optional
+
+from puroboros.asm.instruction import Instruction
+
+
+REGISTER = re.compile(r'\b(?:x\d+|w\d+|sp|xzr)\b')
+# svc reads the syscall number and its arguments.
+SYSCALL_REGISTERS = frozenset(['x0', 'x1', 'x2', 'x3', 'x4', 'x5', 'x6', 'x7', 'x16'])
+WRITE_FIRST = frozenset([
+    'mov', 'movz', 'movn', 'add', 'sub', 'mul', 'sdiv', 'smulh',
+    'lsl', 'lsr', 'asr', 'neg', 'ldr',
+])
+
+
+def access(instruction: Instruction) -> Optional[tuple]:
+    # Registers read and written, or None for an instruction that is not
+    # understood and must stay where it is.
+    if instruction.directive:
+        return frozenset(), frozenset()
+
+    registers = [
+        set(REGISTER.findall(operand))
+        for operand in instruction.operands
+    ]
+    match instruction.opcode:
+        case 'svc':
+            return SYSCALL_REGISTERS, frozenset()
+        case 'str':
+            return set().union(*registers), frozenset()
+        case 'movk':
+            return registers[0], registers[0]
+        case opcode if opcode in WRITE_FIRST and registers:
+            return set().union(*registers[1:]), registers[0]
+    return None
@@ -0,0 +1,186 @@
+import re
+
+from puroboros.asm.darwin.immediate import parse_immediate
+from puroboros.asm.instruction import Instruction
+from puroboros.exceptions import CodeGenerationError
+
+
+NOP = 0xd503201f
+SHIFTS = {'lsl': 0, 'lsr': 1, 'asr': 2}
+ADDRESS = re.compile(r'\[\s*(\w+)\s*(?:,\s*(#?\w+)\s*)?\]')
+
+# Base words of the 64-bit forms, with all register and immediate
+# fields cleared.
+MOVE_WIDE = {'movn': 0x92800000, 'movz': 0xd2800000, 'movk': 0xf2800000}
+ADD_IMMEDIATE = {'add': 0x91000000, 'sub': 0xd1000000}
+ADD_REGISTER = {'add': 0x8b000000, 'sub': 0xcb000000}
+DATA_PROCESSING = {
+    'mul': 0x9b007c00,
+    'smulh': 0x9b407c00,
+    'sdiv': 0x9ac00c00,
+    'lsl': 0x9ac02000,
+    'lsr': 0x9ac02400,
+    'asr': 0x9ac02800,
+}
+LOAD_STORE = {'ldr': 0xf9400000, 'str': 0xf9000000}
+LOAD_STORE_REGISTER = {'ldr': 0xf8606800, 'str': 0xf8206800}
+
+
+def register(operand: str, sp: bool = False) -> int:
+    # Number 31 is sp or xzr depending on the instruction.
+    if operand == ('sp' if sp else 'xzr'):
+        return 31
+    if operand.startswith('x') and operand[1:].isdigit() and int(operand[1:]) < 31:
+        return int(operand[1:])
+    msg = f'Invalid register {operand}'
+    raise CodeGenerationError(msg)
+
+
+def immediate(operand: str, bits: int, signed: bool = False) -> int:
+    value = parse_immediate(operand)
+    low = -(1 << bits - 1) if signed else 0
+    high = (1 << bits - 1) if signed else 1 << bits
+    if value is None or not low <= value < high:
+        msg = f'Invalid {bits}-bit immediate {operand}'
+        raise CodeGenerationError(msg)
+    return value
+
+
+def shift(operand: str) -> tuple:
+    kind, _, amount = operand.partition(' ')
+    if kind not in SHIFTS:
+        msg = f'Invalid shift {operand}'
+        raise CodeGenerationError(msg)
+    return SHIFTS[kind], immediate(amount, 6)
+
+
+def encode(instruction: Instruction) -> int:
+    opcode, operands = instruction.opcode, instruction.operands
+    match opcode, operands:
+        case 'mov', (target, source) if source.startswith('#'):
+            return _move_immediate(target, source)
+        case 'mov', (target, source) if 'sp' in (target, source):
+            return ADD_IMMEDIATE['add'] | register(source, sp=True) << 5 | register(target, sp=True)
+        case 'mov', (target, source):
+            return 0xaa0003e0 | register(source) << 16 | register(target)
+        case ('movz' | 'movn' | 'movk'), (target, value, *rest):
+            hw = 0
+            if rest:
+                kind, amount = shift(rest[0])
+                if kind != SHIFTS['lsl'] or amount % 16:
+                    msg = f'Invalid shift {rest[0]}'
+                    raise CodeGenerationError(msg)
+                hw = amount // 16
+            return MOVE_WIDE[opcode] | hw << 21 | immediate(value, 16) << 5 | register(target)
+        case ('add' | 'sub'), (target, source, value, *rest) if value.startswith('#'):
+            sh = 0
+            if rest:
+                if rest != ['lsl #12']:
+                    msg = f'Invalid shift {rest[0]}'
+                    raise CodeGenerationError(msg)
+                sh = 1
+            return (
+                ADD_IMMEDIATE[opcode] | sh << 22 | immediate(value, 12) << 10 |
+                register(source, sp=True) << 5 | register(target, sp=True)
+            )
+        case ('add' | 'sub'), (target, source, other, *rest):
+            kind, amount = shift(rest[0]) if rest else (0, 0)
+            return (
+                ADD_REGISTER[opcode] | kind << 22 | register(other) << 16 |
+                amount << 10 | register(source) << 5 | register(target)
+            )
+        case 'neg', (target, source):
+            return ADD_REGISTER['sub'] | register(source) << 16 | 31 << 5 | register(target)
+        case ('lsl' | 'lsr' | 'asr'), (target, source, value) if value.startswith('#'):
+            return _shift_immediate(opcode, target, source, immediate(value, 6))
+        case ('mul' | 'smulh' | 'sdiv' | 'lsl' | 'lsr' | 'asr'), (target, left, right):
+            return (
+                DATA_PROCESSING[opcode] | register(right) << 16 |
+                register(left) << 5 | register(target)
+            )
+        case ('ldr' | 'str'), (target, address):
+            return _load_store(opcode, target, address)
+        case 'svc', (value,):
+            return 0xd4000001 | immediate(value, 16) << 5
+    msg = f'Cannot encode {instruction}'
+    raise CodeGenerationError(msg)
+
+
+def _move_immediate(target: str, operand: str) -> int:
+    # The mov alias picks movz or movn, whichever holds the value.
+    value = parse_immediate(operand)
+    if value is None:
+        msg = f'Invalid immediate {operand}'
+        raise CodeGenerationError(msg)
+    for opcode, candidate in (('movz', value), ('movn', ~value)):
+        candidate &= (1 << 64) - 1
+        for hw in range(4):
+            if candidate & ~(0xffff << 16 * hw) == 0:
+                halfword = candidate >> 16 * hw
+                return MOVE_WIDE[opcode] | hw << 21 | halfword << 5 | register(target)
+    msg = f'Immediate {operand} does not fit a single mov'
+    raise CodeGenerationError(msg)
+
+
+def _shift_immediate(opcode: str, target: str, source: str, amount: int) -> int:
+    # Shifts by a constant are aliases of the bitfield moves.
+    match opcode:
+        case 'lsl':
+            word, immr, imms = 0xd3400000, -amount % 64, 63 - amount
+        case 'lsr':
+            word, immr, imms = 0xd3400000, amount, 63
+        case _:
+            word, immr, imms = 0x93400000, amount, 63
+    return word | immr << 16 | imms << 10 | register(source) << 5 | register(target)
+
+
+def _load_store(opcode: str, target: str, address: str) -> int:
+    if (match := ADDRESS.fullmatch(address)) is None:
+        msg = f'Invalid address {address}'
+        raise CodeGenerationError(msg)
+    base, offset = match.groups()
+    base = register(base, sp=True)
+    if offset is None or offset.startswith('#'):
+        # The unsigned offset is scaled by the access size.
+        value = immediate(offset, 15) if offset else 0
+        if value % 8:
+            msg = f'Unaligned offset in {address}'
+            raise CodeGenerationError(msg)
+        return LOAD_STORE[opcode] | value // 8 << 10 | base << 5 | register(target)
+    return LOAD_STORE_REGISTER[opcode] | register(offset) << 16 | base << 5 | register(target)
+
+
+class Encoder:
+    def __init__(self) -> None:
+        self.offset = 0
+        self.symbols = {}
+        self.globals = []
+        # As a power of two, like .align.
+        self.alignment = 2
+
+    def encode(self, instructions: list) -> bytes:
+        code = bytearray()
+        for instruction in instructions:
+            if instruction.directive:
+                words = self.directive(instruction)
+            else:
+                words = encode(instruction).to_bytes(4, 'little')
+            code += words
+            self.offset += len(words)
+        return bytes(code)
+
+    def directive(self, instruction: Instruction) -> bytes:
+        match instruction.opcode, instruction.operands:
+            case label, () if label.endswith(':'):
+                self.symbols[label[:-1]] = self.offset
+                return b''
+            case ('.global' | '.globl'), (name,):
+                self.globals.append(name)
+                return b''
+            case ('.align' | '.p2align'), (value, *_):
+                alignment = immediate(f'#{value}', 4)
+                self.alignment = max(self.alignment, alignment)
+                padding = -self.offset % (1 << alignment)
+                return NOP.to_bytes(4, 'little') * (padding // 4)
+        msg = f'Cannot encode directive {instruction}'
+        raise CodeGenerationError(msg)
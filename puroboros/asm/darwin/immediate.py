@@ -0,0 +1,52 @@
+from typing import Optional
+
+
+def add_immediate(value: int) -> Optional[tuple]:
+    # add/sub take a 12-bit unsigned immediate, optionally shifted by 12.
+    if 0 <= value < 1 << 12:
+        return (f'#{value}',)
+    if value & 0xfff == 0 and 0 <= value >> 12 < 1 << 12:
+        return (f'#{value >> 12}', 'lsl #12')
+    return None
+
+
+def parse_add_immediate(operands: tuple) -> Optional[int]:
+    match operands:
+        case (str(value),) if value.startswith('#'):
+            return int(value[1:], 0)
+        case (str(value), 'lsl #12') if value.startswith('#'):
+            return int(value[1:], 0) << 12
+    return None
+
+
+def parse_immediate(operand: str) -> Optional[int]:
+    if not operand.startswith('#'):
+        return None
+    try:
+        return int(operand[1:], 0)
+    except ValueError:
+        return None
+
+
+def move_wide(value: int) -> list:
+    # movz clears the other halfwords and movn sets them, so start from
+    # whichever leaves fewer halfwords for movk to patch.
+    value &= (1 << 64) - 1
+    halfwords = [(value >> shift & 0xffff, shift) for shift in range(0, 64, 16)]
+    zeros = [(halfword, shift) for halfword, shift in halfwords if halfword != 0]
+    ones = [(halfword, shift) for halfword, shift in halfwords if halfword != 0xffff]
+
+    if len(ones) < len(zeros):
+        (halfword, shift), *rest = ones or [(0xffff, 0)]
+        first = ('movn', f'#{~halfword & 0xffff:#x}', *_shift(shift))
+    else:
+        (halfword, shift), *rest = zeros or [(0, 0)]
+        first = ('movz', f'#{halfword:#x}', *_shift(shift))
+    return [first] + [
+        ('movk', f'#{halfword:#x}', *_shift(shift))
+        for halfword, shift in rest
+    ]
+
+
+def _shift(shift: int) -> tuple:
+    return (f'lsl #{shift}',) if shift else ()
@@ -0,0 +1,169 @@
+from typing import Optional
+
+from puroboros.asm.darwin.dataflow import REGISTER, access
+from puroboros.asm.darwin.immediate import add_immediate, parse_add_immediate, parse_immediate
+from puroboros.asm.instruction import Instruction
+
+
+class Peephole:
+    # How far rules look ahead for the next use of a register.
+    WINDOW = 64
+
+    def __init__(self) -> None:
+        self.before = 0
+        self.after = 0
+        self.final = True
+
+    def stats(self) -> dict:
+        return {
+            'instructions before peephole': self.before,
+            'instructions after peephole': self.after,
+        }
+
+    def run(self, instructions: list, final: bool = True) -> list:
+        # Output may arrive in chunks; only the last one ends the program.
+        self.final = final
+        self.before += self.count(instructions)
+        changed = True
+        while changed:
+            changed = False
+            for rule in (self.drop_redundant_moves, self.fold_immediates, self.merge_arithmetic):
+                instructions, rule_changed = rule(instructions)
+                changed = changed or rule_changed
+        self.after += self.count(instructions)
+        return instructions
+
+    @staticmethod
+    def count(instructions: list) -> int:
+        return sum(not instruction.directive for instruction in instructions)
+
+    def next_reference(self, instructions: list, start: int, register: str) -> Optional[int]:
+        for index in range(start + 1, min(start + 1 + self.WINDOW, len(instructions))):
+            if instructions[index] is None:
+                continue
+            accessed = access(instructions[index])
+            if accessed is None:
+                return None
+            reads, writes = accessed
+            if register in reads or register in writes:
+                return index
+        return None
+
+    def dead_after(self, instructions: list, index: int, register: str) -> bool:
+        end = min(index + 1 + self.WINDOW, len(instructions))
+        for next_index in range(index + 1, end):
+            if instructions[next_index] is None:
+                continue
+            accessed = access(instructions[next_index])
+            if accessed is None:
+                return False
+            reads, writes = accessed
+            if register in reads:
+                return False
+            if register in writes:
+                return True
+        return self.final and end == len(instructions)
+
+    def drop_redundant_moves(self, instructions: list) -> tuple:
+        changed = False
+        for index, instruction in enumerate(instructions):
+            if instruction is None or instruction.opcode not in ('mov', 'movz', 'movn'):
+                continue
+            target = instruction.operands[0]
+            if instruction.operands[1:] == (target,):
+                instructions[index] = None
+                changed = True
+                continue
+
+            # A value overwritten before it is read is never used.
+            next_index = self.next_reference(instructions, index, target)
+            if next_index is None:
+                continue
+            reads, writes = access(instructions[next_index])
+            if target in writes and target not in reads:
+                instructions[index] = None
+                changed = True
+        return self.compact(instructions), changed
+
+    def fold_immediates(self, instructions: list) -> tuple:
+        changed = False
+        for index, instruction in enumerate(instructions):
+            if (
+                instruction is None or
+                instruction.opcode != 'mov' or
+                (value := parse_immediate(instruction.operands[1])) is None
+            ):
+                continue
+
+            register = instruction.operands[0]
+            user_index = self.next_reference(instructions, index, register)
+            if user_index is None:
+                continue
+            user = instructions[user_index]
+            if user.opcode not in ('add', 'sub') or len(user.operands) != 3:
+                continue
+
+            target, first, second = user.operands
+            opcode = user.opcode
+            if second == register and first != register:
+                source = first
+            elif opcode == 'add' and first == register and second != register:
+                source = second
+            else:
+                continue
+            if not REGISTER.fullmatch(source):
+                continue
+
+            if value < 0:
+                opcode = 'sub' if opcode == 'add' else 'add'
+                value = -value
+            if (immediate := add_immediate(value)) is None:
+                continue
+            if target != register and not self.dead_after(instructions, user_index, register):
+                continue
+
+            instructions[user_index] = Instruction(opcode, target, source, *immediate)
+            instructions[index] = None
+            changed = True
+        return self.compact(instructions), changed
+
+    def merge_arithmetic(self, instructions: list) -> tuple:
+        changed = False
+        merged = []
+        for instruction in instructions:
+            previous = merged[-1] if merged else None
+            if (
+                previous is not None and
+                (first := self.immediate_arithmetic(previous)) is not None and
+                (second := self.immediate_arithmetic(instruction)) is not None and
+                second[1] == second[0] == first[0]
+            ):
+                target, source, value = first[0], first[1], first[2] + second[2]
+                opcode = 'add' if value >= 0 else 'sub'
+                if value == 0 and source == target:
+                    merged.pop()
+                    changed = True
+                    continue
+                if value == 0:
+                    merged[-1] = Instruction('mov', target, source)
+                    changed = True
+                    continue
+                if (immediate := add_immediate(abs(value))) is not None:
+                    merged[-1] = Instruction(opcode, target, source, *immediate)
+                    changed = True
+                    continue
+            merged.append(instruction)
+        return merged, changed
+
+    def immediate_arithmetic(self, instruction: Instruction) -> Optional[tuple]:
+        if instruction.opcode not in ('add', 'sub') or len(instruction.operands) < 3:
+            return None
+        value = parse_add_immediate(instruction.operands[2:])
+        if value is None:
+            return None
+        target, source = instruction.operands[:2]
+        return target, source, value if instruction.opcode == 'add' else -value
+
+    @staticmethod
+    def compact(instructions: list) -> list:
+        return [instruction for instruction in instructions if instruction is not None]
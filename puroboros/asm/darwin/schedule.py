@@ -0,0 +1,169 @@
+from puroboros.asm.darwin.dataflow import access
+from puroboros.asm.instruction import Instruction
+
+
+# Result latencies in cycles, after the Cortex-A76 optimization guide;
+# Apple cores are close enough for ordering decisions.
+LATENCIES = {
+    'mov': 1,
+    'movz': 1,
+    'movn': 1,
+    'movk': 1,
+    'add': 1,
+    'sub': 1,
+    'neg': 1,
+    'lsl': 1,
+    'lsr': 1,
+    'asr': 1,
+    'mul': 4,
+    'smulh': 5,
+    'sdiv': 12,
+    'ldr': 4,
+    'str': 1,
+    'svc': 1,
+}
+# add/sub with a shifted register operand take an extra cycle.
+SHIFTED_LATENCY = 2
+
+
+def latency(instruction: Instruction) -> int:
+    if instruction.opcode in ('add', 'sub') and len(instruction.operands) == 4:
+        if not instruction.operands[3].startswith('lsl #12'):
+            return SHIFTED_LATENCY
+    return LATENCIES.get(instruction.opcode, 1)
+
+
+def estimate_cycles(instructions: list) -> int:
+    # In-order, single-issue: an instruction issues one cycle after the
+    # previous one, or once its operands are ready if that is later.
+    ready = {}
+    cycle = 0
+    finish = 0
+    for instruction in instructions:
+        if instruction.directive:
+            continue
+        accessed = access(instruction)
+        reads, writes = accessed if accessed is not None else ((), ())
+        cycle = max([cycle] + [ready.get(register, 0) for register in reads])
+        done = cycle + latency(instruction)
+        for register in writes:
+            ready[register] = done
+        finish = max(finish, done)
+        cycle += 1
+    return finish
+
+
+class Scheduler:
+    # Longer blocks are cut into windows, bounding the quadratic ready
+    # list scan on very large programs.
+    WINDOW = 256
+
+    def __init__(self) -> None:
+        self.before = 0
+        self.after = 0
+
+    def stats(self) -> dict:
+        return {
+            'estimated cycles before scheduling': self.before,
+            'estimated cycles after scheduling': self.after,
+        }
+
+    def run(self, instructions: list, final: bool = True) -> list:
+        # Chunks are scheduled independently, so their estimates add up.
+        before = estimate_cycles(instructions)
+        self.before += before
+        scheduled = []
+        block = []
+        for instruction in instructions:
+            # Directives, labels and unknown instructions stay in place
+            # and split the stream into independently scheduled blocks.
+            if instruction.directive or access(instruction) is None or instruction.opcode == 'svc':
+                scheduled.extend(self.schedule(block))
+                scheduled.append(instruction)
+                block = []
+                continue
+            block.append(instruction)
+            if len(block) == self.WINDOW:
+                scheduled.extend(self.schedule(block))
+                block = []
+        scheduled.extend(self.schedule(block))
+        after = estimate_cycles(scheduled)
+        # Never trade a worse estimate for the reordering.
+        if after > before:
+            self.after += before
+            return instructions
+        self.after += after
+        return scheduled
+
+    def schedule(self, block: list) -> list:
+        if len(block) < 2:
+            return block
+
+        # Only true, anti and output dependencies are kept, and the
+        # registers are already allocated, so reordering can never need
+        # more registers than the pool.
+        successors = [[] for _ in block]
+        predecessors = [0] * len(block)
+        last_write = {}
+        reads_since_write = {}
+        last_store = None
+        loads_since_store = []
+        for index, instruction in enumerate(block):
+            reads, writes = access(instruction)
+            edges = set()
+            for register in reads:
+                if register in last_write:
+                    edges.add((last_write[register], latency(block[last_write[register]])))
+            for register in writes:
+                if register in last_write:
+                    edges.add((last_write[register], 1))
+                for reader in reads_since_write.get(register, ()):
+                    if reader != index:
+                        edges.add((reader, 0))
+            if instruction.opcode in ('ldr', 'str'):
+                if last_store is not None:
+                    edges.add((last_store, 1))
+                if instruction.opcode == 'str':
+                    edges.update((load, 0) for load in loads_since_store)
+                    last_store = index
+                    loads_since_store = []
+                else:
+                    loads_since_store.append(index)
+
+            for source, delay in edges:
+                successors[source].append((index, delay))
+                predecessors[index] += 1
+            for register in reads:
+                reads_since_write.setdefault(register, []).append(index)
+            for register in writes:
+                last_write[register] = index
+                reads_since_write[register] = []
+
+        # Priority is the latency-weighted path to the end of the block.
+        priority = [0] * len(block)
+        for index in reversed(range(len(block))):
+            priority[index] = latency(block[index]) + max(
+                (priority[successor] for successor, _ in successors[index]),
+                default=0,
+            )
+
+        earliest = [0] * len(block)
+        ready = [index for index in range(len(block)) if predecessors[index] == 0]
+        order = []
+        cycle = 0
+        while ready:
+            available = [index for index in ready if earliest[index] <= cycle]
+            if not available:
+                cycle = min(earliest[index] for index in ready)
+                continue
+            # Ties go to the earlier instruction, which keeps the order stable.
+            chosen = max(available, key=lambda index: (priority[index], -index))
+            ready.remove(chosen)
+            order.append(block[chosen])
+            for successor, delay in successors[chosen]:
+                earliest[successor] = max(earliest[successor], cycle + delay)
+                predecessors[successor] -= 1
+                if predecessors[successor] == 0:
+                    ready.append(successor)
+            cycle += 1
+        return order
@@ -0,0 +1,147 @@
+import struct
+
+from puroboros.asm.darwin.encoder import Encoder
+from puroboros.exceptions import CodeGenerationError
+
+
+MH_MAGIC_64 = 0xfeedfacf
+CPU_TYPE_ARM64 = 0x0100000c
+MH_OBJECT = 0x1
+LC_SEGMENT_64 = 0x19
+LC_SYMTAB = 0x2
+LC_DYSYMTAB = 0xb
+LC_BUILD_VERSION = 0x32
+PLATFORM_MACOS = 1
+MINIMUM_MACOS = 11 << 16
+VM_PROT_ALL = 0x7
+S_ATTR_PURE_INSTRUCTIONS = 0x80000000
+S_ATTR_SOME_INSTRUCTIONS = 0x400
+N_EXT = 0x1
+N_SECT = 0xe
+
+HEADER = struct.Struct('<IiiIIIII')
+SEGMENT = struct.Struct('<II16sQQQQiiII')
+SECTION = struct.Struct('<16s16sQQIIIIIIII')
+BUILD_VERSION = struct.Struct('<IIIIII')
+SYMTAB = struct.Struct('<IIIIII')
+DYSYMTAB = struct.Struct('<II' + 'I' * 18)
+NLIST = struct.Struct('<IBBHQ')
+COMMANDS_SIZE = (
+    SEGMENT.size + SECTION.size + BUILD_VERSION.size + SYMTAB.size + DYSYMTAB.size
+)
+
+
+class RawWriter:
+    # Bare machine code, for loaders that take a flat image.
+    def __init__(self, stream) -> None:
+        self.stream = stream
+        self.encoder = Encoder()
+
+    def write(self, instructions: list) -> None:
+        self.stream.write(self.encoder.encode(instructions))
+
+    def flush(self) -> None:
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+
+class MachOWriter:
+    # Code streams out behind a header with placeholder sizes; the final
+    # flush appends the symbol table and patches the header. A stream
+    # that cannot seek gets the whole file at the end instead.
+    def __init__(self, stream) -> None:
+        self.stream = stream
+        self.encoder = Encoder()
+        self.seekable = hasattr(stream, 'seekable') and stream.seekable()
+        self.code = bytearray()
+        self.start = None
+        self.code_offset = None
+        self.code_size = 0
+
+    def write(self, instructions: list) -> None:
+        code = self.encoder.encode(instructions)
+        if not self.seekable:
+            self.code += code
+            return
+        if self.code_offset is None:
+            # The preamble's .align is in the first chunk, so the code
+            # offset is fixed before any code is written.
+            self.start = self.stream.tell()
+            self.code_offset = _align(HEADER.size + COMMANDS_SIZE, 1 << self.encoder.alignment)
+            self.stream.write(b'\0' * self.code_offset)
+        self.stream.write(code)
+        self.code_size += len(code)
+
+    def flush(self) -> None:
+        if not self.seekable:
+            code_offset = _align(HEADER.size + COMMANDS_SIZE, 1 << self.encoder.alignment)
+            commands, tables = self.tables(code_offset, len(self.code))
+            padding = b'\0' * (code_offset - len(commands))
+            self.stream.write(commands + padding + self.code + tables)
+        else:
+            if self.code_offset is None:
+                self.write([])
+            if self.code_offset % (1 << self.encoder.alignment):
+                msg = 'Section alignment raised after code was written'
+                raise CodeGenerationError(msg)
+            commands, tables = self.tables(self.code_offset, self.code_size)
+            self.stream.write(tables)
+            end = self.stream.tell()
+            self.stream.seek(self.start)
+            self.stream.write(commands)
+            self.stream.seek(end)
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+    def tables(self, code_offset: int, code_size: int) -> tuple:
+        # The header with its load commands, and what follows the code:
+        # padding, the symbol table and the string table.
+        encoder = self.encoder
+        # Local symbols come before external ones, as LC_DYSYMTAB expects.
+        names = sorted(encoder.symbols, key=lambda name: (name in encoder.globals, name))
+        external = [name for name in names if name in encoder.globals]
+
+        code_end = code_offset + code_size
+        symbols_offset = _align(code_end, 8)
+        strings_offset = symbols_offset + NLIST.size * len(names)
+
+        strings = bytearray(b'\0')
+        symbols = bytearray()
+        for name in names:
+            kind = N_SECT | N_EXT if name in encoder.globals else N_SECT
+            symbols += NLIST.pack(len(strings), kind, 1, 0, encoder.symbols[name])
+            strings += name.encode() + b'\0'
+        strings += b'\0' * (-len(strings) % 8)
+
+        header = HEADER.pack(
+            MH_MAGIC_64, CPU_TYPE_ARM64, 0, MH_OBJECT, 4, COMMANDS_SIZE, 0, 0,
+        )
+        segment = SEGMENT.pack(
+            LC_SEGMENT_64, SEGMENT.size + SECTION.size, b'', 0, code_size,
+            code_offset, code_size, VM_PROT_ALL, VM_PROT_ALL, 1, 0,
+        )
+        section = SECTION.pack(
+            b'__text', b'__TEXT', 0, code_size, code_offset,
+            encoder.alignment, 0, 0,
+            S_ATTR_PURE_INSTRUCTIONS | S_ATTR_SOME_INSTRUCTIONS, 0, 0, 0,
+        )
+        build_version = BUILD_VERSION.pack(
+            LC_BUILD_VERSION, BUILD_VERSION.size, PLATFORM_MACOS, MINIMUM_MACOS, 0, 0,
+        )
+        symtab = SYMTAB.pack(
+            LC_SYMTAB, SYMTAB.size, symbols_offset, len(names),
+            strings_offset, len(strings),
+        )
+        dysymtab = DYSYMTAB.pack(
+            LC_DYSYMTAB, DYSYMTAB.size,
+            0, len(names) - len(external), len(names) - len(external), len(external),
+            len(names), 0, *[0] * 12,
+        )
+
+        commands = header + segment + section + build_version + symtab + dysymtab
+        tables = b'\0' * (symbols_offset - code_end) + symbols + strings
+        return commands, bytes(tables)
+
+
+def _align(offset: int, alignment: int) -> int:
+    return offset + -offset % alignment
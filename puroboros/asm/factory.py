@@ -6,13 +6,13 @@ from puroboros.exceptions import CodeGenerationError
 
 class AssemblyFactory:
     @staticmethod
-    def create(system=None, machine=None):
+    def create(system=None, machine=None, sink=None, output_format='asm'):
         system = system or platform.system()
         machine = machine or platform.machine()
 
         match [system.lower(), machine.lower()]:
             case ['darwin', 'arm64']:
-                return DarwinARM64()
+                return DarwinARM64(sink, output_format)
             case _:
                 msg = (f'Could not determine assembly engine for '
                        f'{system} {machine} platform')
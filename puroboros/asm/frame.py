@@ -0,0 +1,41 @@
+class StackFrame:
+    SLOT_SIZE = 8
+    # The stack pointer has to stay 16-byte aligned on ARM64.
+    ALIGNMENT = 16
+
+    def __init__(self) -> None:
+        self.free_slots = []
+        self.slots = 0
+        self.size = 0
+        self.spills = 0
+        self.reloads = 0
+
+    def allocate(self) -> int:
+        self.spills += 1
+        if self.free_slots:
+            return self.free_slots.pop()
+        slot = self.slots
+        self.slots += 1
+        return slot
+
+    def release(self, slot: int) -> None:
+        self.reloads += 1
+        self.free_slots.append(slot)
+
+    def grow(self) -> int:
+        if self.slots * self.SLOT_SIZE <= self.size:
+            return 0
+        self.size += self.ALIGNMENT
+        return self.ALIGNMENT
+
+    def offset(self, slot: int) -> int:
+        # Slots are laid out downwards from the stack pointer at entry.
+        return self.size - (slot + 1) * self.SLOT_SIZE
+
+    def stats(self) -> dict:
+        return {
+            'spills': self.spills,
+            'reloads': self.reloads,
+            'stack slots': self.slots,
+            'frame size': self.size,
+        }
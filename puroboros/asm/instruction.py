@@ -0,0 +1,36 @@
+import re
+
+
+class Instruction:
+    __slots__ = ('opcode', 'operands')
+
+    OPERAND = re.compile(r'\[[^\]]*\]!?|[^,\s][^,]*')
+
+    def __init__(self, opcode: str, *operands: str) -> None:
+        self.opcode = opcode
+        self.operands = operands
+
+    @classmethod
+    def parse(cls, line: str) -> 'Instruction':
+        opcode, _, operands = line.strip().partition(' ')
+        return cls(opcode, *(
+            operand.strip()
+            for operand in cls.OPERAND.findall(operands)
+        ))
+
+    @property
+    def directive(self) -> bool:
+        return self.opcode.startswith('.') or self.opcode.endswith(':')
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Instruction):
+            return NotImplemented
+        return self.opcode == other.opcode and self.operands == other.operands
+
+    def __repr__(self) -> str:
+        return f'Instruction({str(self)!r})'
+
+    def __str__(self) -> str:
+        if not self.operands:
+            return self.opcode
+        return f'{self.opcode} {", ".join(self.operands)}'
@@ -0,0 +1,36 @@
+def signed_magic(divisor: int, bits: int = 64) -> tuple:
+    # Magic multiplier and shift for signed division by a constant, after
+    # Hacker's Delight 10-1; the quotient is (smulh(n, M) +/- n) >> s,
+    # corrected by one for negative results.
+    if divisor in (-1, 0, 1):
+        msg = f'No magic number for division by {divisor}'
+        raise ValueError(msg)
+    sign_bit = 1 << bits - 1
+    if abs(divisor) >= sign_bit:
+        msg = f'Divisor {divisor} does not fit in {bits - 1} bits'
+        raise ValueError(msg)
+
+    absolute = abs(divisor)
+    t = sign_bit + (divisor < 0)
+    anc = t - 1 - t % absolute
+    p = bits - 1
+    q1, r1 = divmod(sign_bit, anc)
+    q2, r2 = divmod(sign_bit, absolute)
+    while True:
+        p += 1
+        q1, r1 = 2 * q1, 2 * r1
+        if r1 >= anc:
+            q1, r1 = q1 + 1, r1 - anc
+        q2, r2 = 2 * q2, 2 * r2
+        if r2 >= absolute:
+            q2, r2 = q2 + 1, r2 - absolute
+        delta = absolute - r2
+        if q1 > delta or (q1 == delta and r1 != 0):
+            break
+
+    magic = (q2 + 1) & (1 << bits) - 1
+    if divisor < 0:
+        magic = -magic & (1 << bits) - 1
+    if magic & sign_bit:
+        magic -= 1 << bits
+    return magic, p - bits
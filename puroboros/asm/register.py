@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Iterable
 
 from puroboros.exceptions import RegisterError
@@ -8,6 +8,7 @@ from puroboros.exceptions import RegisterError
 class Register:
     name: str
     free: bool = True
+    index: int = field(default=None, compare=False, repr=False)
 
     def __str__(self) -> str:
         return self.name
@@ -16,29 +17,60 @@ class Register:
 class RegisterManager:
     def __init__(self, register_names: Iterable[str]) -> None:
         self.pool = [
-            Register(name)
-            for name in dict.fromkeys(register_names)
+            Register(name, index=index)
+            for index, name in enumerate(dict.fromkeys(register_names))
         ]
+        # Bit i is set while self.pool[i] is free.
+        self.free_mask = (1 << len(self.pool)) - 1
+        self.allocations = 0
+        self.high_water = 0
+
+    @property
+    def available(self) -> int:
+        return self.free_mask.bit_count()
+
+    @property
+    def in_use(self) -> int:
+        return len(self.pool) - self.available
+
+    def owns(self, register: Register) -> bool:
+        index = register.index
+        return index is not None and index < len(self.pool) and self.pool[index] is register
 
     def free(self, register: Register) -> None:
         if register.free:
             msg = f'Register {register} is already free'
             raise RegisterError(msg)
         register.free = True
+        if self.owns(register):
+            self.free_mask |= 1 << register.index
 
     def free_all(self) -> None:
         for register in self.pool:
             register.free = True
+        self.free_mask = (1 << len(self.pool)) - 1
 
     def allocate(self) -> Register:
-        for register in self.pool:
-            if register.free:
-                register.free = False
-                return register
-        else:
+        if not self.free_mask:
             msg = 'Out of registers'
             raise RegisterError(msg)
 
+        # Take the lowest free register, as a linear scan would.
+        lowest = self.free_mask & -self.free_mask
+        self.free_mask ^= lowest
+        register = self.pool[lowest.bit_length() - 1]
+        register.free = False
+
+        self.allocations += 1
+        self.high_water = max(self.high_water, self.in_use)
+        return register
+
+    def stats(self) -> dict:
+        return {
+            'register allocations': self.allocations,
+            'registers high water': self.high_water,
+        }
+
 
 class RegisterMeta(type):
     def __new__(cls, name, bases, attrs, **kwargs):
@@ -0,0 +1,11 @@
+class TextWriter:
+    def __init__(self, stream) -> None:
+        self.stream = stream
+
+    def write(self, instructions: list) -> None:
+        if instructions:
+            self.stream.write('\n'.join(map(str, instructions)) + '\n')
+
+    def flush(self) -> None:
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
@@ -0,0 +1,154 @@
+import fcntl
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Optional
+
+from puroboros import __version__
+
+
+class CompilationCache:
+    # Entries are files named by their key; a hit refreshes the
+    # modification time, which eviction treats as the last use.
+    CHUNK_SIZE = 1 << 16
+    # An overfull cache is trimmed to this fraction of its bound, so the
+    # next directory scan waits until it has grown by the rest.
+    LOW_WATER = 0.9
+    # Other processes add entries too; the size estimate is rescanned
+    # after this many puts even if it stays under the bound.
+    SCAN_INTERVAL = 64
+    # Temporary files this old were left by a writer that died.
+    STALE_SECONDS = 3600
+    # The size estimate and put count, shared by every process using the
+    # directory so that a new instance does not start with a scan.
+    STATE = '.state'
+
+    def __init__(self, directory: str, max_size: int) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bytes in the cache as of the last scan plus what was put since,
+        # as last read from STATE.
+        self.size = None
+        self.puts = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def key(cls, infile, **options) -> str:
+        digest = hashlib.sha256()
+        digest.update(json.dumps(
+            {'version': __version__, 'source': source_digest(), **options},
+            sort_keys=True,
+        ).encode())
+        digest.update(b'\0')
+        while chunk := infile.read(cls.CHUNK_SIZE):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def stats(self) -> dict:
+        return {
+            'cache hits': self.hits,
+            'cache misses': self.misses,
+            'cache evictions': self.evictions,
+        }
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = os.path.join(self.directory, key)
+        try:
+            with open(path, 'rb') as infile:
+                data = infile.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Never written, or evicted by another worker meanwhile.
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        # Readers only ever see complete entries: the data is written to
+        # a temporary file and renamed over the key.
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as outfile:
+                outfile.write(data)
+            os.replace(temporary, os.path.join(self.directory, key))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+        # Held until the estimate is written back, so that concurrent
+        # puts neither lose each other's bytes nor scan at the same time.
+        with open(os.path.join(self.directory, self.STATE), 'a+b') as state:
+            fcntl.flock(state, fcntl.LOCK_EX)
+            state.seek(0)
+            try:
+                self.size, self.puts = map(int, state.read().split())
+            except ValueError:
+                # New, or left half written by a process that died.
+                self.size, self.puts = None, 0
+
+            self.puts += 1
+            if self.size is not None:
+                self.size += len(data)
+            if (
+                self.size is None
+                or self.size > self.max_size
+                or self.puts % self.SCAN_INTERVAL == 0
+            ):
+                self.evict()
+
+            state.seek(0)
+            state.truncate()
+            state.write(f'{self.size} {self.puts}'.encode())
+
+    def evict(self) -> None:
+        entries = []
+        size = 0
+        stale = time.time_ns() - self.STALE_SECONDS * 10 ** 9
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                try:
+                    stat = entry.stat()
+                    if entry.name.startswith('.'):
+                        if entry.name != self.STATE and stat.st_mtime_ns < stale:
+                            os.unlink(entry.path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                size += stat.st_size
+
+        if size > self.max_size:
+            entries.sort()
+            for _, entry_size, path in entries:
+                if size <= self.max_size * self.LOW_WATER:
+                    break
+                try:
+                    os.unlink(path)
+                    self.evictions += 1
+                except FileNotFoundError:
+                    pass
+                size -= entry_size
+        self.size = size
+
+
+@functools.cache
+def source_digest() -> str:
+    # Part of every key, so that changing the compiler invalidates its
+    # cached outputs even when __version__ is not bumped.
+    digest = hashlib.sha256()
+    root = os.path.dirname(os.path.abspath(__file__))
+    for directory, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            if name.endswith('.py'):
+                path = os.path.join(directory, name)
+                digest.update(os.path.relpath(path, root).encode() + b'\0')
+                with open(path, 'rb') as infile:
+                    digest.update(infile.read())
+    return digest.hexdigest()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Compile a file through a running `main.py serve`."""
+# Kept to the standard library and free of compiler imports: starting
+# this client is the part of every call the server cannot save.
+import argparse
+import base64
+import json
+import os
+import socket
+import sys
+import tempfile
+
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'puroboros.sock')
+
+
+class Client:
+    # One connection carries any number of requests, one JSON object per
+    # line each way.
+    def __init__(self, path: str = DEFAULT_SOCKET) -> None:
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.stream = self.socket.makefile('rwb')
+
+    def compile(self, source: str, **options) -> dict:
+        self.stream.write(json.dumps({'source': source, **options}).encode() + b'\n')
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError('Server closed the connection')
+        response = json.loads(line)
+        if response.get('encoding') == 'base64':
+            response['output'] = base64.b64decode(response['output'])
+        return response
+
+    def close(self) -> None:
+        self.stream.close()
+        self.socket.close()
+
+    def __enter__(self) -> 'Client':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('file', type=str, help='input path')
+    parser.add_argument('-o', '--output', type=str, help='output path', default='a.out')
+    parser.add_argument('--socket', type=str, help='server socket', default=DEFAULT_SOCKET)
+    parser.add_argument('-s', '--system', type=str, help='operating system name')
+    parser.add_argument('-a', '--arch', type=str, help='architecture type')
+    parser.add_argument('-O', dest='optimize', type=int, help='optimization level', default=0)
+    parser.add_argument(
+        '-f',
+        '--format',
+        dest='output_format',
+        type=str,
+        choices=['asm', 'obj', 'bin'],
+        default='asm',
+    )
+    args = parser.parse_args()
+
+    with open(args.file, 'rt') as infile:
+        source = infile.read()
+    options = {
+        name: getattr(args, name)
+        for name in ('system', 'arch', 'optimize', 'output_format')
+        if getattr(args, name) is not None
+    }
+    with Client(args.socket) as client:
+        response = client.compile(source, **options)
+
+    if 'error' in response:
+        print(f'{args.file}: {response["error"]}', file=sys.stderr)
+        sys.exit(1)
+    output = response['output']
+    with open(args.output, 'wb' if isinstance(output, bytes) else 'wt') as outfile:
+        outfile.write(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 class Context:
     def __init__(self) -> None:
-        self.putback_c = None
         self.infile = None
+        self.buffer = None
         self.line = 1
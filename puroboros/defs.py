@@ -1,9 +1,11 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
 from enum import Enum
+from typing import NamedTuple
 
 
-@dataclass
-class Token:
+class Token(NamedTuple):
     class Type(Enum):
         T_PLUS = 0
         T_MINUS = 1
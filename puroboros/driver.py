@@ -0,0 +1,64 @@
+from puroboros.exceptions import (
+    CodeGenerationError,
+    OptimizationError,
+    ParserError,
+    RegisterError,
+    ScannerError,
+)
+from puroboros.gen import CodeGenerator
+from puroboros.opt.manager import PassManager
+from puroboros.opt.rebalance import Rebalance
+from puroboros.tree import ASTArena, InterningArena, InterningObjectTree, ObjectTree
+
+
+# What a bad input can raise; anything else is a bug.
+ERRORS = (
+    CodeGenerationError,
+    OptimizationError,
+    ParserError,
+    RegisterError,
+    ScannerError,
+)
+
+
+def new_tree(arena=False, intern=False):
+    if intern:
+        return InterningArena() if arena else InterningObjectTree()
+    return ASTArena() if arena else ObjectTree()
+
+
+def compile_tree(
+    tree,
+    node,
+    sink,
+    system=None,
+    machine=None,
+    optimize=0,
+    output_format='asm',
+    rebalance=False,
+    intern=False,
+    ir=False,
+    peephole=False,
+    schedule=False,
+) -> tuple:
+    manager = PassManager.for_level(optimize)
+    if rebalance:
+        manager.passes.insert(0, Rebalance())
+    node = manager.run(tree, node)
+
+    generator = CodeGenerator(
+        system,
+        machine,
+        peephole=peephole or optimize >= 1,
+        schedule=schedule or optimize >= 1,
+        # Only the IR path computes each shared node once.
+        ir=ir or intern,
+        sink=sink,
+        output_format=output_format,
+    )
+    generator.generate(node, tree)
+
+    stats = {**manager.stats(), **generator.stats()}
+    if intern:
+        stats.update(tree.stats())
+    return generator, stats
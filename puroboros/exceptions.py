@@ -2,6 +2,10 @@ class CodeGenerationError(Exception):
     pass
 
 
+class OptimizationError(Exception):
+    pass
+
+
 class ParserError(Exception):
     pass
 
@@ -3,6 +3,7 @@ from typing import NoReturn
 from .defs import ASTNode, Token
 from .exceptions import ParserError
 from .scan import Scanner
+from .tree import ObjectTree
 
 
 class Parser:
@@ -13,9 +14,10 @@ class Parser:
         Token.Type.T_SLASH: 20,
     }
 
-    def __init__(self, scanner: Scanner) -> None:
+    def __init__(self, scanner: Scanner, tree=None) -> None:
         self.scanner = scanner
         self.context = scanner.context
+        self.tree = ObjectTree() if tree is None else tree
 
     def raise_syntax_error(self) -> NoReturn:
         msg = f'Syntax error on line {self.context.line}'
@@ -24,10 +26,7 @@ class Parser:
     def primary(self, token: Token) -> ASTNode:
         match token.type:
             case Token.Type.T_INTLIT:
-                return ASTNode(
-                    op=ASTNode.Type.A_INTLIT,
-                    intvalue=token.intvalue,
-                )
+                return self.tree.intlit(token.intvalue)
             case _:
                 self.raise_syntax_error()
 
@@ -51,20 +50,31 @@ class Parser:
             self.raise_syntax_error()
 
     def bin_expr(self, precedence: int = 0) -> ASTNode:
-        left_token = self.scanner.scan()
-        left_node = self.primary(left_token)
+        operands = [self.primary(self.scanner.scan())]
+        operators = []
         op_token = self.scanner.scan()
 
         while (
             op_token.type != Token.Type.T_EOF and
-            self.op_precedence(op_token.type) > precedence
+            (op_precedence := self.op_precedence(op_token.type)) > precedence
         ):
-            right_node, next_op_token = self.bin_expr(self.op_precedence(op_token.type))
-            left_node = ASTNode(
-                op=self.arith_op(op_token.type),
-                left=left_node,
-                right=right_node,
-            )
-            op_token = next_op_token
+            # Operators of equal precedence associate to the left.
+            while operators and operators[-1][0] >= op_precedence:
+                self.reduce(operands, operators)
+            operators.append((op_precedence, op_token))
+            operands.append(self.primary(self.scanner.scan()))
+            op_token = self.scanner.scan()
 
-        return left_node, op_token
+        while operators:
+            self.reduce(operands, operators)
+
+        return operands[0], op_token
+
+    def reduce(self, operands: list, operators: list) -> None:
+        _, op_token = operators.pop()
+        right_node = operands.pop()
+        operands[-1] = self.tree.binary(
+            self.arith_op(op_token.type),
+            operands[-1],
+            right_node,
+        )
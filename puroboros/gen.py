@@ -1,24 +1,159 @@
 from puroboros.asm.factory import AssemblyFactory
+from puroboros.asm.register import Register
 from puroboros.defs import ASTNode
 from puroboros.exceptions import CodeGenerationError
+from puroboros.ir import IRBuilder, LocalValueNumbering, Lowering
+from puroboros.opt.fold import wrap
+from puroboros.opt.label import sethi_ullman
+from puroboros.tree import ObjectTree
 
 
 class CodeGenerator:
-    def __init__(self, system=None, machine=None) -> None:
-        self.assembly = AssemblyFactory.create(system, machine)
+    OPERATIONS = {
+        ASTNode.Type.A_ADD: 'add',
+        ASTNode.Type.A_SUBTRACT: 'sub',
+        ASTNode.Type.A_MULTIPLY: 'mul',
+        ASTNode.Type.A_DIVIDE: 'div',
+    }
+    COMMUTATIVE = {'add', 'mul'}
 
-    def generate(self, node: ASTNode) -> None:
+    def __init__(
+        self,
+        system=None,
+        machine=None,
+        peephole=False,
+        ir=False,
+        schedule=False,
+        sink=None,
+        output_format='asm',
+    ) -> None:
+        self.assembly = AssemblyFactory.create(system, machine, sink, output_format)
+        self.peephole = peephole
+        self.schedule = schedule
+        self.use_ir = ir
+        self.ir = None
+        self.ir_stats = {}
+
+    def generate(self, node: ASTNode, tree=None) -> Register:
+        self.tree = ObjectTree() if tree is None else tree
+        self.assembly.set_passes(*(
+            name
+            for name, enabled in (('peephole', self.peephole), ('scheduler', self.schedule))
+            if enabled
+        ))
         self.assembly.preamble()
-        self._generate_ast(node)
+        if self.use_ir:
+            register = self._generate_ir(node)
+        else:
+            register = self._generate_ast(node)
         self.assembly.postamble()
+        self.assembly.flush(final=True)
+        return register
+
+    def stats(self) -> dict:
+        return {
+            **self.assembly.registers.stats(),
+            **self.assembly.frame.stats(),
+            **self.ir_stats,
+            **self.assembly.optimizer_stats(),
+        }
+
+    def _generate_ir(self, node: ASTNode) -> Register:
+        numbering = LocalValueNumbering()
+        self.ir = numbering.run(IRBuilder(self.tree).build(node))
+        self.ir_stats = {
+            'ir instructions': len(self.ir.instructions),
+            **numbering.stats(),
+        }
+        return Lowering(self.assembly).lower(self.ir)
+
+    def _generate_ast(self, node: ASTNode) -> Register:
+        tree = self.tree
+        labels = sethi_ullman(tree, node, self._immediate_operand)
+        results = []
+        # results[:self._spilled] live in stack slots, the rest in registers.
+        self._spilled = 0
+        stack = [(node, None, None)]
+        while stack:
+            node, right_first, immediate = stack.pop()
+            if right_first is None:
+                left, right = tree.left(node), tree.right(node)
+                if left is None or right is None:
+                    self._reserve(results)
+                    results.append(self._generate_node(node, None, None))
+                    continue
+                # A constant operand the target can encode directly is
+                # never loaded into a register.
+                if (operand := self._immediate_operand(node, left, right)) is not None:
+                    child, immediate = operand
+                    stack.append((node, False, immediate))
+                    stack.append((child, None, None))
+                    continue
+                # Evaluate the subtree needing more registers first; that
+                # minimizes the registers needed for the whole node.
+                right_first = labels[tree.key(right)] > labels[tree.key(left)]
+                stack.append((node, right_first, None))
+                stack.append((left, None, None) if right_first else (right, None, None))
+                stack.append((right, None, None) if right_first else (left, None, None))
+                continue
+
+            if immediate is not None:
+                results.append(self._generate_immediate(node, self._pop(results), immediate))
+                continue
+            if right_first:
+                left_reg = self._pop(results)
+                right_reg = self._pop(results)
+            else:
+                right_reg = self._pop(results)
+                left_reg = self._pop(results)
+            results.append(self._generate_node(node, left_reg, right_reg))
+
+        return results.pop()
+
+    def _reserve(self, results: list) -> None:
+        # Spill the oldest value held in a register; it is needed last.
+        if self.assembly.registers.available == 0 and self._spilled < len(results):
+            results[self._spilled] = self.assembly.spill(results[self._spilled])
+            self._spilled += 1
+
+    def _pop(self, results: list) -> Register:
+        value = results.pop()
+        if len(results) < self._spilled:
+            self._spilled = len(results)
+            self._reserve(results)
+            value = self.assembly.reload(value)
+        return value
 
-    def _generate_ast(self, node: ASTNode) -> None:
-        if node.left:
-            left_reg = self._generate_ast(node.left)
-        if node.right:
-            right_reg = self._generate_ast(node.right)
+    def _immediate_operand(self, node, left, right):
+        tree = self.tree
+        operation = self.OPERATIONS.get(tree.op(node))
+        if operation is None:
+            return None
+        for child, constant in ((left, right), (right, left)):
+            if tree.op(constant) == ASTNode.Type.A_INTLIT:
+                value = wrap(tree.intvalue(constant))
+                if self.assembly.accepts_immediate(operation, value):
+                    return child, value
+            if operation not in self.COMMUTATIVE:
+                return None
+        return None
+
+    def _generate_immediate(self, node, register: Register, value: int) -> Register:
+        match (op := self.tree.op(node)):
+            case ASTNode.Type.A_ADD:
+                return self.assembly.add_immediate(register, value)
+            case ASTNode.Type.A_SUBTRACT:
+                return self.assembly.sub_immediate(register, value)
+            case ASTNode.Type.A_MULTIPLY:
+                return self.assembly.mul_immediate(register, value)
+            case ASTNode.Type.A_DIVIDE:
+                return self.assembly.div_immediate(register, value)
+            case _:
+                msg = f'Unknown AST operator {op}'
+                raise CodeGenerationError(msg)
 
-        match node.op:
+    def _generate_node(self, node: ASTNode, left_reg: Register, right_reg: Register) -> Register:
+        match (op := self.tree.op(node)):
             case ASTNode.Type.A_ADD:
                 return self.assembly.add(left_reg, right_reg)
             case ASTNode.Type.A_SUBTRACT:
@@ -28,7 +163,7 @@ class CodeGenerator:
             case ASTNode.Type.A_DIVIDE:
                 return self.assembly.div(left_reg, right_reg)
             case ASTNode.Type.A_INTLIT:
-                return self.assembly.load(node.intvalue)
+                return self.assembly.load(self.tree.intvalue(node))
             case _:
-                msg = f'Unknown AST operator {node.op}'
+                msg = f'Unknown AST operator {op}'
                 raise CodeGenerationError(msg)
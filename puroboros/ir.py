@@ -0,0 +1,243 @@
+from collections import deque
+from enum import Enum
+from typing import NamedTuple, Optional
+
+from puroboros.asm.base import Assembly
+from puroboros.asm.register import Register
+from puroboros.defs import ASTNode
+from puroboros.exceptions import CodeGenerationError
+from puroboros.opt.fold import wrap
+from puroboros.opt.label import sethi_ullman
+
+
+class Quad(NamedTuple):
+    class Op(Enum):
+        CONST = 'const'
+        ADD = 'add'
+        SUB = 'sub'
+        MUL = 'mul'
+        DIV = 'div'
+
+    op: Op
+    dest: int
+    left: Optional[int] = None
+    right: Optional[int] = None
+    value: Optional[int] = None
+
+    def __str__(self) -> str:
+        if self.op is Quad.Op.CONST:
+            return f'v{self.dest} = const {self.value}'
+        return f'v{self.dest} = {self.op.value} v{self.left}, v{self.right}'
+
+
+OPS = {
+    ASTNode.Type.A_ADD: Quad.Op.ADD,
+    ASTNode.Type.A_SUBTRACT: Quad.Op.SUB,
+    ASTNode.Type.A_MULTIPLY: Quad.Op.MUL,
+    ASTNode.Type.A_DIVIDE: Quad.Op.DIV,
+}
+COMMUTATIVE = {Quad.Op.ADD, Quad.Op.MUL}
+
+
+class IR:
+    def __init__(self) -> None:
+        self.instructions = []
+        self.result = None
+        self.vregs = 0
+
+    def emit(self, op: Quad.Op, left=None, right=None, value=None) -> int:
+        dest = self.vregs
+        self.vregs += 1
+        self.instructions.append(Quad(op, dest, left, right, value))
+        return dest
+
+    def __str__(self) -> str:
+        lines = [str(quad) for quad in self.instructions]
+        lines.append(f'return v{self.result}')
+        return '\n'.join(lines)
+
+
+class IRBuilder:
+    def __init__(self, tree) -> None:
+        self.tree = tree
+
+    def build(self, node) -> IR:
+        tree = self.tree
+        labels = sethi_ullman(tree, node)
+        ir = IR()
+        # Vregs by key, see Interning in puroboros.tree.
+        computed = {}
+        values = []
+        stack = [(node, None)]
+        while stack:
+            node, right_first = stack.pop()
+            if right_first is None:
+                if (vreg := computed.get(tree.key(node))) is not None:
+                    values.append(vreg)
+                    continue
+                left, right = tree.left(node), tree.right(node)
+                if left is None or right is None:
+                    if tree.op(node) != ASTNode.Type.A_INTLIT:
+                        msg = f'Unknown AST operator {tree.op(node)}'
+                        raise CodeGenerationError(msg)
+                    vreg = ir.emit(Quad.Op.CONST, value=tree.intvalue(node))
+                    computed[tree.key(node)] = vreg
+                    values.append(vreg)
+                    continue
+                # Same order as the direct generator: heavier subtree first.
+                right_first = labels[tree.key(right)] > labels[tree.key(left)]
+                stack.append((node, right_first))
+                stack.append((left, None) if right_first else (right, None))
+                stack.append((right, None) if right_first else (left, None))
+                continue
+
+            if right_first:
+                left, right = values.pop(), values.pop()
+            else:
+                right, left = values.pop(), values.pop()
+            if (op := OPS.get(tree.op(node))) is None:
+                msg = f'Unknown AST operator {tree.op(node)}'
+                raise CodeGenerationError(msg)
+            vreg = ir.emit(op, left, right)
+            computed[tree.key(node)] = vreg
+            values.append(vreg)
+
+        ir.result = values.pop()
+        return ir
+
+
+class LocalValueNumbering:
+    def __init__(self) -> None:
+        self.removed = 0
+
+    def stats(self) -> dict:
+        return {'redundant values removed': self.removed}
+
+    def run(self, ir: IR) -> IR:
+        # Every vreg is defined once, so a vreg doubles as a value number.
+        table = {}
+        renamed = {}
+        instructions = []
+        for quad in ir.instructions:
+            left = renamed.get(quad.left, quad.left)
+            right = renamed.get(quad.right, quad.right)
+            if quad.op is Quad.Op.CONST:
+                key = (quad.op, quad.value)
+            elif quad.op in COMMUTATIVE and left > right:
+                key = (quad.op, right, left)
+            else:
+                key = (quad.op, left, right)
+
+            if (number := table.get(key)) is not None:
+                renamed[quad.dest] = number
+                self.removed += 1
+                continue
+            table[key] = quad.dest
+            instructions.append(quad._replace(left=left, right=right))
+
+        ir.instructions = instructions
+        ir.result = renamed.get(ir.result, ir.result)
+        return ir
+
+
+class Lowering:
+    def __init__(self, assembly: Assembly) -> None:
+        self.assembly = assembly
+
+    def lower(self, ir: IR) -> Register:
+        self.uses = {}
+        for position, quad in enumerate(ir.instructions):
+            if quad.op is not Quad.Op.CONST:
+                self.uses.setdefault(quad.left, deque()).append(position)
+                self.uses.setdefault(quad.right, deque()).append(position)
+        end = len(ir.instructions)
+        self.uses.setdefault(ir.result, deque()).append(end)
+
+        # Constants are rematerialized at each use instead of being kept
+        # live; everything else lives in a register or a stack slot.
+        self.constants = {}
+        self.locations = {}
+        for position, quad in enumerate(ir.instructions):
+            if quad.op is Quad.Op.CONST:
+                self.constants[quad.dest] = wrap(quad.value)
+            else:
+                self.locations[quad.dest] = self._lower_quad(position, quad)
+        return self._operand(ir.result, end, [])
+
+    def _lower_quad(self, position: int, quad: Quad) -> Register:
+        assembly = self.assembly
+        operation = quad.op.value
+        operands = [(quad.left, quad.right)]
+        if quad.op in COMMUTATIVE:
+            operands.append((quad.right, quad.left))
+        for operand, constant in operands:
+            value = self.constants.get(constant)
+            if value is not None and assembly.accepts_immediate(operation, value):
+                self._consume(constant, position)
+                register = self._operand(operand, position, [])
+                return self._immediate(quad.op, register, value)
+
+        left = self._operand(quad.left, position, [])
+        right = self._operand(quad.right, position, [left])
+        match quad.op:
+            case Quad.Op.ADD:
+                return assembly.add(left, right)
+            case Quad.Op.SUB:
+                return assembly.sub(left, right)
+            case Quad.Op.MUL:
+                return assembly.mul(left, right)
+            case Quad.Op.DIV:
+                return assembly.div(left, right)
+        msg = f'Unknown IR operation {quad.op}'
+        raise CodeGenerationError(msg)
+
+    def _immediate(self, op: Quad.Op, register: Register, value: int) -> Register:
+        match op:
+            case Quad.Op.ADD:
+                return self.assembly.add_immediate(register, value)
+            case Quad.Op.SUB:
+                return self.assembly.sub_immediate(register, value)
+            case Quad.Op.MUL:
+                return self.assembly.mul_immediate(register, value)
+            case Quad.Op.DIV:
+                return self.assembly.div_immediate(register, value)
+        msg = f'Unknown IR operation {op}'
+        raise CodeGenerationError(msg)
+
+    def _consume(self, vreg: int, position: int) -> bool:
+        uses = self.uses[vreg]
+        if uses and uses[0] == position:
+            uses.popleft()
+        return bool(uses)
+
+    def _operand(self, vreg: int, position: int, pinned: list) -> Register:
+        # Returns a register the caller may overwrite; a value that is
+        # still needed later keeps its own register and is copied.
+        live = self._consume(vreg, position)
+        if vreg in self.constants:
+            self._reserve(pinned)
+            return self.assembly.load(self.constants[vreg])
+
+        location = self.locations[vreg]
+        if not isinstance(location, Register):
+            self._reserve(pinned)
+            location = self.assembly.reload(location)
+            self.locations[vreg] = location
+        if not live:
+            del self.locations[vreg]
+            return location
+        self._reserve(pinned + [location])
+        return self.assembly.copy(location)
+
+    def _reserve(self, pinned: list) -> None:
+        if self.assembly.registers.available:
+            return
+        # Spill the value whose next use is furthest away.
+        candidates = [
+            vreg for vreg, location in self.locations.items()
+            if isinstance(location, Register) and location not in pinned
+        ]
+        if not candidates:
+            return
+        victim = max(candidates, key=lambda vreg: self.uses[vreg][0])
+        self.locations[victim] = self.assembly.spill(self.locations[victim])
@@ -0,0 +1,112 @@
+from typing import Iterator
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from .defs import Token
+from .scan import Scanner
+
+
+class NumpyScanner(Scanner):
+    BLOCK_SIZE = 1 << 24
+
+    # Literals of up to 18 digits always fit in an int64.
+    MAX_DIGITS = 18
+
+    SPACE, NEWLINE, DIGIT, ERROR = range(4)
+    OPERATOR_BYTES = {
+        b'+': Scanner.OPERATORS['T_PLUS'],
+        b'-': Scanner.OPERATORS['T_MINUS'],
+        b'*': Scanner.OPERATORS['T_STAR'],
+        b'/': Scanner.OPERATORS['T_SLASH'],
+    }
+
+    def __init__(self, context) -> None:
+        super().__init__(context)
+
+        self.classes = np.full(256, self.ERROR, dtype=np.uint8)
+        self.classes[list(b' \t\r\x0b\x0c')] = self.SPACE
+        self.classes[ord('\n')] = self.NEWLINE
+        self.classes[ord('0'):ord('9') + 1] = self.DIGIT
+        self.operators = [None] * (len(self.OPERATOR_BYTES) + self.ERROR + 1)
+        for code, (op, token) in enumerate(self.OPERATOR_BYTES.items(), self.ERROR + 1):
+            self.classes[ord(op)] = code
+            self.operators[code] = token
+
+        self.powers = 10 ** np.arange(self.MAX_DIGITS, dtype=np.int64)
+
+    def tokens(self) -> Iterator[Token]:
+        buffer = self.context.buffer
+        if buffer is None:
+            buffer = self.read().encode()
+        data = np.frombuffer(buffer, dtype=np.uint8)
+
+        pos = 0
+        while pos < len(data):
+            end = self.block_end(data, pos)
+            yield from self.lex_block(buffer, data, pos, end)
+            pos = end
+
+        yield self.EOF
+
+    def block_end(self, data, pos: int) -> int:
+        end = min(pos + self.BLOCK_SIZE, len(data))
+        # Never split a literal between two blocks.
+        while end < len(data) and self.classes[data[end]] == self.DIGIT:
+            end += 1
+        return end
+
+    def lex_block(self, buffer, data, start: int, end: int) -> Iterator[Token]:
+        classes = self.classes[data[start:end]]
+
+        errors = np.flatnonzero(classes == self.ERROR)
+        if errors.size:
+            classes = classes[:errors[0]]
+
+        is_digit = classes == self.DIGIT
+        edges = np.diff(is_digit.view(np.int8), prepend=0, append=0)
+        literal_starts = np.flatnonzero(edges == 1)
+        literal_ends = np.flatnonzero(edges == -1)
+        operators = np.flatnonzero(classes > self.ERROR)
+        newlines = np.flatnonzero(classes == self.NEWLINE)
+
+        positions = np.concatenate([literal_starts, operators])
+        order = np.argsort(positions, kind='stable')
+        positions = positions[order]
+        kinds = classes[positions].tolist()
+        line = self.context.line
+        lines = (np.searchsorted(newlines, positions) + line).tolist()
+        values = iter(self.literal_values(
+            buffer, data, literal_starts + start, literal_ends + start
+        ))
+
+        for kind, token_line in zip(kinds, lines):
+            self.context.line = token_line
+            if kind == self.DIGIT:
+                yield Token(Token.Type.T_INTLIT, next(values))
+            else:
+                yield self.operators[kind]
+
+        self.context.line = line + len(newlines)
+        if errors.size:
+            match = self.BYTES_PATTERN.match(buffer, start + errors[0])
+            self.unrecognized(match.group())
+
+    def literal_values(self, buffer, data, starts, ends) -> list[int]:
+        lengths = ends - starts
+        if not lengths.size:
+            return []
+
+        # Weight every digit by its power of ten and sum each run.
+        digits = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        run = np.repeat(np.arange(lengths.size), lengths)
+        index = np.arange(run.size) - digits[run] + starts[run]
+        exponent = np.minimum(ends[run] - 1 - index, self.MAX_DIGITS - 1)
+        weighted = (data[index].astype(np.int64) - ord('0')) * self.powers[exponent]
+        values = np.add.reduceat(weighted, digits).tolist()
+
+        for i in np.flatnonzero(lengths > self.MAX_DIGITS).tolist():
+            values[i] = int(bytes(buffer[starts[i]:ends[i]]))
+        return values
@@ -0,0 +1,10 @@
+from abc import ABCMeta, abstractmethod
+
+
+class Pass(metaclass=ABCMeta):
+    @abstractmethod
+    def run(self, tree, node):
+        pass
+
+    def stats(self) -> dict:
+        return {}
@@ -0,0 +1,82 @@
+from puroboros.defs import ASTNode
+from puroboros.exceptions import OptimizationError
+from puroboros.opt.base import Pass
+
+
+INT64_MIN = -(1 << 63)
+UINT64_MASK = (1 << 64) - 1
+
+
+def wrap(value: int) -> int:
+    return ((value - INT64_MIN) & UINT64_MASK) + INT64_MIN
+
+
+def evaluate(op: ASTNode.Type, left: int, right: int) -> int:
+    left, right = wrap(left), wrap(right)
+    match op:
+        case ASTNode.Type.A_ADD:
+            return wrap(left + right)
+        case ASTNode.Type.A_SUBTRACT:
+            return wrap(left - right)
+        case ASTNode.Type.A_MULTIPLY:
+            return wrap(left * right)
+        case ASTNode.Type.A_DIVIDE:
+            if right == 0:
+                msg = 'Division by zero in constant expression'
+                raise OptimizationError(msg)
+            # C division truncates towards zero.
+            quotient = abs(left) // abs(right)
+            return wrap(-quotient if (left < 0) != (right < 0) else quotient)
+        case _:
+            msg = f'Cannot evaluate AST operator {op}'
+            raise OptimizationError(msg)
+
+
+class ConstantFolding(Pass):
+    def run(self, tree, node):
+        # Folded nodes by key, see Interning in puroboros.tree.
+        folded = {}
+        results = []
+        stack = [(node, None)]
+        while stack:
+            node, children = stack.pop()
+            if children is None:
+                if (done := folded.get(tree.key(node))) is not None:
+                    results.append(done)
+                    continue
+                left, right = tree.left(node), tree.right(node)
+                if left is None or right is None:
+                    results.append(node)
+                    continue
+                stack.append((node, (left, right)))
+                stack.append((right, None))
+                stack.append((left, None))
+                continue
+
+            left, right = children
+            new_right = results.pop()
+            new_left = results.pop()
+            result = self.fold(tree, node, left, right, new_left, new_right)
+            folded[tree.key(node)] = result
+            results.append(result)
+
+        return results.pop()
+
+    def fold(self, tree, node, left, right, new_left, new_right):
+        if (
+            tree.op(new_left) == ASTNode.Type.A_INTLIT and
+            tree.op(new_right) == ASTNode.Type.A_INTLIT
+        ):
+            value = evaluate(
+                tree.op(node),
+                tree.intvalue(new_left),
+                tree.intvalue(new_right),
+            )
+            return tree.intlit(value)
+
+        if (
+            tree.key(new_left) == tree.key(left) and
+            tree.key(new_right) == tree.key(right)
+        ):
+            return node
+        return tree.binary(tree.op(node), new_left, new_right)
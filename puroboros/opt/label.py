@@ -0,0 +1,34 @@
+def sethi_ullman(tree, node, immediate=None) -> dict:
+    labels = {}
+    stack = [(node, False)]
+    while stack:
+        node, visited = stack.pop()
+        # Labelled once per key, see Interning in puroboros.tree.
+        if not visited and tree.key(node) in labels:
+            continue
+        left, right = tree.left(node), tree.right(node)
+        if left is None or right is None:
+            labels[tree.key(node)] = 1
+            continue
+        if not visited:
+            stack.append((node, True))
+            stack.append((right, False))
+            stack.append((left, False))
+            continue
+
+        # A constant the target encodes in the instruction needs no register.
+        if immediate is not None and (operand := immediate(node, left, right)) is not None:
+            constant = right if tree.key(operand[0]) == tree.key(left) else left
+            labels[tree.key(constant)] = 0
+
+        left_label = labels[tree.key(left)]
+        right_label = labels[tree.key(right)]
+        if left_label == right_label:
+            labels[tree.key(node)] = left_label + 1
+        else:
+            labels[tree.key(node)] = max(left_label, right_label)
+    return labels
+
+
+def registers_needed(tree, node) -> int:
+    return sethi_ullman(tree, node)[tree.key(node)]
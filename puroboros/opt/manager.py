@@ -0,0 +1,26 @@
+from puroboros.opt.fold import ConstantFolding
+
+
+class PassManager:
+    LEVELS = {
+        0: [],
+        1: [ConstantFolding],
+    }
+
+    def __init__(self, passes) -> None:
+        self.passes = list(passes)
+
+    @classmethod
+    def for_level(cls, level: int) -> 'PassManager':
+        return cls(pass_class() for pass_class in cls.LEVELS[level])
+
+    def stats(self) -> dict:
+        stats = {}
+        for optimization in self.passes:
+            stats.update(optimization.stats())
+        return stats
+
+    def run(self, tree, node):
+        for optimization in self.passes:
+            node = optimization.run(tree, node)
+        return node
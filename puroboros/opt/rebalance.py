@@ -0,0 +1,128 @@
+from puroboros.defs import ASTNode
+from puroboros.opt.base import Pass
+from puroboros.opt.label import registers_needed
+
+
+# Associative and commutative under 64-bit wraparound.
+ASSOCIATIVE = {ASTNode.Type.A_ADD, ASTNode.Type.A_MULTIPLY}
+
+
+def depth(tree, node) -> int:
+    depths = {}
+    stack = [(node, False)]
+    while stack:
+        node, visited = stack.pop()
+        if not visited and tree.key(node) in depths:
+            continue
+        left, right = tree.left(node), tree.right(node)
+        if left is None or right is None:
+            depths[tree.key(node)] = 1
+            continue
+        if not visited:
+            stack.append((node, True))
+            stack.append((right, False))
+            stack.append((left, False))
+            continue
+        depths[tree.key(node)] = 1 + max(depths[tree.key(left)], depths[tree.key(right)])
+    return depths[tree.key(node)]
+
+
+class Rebalance(Pass):
+    def __init__(self) -> None:
+        self.before = {}
+        self.after = {}
+
+    def stats(self) -> dict:
+        return {
+            'tree depth before rebalancing': self.before.get('depth'),
+            'tree depth after rebalancing': self.after.get('depth'),
+            'registers needed before rebalancing': self.before.get('registers'),
+            'registers needed after rebalancing': self.after.get('registers'),
+        }
+
+    def run(self, tree, node):
+        self.before = self.measure(tree, node)
+        node = self.rebalance(tree, node)
+        self.after = self.measure(tree, node)
+        return node
+
+    @staticmethod
+    def measure(tree, node) -> dict:
+        return {
+            'depth': depth(tree, node),
+            'registers': registers_needed(tree, node),
+        }
+
+    def rebalance(self, tree, node):
+        # Rebalanced nodes by key, see Interning in puroboros.tree.
+        done = {}
+        results = []
+        stack = [(node, None)]
+        while stack:
+            node, operands = stack.pop()
+            if operands is None:
+                if (result := done.get(tree.key(node))) is not None:
+                    results.append(result)
+                    continue
+                left, right = tree.left(node), tree.right(node)
+                if left is None or right is None:
+                    results.append(node)
+                    continue
+                if tree.op(node) in ASSOCIATIVE:
+                    operands = self.operands(tree, node)
+                else:
+                    operands = [left, right]
+                stack.append((node, operands))
+                stack.extend((operand, None) for operand in reversed(operands))
+                continue
+
+            new_operands = results[len(results) - len(operands):]
+            del results[len(results) - len(operands):]
+            if tree.op(node) in ASSOCIATIVE and len(operands) > 2:
+                result = self.balance(tree, tree.op(node), new_operands)
+            elif all(
+                tree.key(new) == tree.key(old)
+                for new, old in zip(new_operands, operands)
+            ):
+                result = node
+            else:
+                result = tree.binary(tree.op(node), *new_operands)
+            done[tree.key(node)] = result
+            results.append(result)
+
+        return results.pop()
+
+    @staticmethod
+    def operands(tree, node) -> list:
+        # The maximal run of node's operator, flattened left to right. A
+        # node seen twice in a DAG stays an operand instead of being
+        # expanded again.
+        op = tree.op(node)
+        seen = set()
+        operands = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            left, right = tree.left(node), tree.right(node)
+            if (
+                tree.op(node) != op or left is None or right is None or
+                tree.key(node) in seen
+            ):
+                operands.append(node)
+                continue
+            seen.add(tree.key(node))
+            stack.append(right)
+            stack.append(left)
+        return operands
+
+    @staticmethod
+    def balance(tree, op: ASTNode.Type, operands: list):
+        while len(operands) > 1:
+            paired = [
+                tree.binary(op, operands[i], operands[i + 1])
+                for i in range(0, len(operands) - 1, 2)
+            ]
+            if len(operands) % 2:
+                paired.append(operands[-1])
+            operands = paired
+        return operands[0]
@@ -1,57 +1,150 @@
-import string
+import os
+import re
+from importlib.util import find_spec
+from typing import Iterator, NoReturn
 
 from .context import Context
 from .defs import Token
 from .exceptions import ScannerError
 
 
+def _pattern(error: str) -> str:
+    lexemes = [
+        ('NEWLINE', r'\n+'),
+        ('SPACE', r'[ \t\r\x0b\x0c]+'),
+        ('T_INTLIT', r'[0-9]+'),
+        ('T_PLUS', r'\+'),
+        ('T_MINUS', r'-'),
+        ('T_STAR', r'\*'),
+        ('T_SLASH', r'/'),
+        ('ERROR', error),
+    ]
+    return '|'.join(f'(?P<{name}>{regex})' for name, regex in lexemes)
+
+
 class Scanner:
+    CHUNK_SIZE = 1 << 16
+
+    PATTERN = re.compile(_pattern(r'.'), re.DOTALL)
+    BYTES_PATTERN = re.compile(
+        _pattern(r'[\xc0-\xff][\x80-\xbf]*|.').encode('latin-1'),
+        re.DOTALL,
+    )
+
+    # Tokens are immutable, so every operator and EOF token is shared.
+    OPERATORS = {
+        'T_PLUS': Token(Token.Type.T_PLUS),
+        'T_MINUS': Token(Token.Type.T_MINUS),
+        'T_STAR': Token(Token.Type.T_STAR),
+        'T_SLASH': Token(Token.Type.T_SLASH),
+    }
+    EOF = Token(Token.Type.T_EOF)
+
     def __init__(self, context: Context) -> None:
         self.context = context
+        self.stream = None
+        self.pending = []
+
+    def tokens(self) -> Iterator[Token]:
+        if self.context.buffer is not None:
+            yield from self.lex(self.context.buffer, self.BYTES_PATTERN)
+        else:
+            yield from self.lex_chunks()
+
+        yield self.EOF
+
+    def lex_chunks(self) -> Iterator[Token]:
+        buffer = ''
+        while True:
+            chunk = self.read(self.CHUNK_SIZE)
+            buffer += chunk
+            pos = yield from self.lex(buffer, self.PATTERN, final=not chunk)
+            if not chunk:
+                break
+            buffer = buffer[pos:]
+
+    def read(self, size: int = -1) -> str:
+        try:
+            return self.context.infile.read(size)
+        except UnicodeDecodeError as error:
+            msg = f'Cannot decode input as {error.encoding}: {error.reason}'
+            raise ScannerError(msg) from error
+
+    def lex(self, buffer, pattern: re.Pattern, final: bool = True) -> Iterator[Token]:
+        pos = 0
+        for match in pattern.finditer(buffer):
+            # A lexeme touching the end of a chunk may continue in
+            # the next one, so it is rescanned once that is read.
+            if not final and match.end() == len(buffer):
+                return pos
+            pos = match.end()
 
-    def next(self) -> str:
-        if c := self.context.putback_c:
-            self.context.putback_c = None
-            return c
-
-        c = self.context.infile.read(1)
-        if ('\n' == c):
-            self.context.line += 1
-        return c
-
-    def putback(self, c: str) -> None:
-        self.context.putback_c = c
-
-    def skip(self) -> str:
-        c = self.next()
-        while c and c in string.whitespace:
-            c = self.next()
-        return c
-
-    def scanint(self, c: str) -> int:
-        val = 0
-        while c and (pos := string.digits.find(c)) >= 0:
-            val = val * 10 + pos
-            c = self.next()
-        self.putback(c)
-        return val
+            match match.lastgroup:
+                case 'NEWLINE':
+                    self.context.line += pos - match.start()
+                case 'SPACE':
+                    pass
+                case 'T_INTLIT':
+                    yield Token(Token.Type.T_INTLIT, int(match.group()))
+                case 'ERROR':
+                    self.unrecognized(match.group())
+                case kind:
+                    yield self.OPERATORS[kind]
+        return pos
+
+    def unrecognized(self, c) -> NoReturn:
+        if isinstance(c, bytes):
+            c = c.decode(errors='replace')
+        msg = (f'Unrecognized character "{c}"'
+               f' on line {self.context.line}')
+        raise ScannerError(msg)
+
+    def putback(self, token: Token) -> None:
+        self.pending.append(token)
+
+    def peek(self) -> Token:
+        token = self.scan()
+        self.putback(token)
+        return token
 
     def scan(self) -> Token:
-        c = self.skip()
-        match c:
-            case '':
-                return Token(Token.Type.T_EOF)
-            case '+':
-                return Token(Token.Type.T_PLUS)
-            case '-':
-                return Token(Token.Type.T_MINUS)
-            case '*':
-                return Token(Token.Type.T_STAR)
-            case '/':
-                return Token(Token.Type.T_SLASH)
-            case c if c.isdigit():
-                return Token(Token.Type.T_INTLIT, self.scanint(c))
+        if self.pending:
+            return self.pending.pop()
+
+        if self.stream is None:
+            self.stream = self.tokens()
+        return next(self.stream, self.EOF)
+
+
+class ScannerFactory:
+    # Below this many bytes importing numpy costs more than it saves.
+    NUMPY_THRESHOLD = 1 << 19
+
+    @staticmethod
+    def input_size(context: Context) -> int:
+        if context.buffer is not None:
+            return len(context.buffer)
+        # Files are measured on disk; streams without one count as small.
+        try:
+            return os.fstat(context.infile.fileno()).st_size
+        except (AttributeError, OSError):
+            return 0
+
+    @staticmethod
+    def create(context: Context, backend: str = 'auto') -> Scanner:
+        if backend == 'auto':
+            large = ScannerFactory.input_size(context) >= ScannerFactory.NUMPY_THRESHOLD
+            backend = 'numpy' if large and find_spec('numpy') else 'python'
+
+        match backend:
+            case 'python':
+                return Scanner(context)
+            case 'numpy':
+                from .npscan import NumpyScanner, np
+                if np is None:
+                    msg = 'The numpy scanner backend requires numpy'
+                    raise ScannerError(msg)
+                return NumpyScanner(context)
             case _:
-                msg = (f'Unrecognized character "{c}"'
-                       f' on line {self.context.line}')
+                msg = f'Unknown scanner backend {backend}'
                 raise ScannerError(msg)
@@ -0,0 +1,158 @@
+import asyncio
+import base64
+import io
+import json
+import os
+import platform
+import signal
+import socket
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from puroboros.context import Context
+from puroboros.driver import ERRORS, compile_tree, new_tree
+from puroboros.expr import Parser
+from puroboros.opt.manager import PassManager
+from puroboros.scan import ScannerFactory
+
+
+# A request is one line, so this bounds the source size.
+MAX_REQUEST = 1 << 26
+# Request fields besides the source, with their types.
+OPTIONS = {
+    'system': str,
+    'arch': str,
+    'optimize': int,
+    'output_format': str,
+    'arena': bool,
+    'rebalance': bool,
+    'intern': bool,
+    'ir': bool,
+    'peephole': bool,
+    'schedule': bool,
+}
+
+
+def compile_request(request, system: str, machine: str) -> dict:
+    if not isinstance(request, dict) or not isinstance(request.get('source'), str):
+        return {'error': 'Invalid request: expected an object with a source string'}
+    options = {name: value for name, value in request.items() if name != 'source'}
+    for name, value in options.items():
+        if type(value) is not OPTIONS.get(name):
+            return {'error': f'Invalid request: bad option {name}'}
+    if options.get('optimize', 0) not in PassManager.LEVELS:
+        return {'error': f'Invalid request: no optimization level {options["optimize"]}'}
+
+    context = Context()
+    try:
+        context.buffer = request['source'].encode()
+    except UnicodeEncodeError as error:
+        # JSON can carry lone surrogates, which have no UTF-8 encoding.
+        return {'error': f'Invalid request: {error}'}
+    binary = options.get('output_format', 'asm') != 'asm'
+    sink = io.BytesIO() if binary else io.StringIO()
+    try:
+        tree = new_tree(options.pop('arena', False), options.get('intern', False))
+        node, _ = Parser(ScannerFactory.create(context), tree).bin_expr()
+        compile_tree(
+            tree,
+            node,
+            sink,
+            options.pop('system', system),
+            options.pop('arch', machine),
+            **options,
+        )
+    except ERRORS as error:
+        return {'error': f'{type(error).__name__}: {error}'}
+
+    if binary:
+        return {'output': base64.b64encode(sink.getvalue()).decode(), 'encoding': 'base64'}
+    return {'output': sink.getvalue()}
+
+
+def _worker_signals() -> None:
+    # Ctrl-C reaches the whole process group; the server alone decides
+    # when workers stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+class CompileServer:
+    def __init__(self, path: str, jobs: int = 1) -> None:
+        self.path = path
+        self.jobs = jobs
+        # The target defaults are looked up once, not per request.
+        self.system = platform.system()
+        self.machine = platform.machine()
+        self.requests = 0
+        self.executor = None
+
+    async def serve(self, started=None) -> None:
+        self._remove_stale_socket()
+        # Compiles run off the event loop, which keeps serving other
+        # clients meanwhile; several jobs use warm worker processes.
+        if self.jobs > 1:
+            self.executor = ProcessPoolExecutor(self.jobs, initializer=_worker_signals)
+        else:
+            self.executor = ThreadPoolExecutor(1)
+        server = await asyncio.start_unix_server(
+            self.handle,
+            path=self.path,
+            limit=MAX_REQUEST,
+        )
+        try:
+            async with server:
+                if started is not None:
+                    started()
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+            os.unlink(self.path)
+
+    async def compile(self, request) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, compile_request, request, self.system, self.machine,
+        )
+
+    async def handle(self, reader, writer) -> None:
+        try:
+            while line := await self.readline(reader):
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    response = {'error': f'Invalid request: {error}'}
+                else:
+                    response = await self.compile(request)
+                self.requests += 1
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError):
+            # The client went away, or sent a line over MAX_REQUEST.
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def readline(reader) -> bytes:
+        # Unlike StreamReader.readline, an overlong line raises
+        # LimitOverrunError rather than a bare ValueError.
+        try:
+            return await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as error:
+            # The last request may end without a newline.
+            return error.partial
+
+    def _remove_stale_socket(self) -> None:
+        # A socket file nobody listens on is left over from a crash.
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except ConnectionRefusedError:
+            os.unlink(self.path)
+            return
+        finally:
+            probe.close()
+        msg = f'A server is already listening on {self.path}'
+        raise OSError(msg)
@@ -0,0 +1,205 @@
+from array import array
+from typing import Optional
+
+from puroboros.defs import ASTNode
+
+
+class ObjectTree:
+    def intlit(self, value: int) -> ASTNode:
+        return ASTNode(op=ASTNode.Type.A_INTLIT, intvalue=value)
+
+    def binary(self, op: ASTNode.Type, left: ASTNode, right: ASTNode) -> ASTNode:
+        return ASTNode(op=op, left=left, right=right)
+
+    def op(self, node: ASTNode) -> ASTNode.Type:
+        return node.op
+
+    def left(self, node: ASTNode) -> Optional[ASTNode]:
+        return node.left
+
+    def right(self, node: ASTNode) -> Optional[ASTNode]:
+        return node.right
+
+    def intvalue(self, node: ASTNode) -> Optional[int]:
+        return node.intvalue
+
+    def key(self, node: ASTNode) -> int:
+        return id(node)
+
+
+# Struct-of-arrays node store; nodes are referred to by their index.
+class ASTArena:
+    NONE = -1
+    OPS = sorted(ASTNode.Type, key=lambda op: op.value)
+
+    def __init__(self) -> None:
+        self.ops = array('B')
+        self.lefts = array('i')
+        self.rights = array('i')
+        self.intvalues = array('q')
+        # Literals that do not fit in 64 bits, by node index.
+        self.bigvalues = {}
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def intlit(self, value: int) -> int:
+        index = len(self.ops)
+        try:
+            self.intvalues.append(value)
+        except OverflowError:
+            self.intvalues.append(0)
+            self.bigvalues[index] = value
+        self.ops.append(ASTNode.Type.A_INTLIT.value)
+        self.lefts.append(self.NONE)
+        self.rights.append(self.NONE)
+        return index
+
+    def binary(self, op: ASTNode.Type, left: int, right: int) -> int:
+        index = len(self.ops)
+        self.ops.append(op.value)
+        self.lefts.append(left)
+        self.rights.append(right)
+        self.intvalues.append(0)
+        return index
+
+    def op(self, node: int) -> ASTNode.Type:
+        return self.OPS[self.ops[node]]
+
+    def left(self, node: int) -> Optional[int]:
+        left = self.lefts[node]
+        return None if left == self.NONE else left
+
+    def right(self, node: int) -> Optional[int]:
+        right = self.rights[node]
+        return None if right == self.NONE else right
+
+    def intvalue(self, node: int) -> Optional[int]:
+        if self.ops[node] != ASTNode.Type.A_INTLIT.value:
+            return None
+        if self.bigvalues and node in self.bigvalues:
+            return self.bigvalues[node]
+        return self.intvalues[node]
+
+    def key(self, node: int) -> int:
+        return node
+
+
+class Interning:
+    # Mixed into a tree class: structurally identical nodes are created
+    # once and shared, so the tree becomes a DAG. Walks over such a tree
+    # memoize by tree.key(node) and handle each shared node once; a plain
+    # tree walk would revisit it once per path, exponentially many.
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.literals = {}
+        # Keyed by (right, left, op) packed into one int; much smaller
+        # than a tuple per node.
+        self.binaries = {}
+        self.shared = 0
+
+    def intlit(self, value: int):
+        if (node := self.literals.get(value)) is not None:
+            self.shared += 1
+            return node
+        node = self.literals[value] = super().intlit(value)
+        return node
+
+    def binary(self, op: ASTNode.Type, left, right):
+        key = ((self.key(right) << 64 | self.key(left)) << 3) | op.value
+        if (node := self.binaries.get(key)) is not None:
+            self.shared += 1
+            return node
+        node = self.binaries[key] = super().binary(op, left, right)
+        return node
+
+    def stats(self) -> dict:
+        return {
+            'unique nodes': len(self.literals) + len(self.binaries),
+            'shared nodes': self.shared,
+        }
+
+
+class InterningObjectTree(Interning, ObjectTree):
+    pass
+
+
+class InterningArena(ASTArena):
+    # Interning for the arena. Its table is an open-addressing array of
+    # node indices, compared against the node arrays, so it costs a few
+    # bytes per node where a dict entry would outweigh the node itself.
+    def __init__(self) -> None:
+        super().__init__()
+        self.table = array('i', [self.NONE]) * 8
+        self.shared = 0
+
+    def intlit(self, value: int) -> int:
+        return self._intern(ASTNode.Type.A_INTLIT.value, self.NONE, self.NONE, value)
+
+    def binary(self, op: ASTNode.Type, left: int, right: int) -> int:
+        return self._intern(op.value, left, right, None)
+
+    def _intern(self, op: int, left: int, right: int, value) -> int:
+        slot = self._slot(op, left, right, value)
+        if (node := self.table[slot]) != self.NONE:
+            self.shared += 1
+            return node
+        if value is None:
+            node = super().binary(self.OPS[op], left, right)
+        else:
+            node = super().intlit(value)
+        self.table[slot] = node
+        # Linear probing stays short below two thirds full.
+        if 3 * len(self) > 2 * len(self.table):
+            self._grow()
+        return node
+
+    def _slot(self, op: int, left: int, right: int, value) -> int:
+        table, mask = self.table, len(self.table) - 1
+        slot = hash((op, left, right, value)) & mask
+        while (node := table[slot]) != self.NONE:
+            if (
+                self.ops[node] == op
+                and self.lefts[node] == left
+                and self.rights[node] == right
+                and (value is None or self.intvalue(node) == value)
+            ):
+                break
+            slot = slot + 1 & mask
+        return slot
+
+    def _grow(self) -> None:
+        self.table = array('i', [self.NONE]) * (2 * len(self.table))
+        for node in range(len(self)):
+            op = self.ops[node]
+            value = self.intvalue(node) if op == ASTNode.Type.A_INTLIT.value else None
+            self.table[self._slot(op, self.lefts[node], self.rights[node], value)] = node
+
+    def stats(self) -> dict:
+        return {
+            'unique nodes': len(self),
+            'shared nodes': self.shared,
+        }
+
+
+def rebuild(tree, node, factory):
+    results = []
+    stack = [(node, False)]
+    while stack:
+        node, visited = stack.pop()
+        left, right = tree.left(node), tree.right(node)
+        if visited:
+            right_copy = results.pop() if right is not None else None
+            left_copy = results.pop() if left is not None else None
+            if tree.op(node) == ASTNode.Type.A_INTLIT:
+                results.append(factory.intlit(tree.intvalue(node)))
+            else:
+                results.append(factory.binary(tree.op(node), left_copy, right_copy))
+            continue
+
+        stack.append((node, True))
+        if right is not None:
+            stack.append((right, False))
+        if left is not None:
+            stack.append((left, False))
+    return results.pop()
@@ -0,0 +1,113 @@
+import re
+
+from puroboros.gen import CodeGenerator
+
+
+MASK = (1 << 64) - 1
+
+
+def signed(value: int) -> int:
+    value &= MASK
+    return value - (1 << 64) if value >> 63 else value
+
+
+class ARM64Emulator:
+    OPERAND = re.compile(r'\[[^\]]*\]|[^,\s][^,]*')
+
+    def __init__(self) -> None:
+        self.registers = {'sp': 1 << 20, 'xzr': 0}
+        self.memory = {}
+        self.exit_code = None
+
+    def read(self, operand: str) -> int:
+        if operand.startswith('#'):
+            return int(operand[1:], 0)
+        return self.registers.get(operand, 0)
+
+    def write(self, register: str, value: int) -> None:
+        if register != 'xzr':
+            self.registers[register] = value & MASK
+
+    def address(self, operand: str) -> int:
+        base, *offset = [part.strip() for part in operand[1:-1].split(',')]
+        return self.read(base) + (self.read(offset[0]) if offset else 0)
+
+    def shifted(self, operands: list) -> int:
+        value = self.read(operands[0])
+        if len(operands) == 1:
+            return value
+        kind, amount = operands[1].split()
+        amount = int(amount[1:], 0)
+        match kind:
+            case 'lsl':
+                return (value << amount) & MASK
+            case 'lsr':
+                return value >> amount
+            case 'asr':
+                return (signed(value) >> amount) & MASK
+
+    def run(self, source: str) -> 'ARM64Emulator':
+        for line in source.splitlines():
+            line = line.split('//')[0].strip()
+            if not line or line.endswith(':') or line.startswith('.'):
+                continue
+            opcode, _, rest = line.partition(' ')
+            self.execute(opcode, self.OPERAND.findall(rest))
+        return self
+
+    def execute(self, opcode: str, operands: list) -> None:
+        a = [operand.strip() for operand in operands]
+        match opcode:
+            case 'mov':
+                self.write(a[0], self.read(a[1]))
+            case 'movz':
+                self.write(a[0], self.shifted(a[1:]))
+            case 'movn':
+                self.write(a[0], ~self.shifted(a[1:]))
+            case 'movk':
+                shift = int(a[2].split('#')[1], 0) if len(a) > 2 else 0
+                value = self.read(a[0]) & ~(0xffff << shift)
+                self.write(a[0], value | (self.read(a[1]) << shift))
+            case 'add':
+                self.write(a[0], self.read(a[1]) + self.shifted(a[2:]))
+            case 'sub':
+                self.write(a[0], self.read(a[1]) - self.shifted(a[2:]))
+            case 'neg':
+                self.write(a[0], -self.shifted(a[1:]))
+            case 'mul':
+                self.write(a[0], self.read(a[1]) * self.read(a[2]))
+            case 'smulh':
+                product = signed(self.read(a[1])) * signed(self.read(a[2]))
+                self.write(a[0], product >> 64)
+            case 'sdiv':
+                dividend, divisor = signed(self.read(a[1])), signed(self.read(a[2]))
+                if divisor == 0:
+                    self.write(a[0], 0)
+                else:
+                    quotient = abs(dividend) // abs(divisor)
+                    negative = (dividend < 0) != (divisor < 0)
+                    self.write(a[0], -quotient if negative else quotient)
+            case 'lsl':
+                self.write(a[0], self.read(a[1]) << self.read(a[2]))
+            case 'lsr':
+                self.write(a[0], self.read(a[1]) >> self.read(a[2]))
+            case 'asr':
+                self.write(a[0], signed(self.read(a[1])) >> self.read(a[2]))
+            case 'str':
+                self.memory[self.address(a[1])] = self.read(a[0])
+            case 'ldr':
+                self.write(a[0], self.memory[self.address(a[1])])
+            case 'svc':
+                self.exit_code = self.read('x0')
+            case _:
+                raise ValueError(f'Unsupported instruction {opcode}')
+
+    def value(self, register: str) -> int:
+        return signed(self.read(register))
+
+
+def run_generated(node, tree=None, **options) -> tuple:
+    # Compile for Darwin ARM64 and return the generator with the result.
+    gen = CodeGenerator('Darwin', 'arm64', **options)
+    register = gen.generate(node, tree)
+    return gen, ARM64Emulator().run(gen.assembly.output).value(register.name)
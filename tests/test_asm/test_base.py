@@ -1,5 +1,11 @@
+from io import StringIO
+
+import pytest
+
 from puroboros.asm.register import Register
-from puroboros.asm.base import AssemblyBase
+from puroboros.asm.base import Assembly, AssemblyBase
+from puroboros.asm.instruction import Instruction
+from puroboros.exceptions import CodeGenerationError
 
 
 class TestAssemblyBase:
@@ -21,3 +27,127 @@ class TestAssemblyBase:
             Register('x0'),
             Register('x1'),
         ]
+
+    def test_meta_defaults(self):
+        class ASM(AssemblyBase):
+            pass
+
+        assert ASM._meta == {
+            'registers': [],
+            'peephole': None,
+            'scheduler': None,
+            'formats': {},
+        }
+
+    def test_set_passes_without_peephole(self):
+        class ASM(AssemblyBase):
+            class Meta:
+                registers = []
+        asm = ASM()
+        asm.set_passes('peephole')
+        asm.emit('mov', 'x0', 'x0')
+        asm.flush(final=True)
+
+        assert asm.optimizer_stats() == {}
+        assert asm.output == 'mov x0, x0\n'
+
+    def test_set_passes_rewrites_output(self):
+        class Peephole:
+            def run(self, instructions, final):
+                return instructions[1:]
+
+            def stats(self):
+                return {'removed': 1}
+
+        class ASM(AssemblyBase):
+            class Meta:
+                registers = []
+                peephole = Peephole
+        asm = ASM()
+        asm.set_passes('peephole')
+        asm.emit('mov', 'x0', '#1')
+        asm.emit('mov', 'x0', '#2')
+        asm.flush(final=True)
+
+        assert asm.optimizer_stats() == {'removed': 1}
+        assert asm.output == 'mov x0, #2\n'
+
+    def test_emit(self):
+        class ASM(AssemblyBase):
+            class Meta:
+                registers = ['x0']
+        asm = ASM()
+        asm.emit('add', asm.registers.pool[0], 'x1', '#2')
+        asm.emit('svc', '#0x80')
+
+        assert asm.instructions == [
+            Instruction('add', 'x0', 'x1', '#2'),
+            Instruction('svc', '#0x80'),
+        ]
+        assert asm.output == 'add x0, x1, #2\nsvc #0x80\n'
+
+    def test_sink(self):
+        class ASM(AssemblyBase):
+            FLUSH_THRESHOLD = 2
+
+            class Meta:
+                registers = []
+        sink = StringIO()
+        asm = ASM(sink)
+        asm.emit('mov', 'x0', '#1')
+
+        assert sink.getvalue() == ''
+        assert asm.output == 'mov x0, #1\n'
+
+        asm.emit('mov', 'x0', '#2')
+        asm.emit('svc', '#0x80')
+
+        assert sink.getvalue() == 'mov x0, #1\nmov x0, #2\n'
+        assert asm.output == 'svc #0x80\n'
+
+        asm.flush(final=True)
+
+        assert sink.getvalue() == 'mov x0, #1\nmov x0, #2\nsvc #0x80\n'
+        assert asm.output == ''
+
+    def test_output_format(self):
+        class Writer:
+            def __init__(self, stream):
+                self.stream = stream
+
+            def write(self, instructions):
+                self.stream.extend(instructions)
+
+            def flush(self):
+                pass
+
+        class ASM(AssemblyBase):
+            class Meta:
+                registers = []
+                formats = {'list': Writer}
+        sink = []
+        asm = ASM(sink, 'list')
+        asm.emit('svc', '#0x80')
+        asm.flush(final=True)
+
+        assert sink == [Instruction('svc', '#0x80')]
+
+    def test_unsupported_output_format(self):
+        class ASM(AssemblyBase):
+            class Meta:
+                registers = []
+
+        with pytest.raises(CodeGenerationError):
+            ASM(StringIO(), 'obj')
+
+
+class TestAssembly:
+    def test_backend_must_implement_immediates(self):
+        class ASM(Assembly):
+            load = add = sub = mul = div = copy = spill = reload = None
+
+        assert ASM.__abstractmethods__ == {
+            'add_immediate', 'sub_immediate', 'mul_immediate', 'div_immediate',
+        }
+        with pytest.raises(TypeError):
+            ASM()
@@ -1,5 +1,12 @@
+import pytest
+
 from puroboros.asm.darwin.arm64 import DarwinARM64
+from puroboros.asm.instruction import Instruction
 from puroboros.asm.register import Register
+from puroboros.defs import ASTNode
+from puroboros.exceptions import CodeGenerationError
+from puroboros.opt.fold import INT64_MIN, evaluate
+from tests.emulator import ARM64Emulator
 
 
 class TestDarwinARM64:
@@ -40,6 +47,47 @@ class TestDarwinARM64:
 
         assert asm.output == 'mov x8, #5\n'
 
+    @pytest.mark.parametrize('value,expected', [
+        (65535, ['mov x8, #65535']),
+        (-65536, ['mov x8, #-65536']),
+        (65536, ['movz x8, #0x1, lsl #16']),
+        (-65537, ['movn x8, #0x1, lsl #16']),
+        (-65538, ['movn x8, #0x1', 'movk x8, #0xfffe, lsl #16']),
+        (0x1_0000_0001, ['movz x8, #0x1', 'movk x8, #0x1, lsl #32']),
+    ])
+    def test_load_wide(self, value, expected):
+        asm = DarwinARM64()
+        asm.load(value)
+
+        assert asm.output.splitlines() == expected
+
+    @pytest.mark.parametrize('method,value,expected', [
+        ('add_immediate', 4095, 'add x8, x8, #4095'),
+        ('add_immediate', -5, 'sub x8, x8, #5'),
+        ('add_immediate', 4096, 'add x8, x8, #1, lsl #12'),
+        ('sub_immediate', 5, 'sub x8, x8, #5'),
+        ('sub_immediate', -8192, 'add x8, x8, #2, lsl #12'),
+    ])
+    def test_add_sub_immediate(self, method, value, expected):
+        asm = DarwinARM64()
+        getattr(asm, method)(asm.registers.allocate(), value)
+
+        assert asm.output == f'{expected}\n'
+
+    def test_div_emits_one_record(self):
+        asm = DarwinARM64()
+        asm.div(asm.registers.allocate(), asm.registers.allocate())
+
+        assert asm.instructions == [Instruction('sdiv', 'x8', 'x8', 'x9')]
+
+    def test_copy(self):
+        asm = DarwinARM64()
+        r1 = asm.registers.allocate()
+        r2 = asm.copy(r1)
+
+        assert asm.output == 'mov x9, x8\n'
+        assert not r1.free and not r2.free
+
     def test_add(self):
         asm = DarwinARM64()
         r1 = Register('x0', False)
@@ -71,3 +119,173 @@ class TestDarwinARM64:
         asm.div(r1, r2)
 
         assert asm.output == 'sdiv x0, x0, x1\n'
+
+    def test_spill(self):
+        asm = DarwinARM64()
+        r = asm.registers.allocate()
+        slot = asm.spill(r)
+
+        assert slot == 0
+        assert r.free is True
+        assert asm.output == (
+            'sub sp, sp, #16\n'
+            'str x8, [sp, #8]\n'
+        )
+
+    def test_spill_into_reserved_frame(self):
+        asm = DarwinARM64()
+        asm.spill(asm.registers.allocate())
+        asm.spill(asm.registers.allocate())
+
+        assert asm.output == (
+            'sub sp, sp, #16\n'
+            'str x8, [sp, #8]\n'
+            'str x8, [sp, #0]\n'
+        )
+
+    def test_reload(self):
+        asm = DarwinARM64()
+        slot = asm.spill(asm.registers.allocate())
+        asm.registers.allocate()
+        r = asm.reload(slot)
+
+        assert r.name == 'x9'
+        assert asm.output.splitlines()[-1] == 'ldr x9, [sp, #8]'
+        assert asm.frame.free_slots == [slot]
+
+    def test_spill_far_slot(self):
+        asm = DarwinARM64()
+        asm.frame.free_slots = [0]
+        asm.frame.slots = 5000
+        asm.frame.size = 40000
+        asm.spill(asm.registers.allocate())
+
+        assert asm.output == (
+            'mov x17, #39992\n'
+            'str x8, [sp, x17]\n'
+        )
+
+    def test_frame_too_large(self):
+        asm = DarwinARM64()
+        asm.frame.free_slots = [0]
+        asm.frame.slots = 10000
+        asm.frame.size = 80000
+
+        with pytest.raises(CodeGenerationError) as e:
+            asm.spill(asm.registers.allocate())
+
+        assert str(e.value) == 'Stack frame too large'
+
+    @pytest.mark.parametrize('size,expected', [
+        (16, ['add sp, sp, #16']),
+        (4096, ['add sp, sp, #1, lsl #12']),
+        (8208, ['add sp, sp, #2, lsl #12', 'add sp, sp, #16']),
+    ])
+    def test_postamble_releases_frame(self, size, expected):
+        asm = DarwinARM64()
+        asm.frame.size = size
+        asm.postamble()
+
+        assert asm.output.splitlines()[:-3] == expected
+
+    @pytest.mark.parametrize('operation,value,expected', [
+        ('mul', 0, True),
+        ('mul', 8, True),
+        ('mul', -8, True),
+        ('mul', 3, False),
+        ('div', 3, True),
+        ('div', -1, True),
+        ('div', 0, False),
+        ('add', 1, True),
+        ('add', 4096, True),
+        ('add', 4097, False),
+        ('sub', -4095, True),
+        ('sub', 1 << 24, False),
+        ('sub', INT64_MIN, False),
+        ('mul', 1 << 64, True),
+        ('mul', (1 << 64) + 3, False),
+        ('div', 1 << 64, False),
+        ('div', (1 << 64) + 1, True),
+        ('add', (1 << 64) - 1, True),
+    ])
+    def test_accepts_immediate(self, operation, value, expected):
+        assert DarwinARM64().accepts_immediate(operation, value) is expected
+
+    @pytest.mark.parametrize('value,expected', [
+        (1, []),
+        (8, ['lsl x8, x8, #3']),
+        (-2, ['lsl x8, x8, #1', 'neg x8, x8']),
+        (0, ['mov x8, #0']),
+    ])
+    def test_mul_immediate(self, value, expected):
+        asm = DarwinARM64()
+        asm.mul_immediate(asm.registers.allocate(), value)
+
+        assert asm.output.splitlines() == expected
+
+    @pytest.mark.parametrize('method,value', [
+        ('div_immediate', 1 << 64),
+        ('div_immediate', 0),
+        ('mul_immediate', 3),
+        ('sub_immediate', INT64_MIN),
+    ])
+    def test_unencodable_immediate(self, method, value):
+        asm = DarwinARM64()
+        with pytest.raises(CodeGenerationError):
+            getattr(asm, method)(asm.registers.allocate(), value)
+
+    def test_div_power_of_two(self):
+        asm = DarwinARM64()
+        asm.div_immediate(asm.registers.allocate(), 4)
+
+        assert asm.output.splitlines() == [
+            'asr x16, x8, #63',
+            'add x16, x8, x16, lsr #62',
+            'asr x8, x16, #2',
+        ]
+
+    def test_div_magic_number(self):
+        asm = DarwinARM64()
+        asm.div_immediate(asm.registers.allocate(), 7)
+
+        assert 'sdiv' not in asm.output
+        assert asm.output.splitlines()[-3:] == [
+            'smulh x16, x8, x16',
+            'asr x16, x16, #1',
+            'add x8, x16, x16, lsr #63',
+        ]
+
+
+DIVIDENDS = [
+    0, 1, -1, 2, -2, 6, -6, 7, -7, 100, -100, 12345678, -12345678,
+    2 ** 62 + 3, -2 ** 62 - 3, 2 ** 63 - 1, INT64_MIN, INT64_MIN + 1,
+]
+CONSTANTS = [
+    1, -1, 2, -2, 3, -3, 5, 7, -7, 10, 16, -16, 641, 1000, 2 ** 32 + 1,
+    2 ** 62, 2 ** 63 - 1, INT64_MIN, INT64_MIN + 1,
+    2 ** 63, 2 ** 63 + 5, 2 ** 64 - 7, 2 ** 64 + 1, 2 ** 65 + 3,
+]
+
+
+class TestDarwinARM64StrengthReduction:
+    def run(self, method, dividend, value):
+        asm = DarwinARM64()
+        register = asm.load(0)
+        getattr(asm, method)(register, value)
+        emulator = ARM64Emulator()
+        emulator.write('x8', dividend)
+        return emulator.run(asm.output.split('\n', 1)[1]).value('x8')
+
+    @pytest.mark.parametrize('value', CONSTANTS)
+    def test_div_matches_c(self, value):
+        for dividend in DIVIDENDS:
+            expected = evaluate(ASTNode.Type.A_DIVIDE, dividend, value)
+
+            assert self.run('div_immediate', dividend, value) == expected, dividend
+
+    @pytest.mark.parametrize('value', [0, 1, -1, 2, -2, 1024, 2 ** 62, INT64_MIN])
+    def test_mul_matches_c(self, value):
+        for dividend in DIVIDENDS:
+            expected = evaluate(ASTNode.Type.A_MULTIPLY, dividend, value)
+
+            assert self.run('mul_immediate', dividend, value) == expected, dividend
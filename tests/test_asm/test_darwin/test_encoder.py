@@ -0,0 +1,93 @@
+import pytest
+
+from puroboros.asm.darwin.encoder import NOP, Encoder, encode
+from puroboros.asm.instruction import Instruction
+from puroboros.exceptions import CodeGenerationError
+
+
+def parse(source):
+    return [Instruction.parse(line) for line in source.strip().splitlines()]
+
+
+class TestEncode:
+    # Reference words from the LLVM assembler.
+    @pytest.mark.parametrize('line,word', [
+        ('mov x0, #0', 0xd2800000),
+        ('mov x16, #1', 0xd2800030),
+        ('mov x8, #65535', 0xd29fffe8),
+        ('mov x8, #-5', 0x92800088),
+        ('mov x8, #-65536', 0x929fffe8),
+        ('mov x9, x8', 0xaa0803e9),
+        ('movz x8, #0x1170', 0xd2822e08),
+        ('movk x8, #0x1, lsl #16', 0xf2a00028),
+        ('movn x16, #0x5555, lsl #48', 0x92eaaab0),
+        ('add x8, x8, x9', 0x8b090108),
+        ('add x8, x8, #4095', 0x913ffd08),
+        ('sub x8, x8, #1, lsl #12', 0xd1400508),
+        ('add sp, sp, #16', 0x910043ff),
+        ('sub sp, sp, #1, lsl #12', 0xd14007ff),
+        ('add x16, x8, x16, lsr #61', 0x8b50f510),
+        ('add x8, x16, x16, lsr #63', 0x8b50fe08),
+        ('sub x16, x16, x8', 0xcb080210),
+        ('mul x8, x8, x9', 0x9b097d08),
+        ('smulh x16, x8, x16', 0x9b507d10),
+        ('sdiv x10, x10, x11', 0x9acb0d4a),
+        ('neg x8, x8', 0xcb0803e8),
+        ('lsl x8, x8, #3', 0xd37df108),
+        ('lsr x8, x8, #1', 0xd341fd08),
+        ('asr x16, x8, #63', 0x937ffd10),
+        ('str x8, [sp, #8]', 0xf90007e8),
+        ('ldr x9, [sp, #32760]', 0xf97fffe9),
+        ('str x8, [sp, x17]', 0xf8316be8),
+        ('ldr x11, [sp, x17]', 0xf8716beb),
+        ('svc #0x80', 0xd4001001),
+    ])
+    def test_known_words(self, line, word):
+        assert encode(Instruction.parse(line)) == word
+
+    @pytest.mark.parametrize('line', [
+        'mov x8, #65537',
+        'add x8, x8, #4096',
+        'add x8, x8, #1, lsl #16',
+        'add sp, sp, x9',
+        'mul x8, x8, sp',
+        'movz x8, #0x1, lsl #8',
+        'ldr x8, [sp, #4]',
+        'svc #0x10000',
+        'b _start',
+    ])
+    def test_invalid(self, line):
+        with pytest.raises(CodeGenerationError):
+            encode(Instruction.parse(line))
+
+
+class TestEncoder:
+    def test_directives(self):
+        encoder = Encoder()
+        code = encoder.encode(parse('''
+            .global _start
+            svc #0x80
+            .align 4
+            _start:
+            mov x0, #0
+        '''))
+
+        assert code == (
+            (0xd4001001).to_bytes(4, 'little') +
+            NOP.to_bytes(4, 'little') * 3 +
+            (0xd2800000).to_bytes(4, 'little')
+        )
+        assert encoder.symbols == {'_start': 16}
+        assert encoder.globals == ['_start']
+        assert encoder.alignment == 4
+
+    def test_offsets_span_chunks(self):
+        encoder = Encoder()
+        encoder.encode(parse('mov x0, #0'))
+        encoder.encode(parse('label:'))
+
+        assert encoder.symbols == {'label': 4}
+
+    def test_unknown_directive(self):
+        with pytest.raises(CodeGenerationError):
+            Encoder().encode(parse('.data'))
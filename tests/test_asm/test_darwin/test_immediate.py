@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from puroboros.asm.darwin.immediate import add_immediate, move_wide, parse_add_immediate
+from tests.emulator import ARM64Emulator, signed
+
+
+class TestAddImmediate:
+    @pytest.mark.parametrize('value,expected', [
+        (0, ('#0',)),
+        (4095, ('#4095',)),
+        (4096, ('#1', 'lsl #12')),
+        (4095 << 12, ('#4095', 'lsl #12')),
+        (4097, None),
+        (1 << 24, None),
+        (-1, None),
+    ])
+    def test_encoding(self, value, expected):
+        assert add_immediate(value) == expected
+
+    @pytest.mark.parametrize('value', [0, 1, 4095, 4096, 4095 << 12])
+    def test_round_trip(self, value):
+        assert parse_add_immediate(add_immediate(value)) == value
+
+
+class TestMoveWide:
+    @pytest.mark.parametrize('value,expected', [
+        (0, [('movz', '#0x0')]),
+        (0x10000, [('movz', '#0x1', 'lsl #16')]),
+        (0x1234_0000_5678, [('movz', '#0x5678'), ('movk', '#0x1234', 'lsl #32')]),
+        (-1, [('movn', '#0x0')]),
+        (-0x10000, [('movn', '#0xffff')]),
+        (-0x10001, [('movn', '#0x1', 'lsl #16')]),
+        (-0x10002, [('movn', '#0x1'), ('movk', '#0xfffe', 'lsl #16')]),
+        (0x1234_ffff_ffff_5678, [('movn', '#0xa987'), ('movk', '#0x1234', 'lsl #48')]),
+        (-(1 << 63), [('movz', '#0x8000', 'lsl #48')]),
+    ])
+    def test_sequence(self, value, expected):
+        assert move_wide(value) == expected
+
+    def materialize(self, value):
+        source = '\n'.join(
+            f'{opcode} x0, {", ".join(operands)}'
+            for opcode, *operands in move_wide(value)
+        )
+        return ARM64Emulator().run(source).value('x0')
+
+    def test_materializes_value(self):
+        rng = random.Random(0)
+        values = [0, 1, -1, 0xffff, 0x10000, (1 << 63) - 1, -(1 << 63)]
+        values += [rng.randrange(-(1 << 63), 1 << 63) for _ in range(500)]
+        values += [
+            rng.choice([0, 0xffff, rng.randrange(1 << 16)]) << shift
+            for shift in (0, 16, 32, 48)
+            for _ in range(50)
+        ]
+        for value in values:
+            assert self.materialize(value) == signed(value)
+
+    @pytest.mark.parametrize('value', [0x5678, 0x1234_0000, -0x1234_0001, 0x8000_0000_0000_ffff])
+    def test_minimal_length(self, value):
+        halfwords = [value >> shift & 0xffff for shift in range(0, 64, 16)]
+        expected = max(1, min(4 - halfwords.count(0), 4 - halfwords.count(0xffff)))
+
+        assert len(move_wide(value)) == expected
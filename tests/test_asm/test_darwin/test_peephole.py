@@ -0,0 +1,190 @@
+import random
+
+import pytest
+
+from puroboros.asm.darwin.peephole import Peephole
+from puroboros.asm.instruction import Instruction
+from tests.emulator import run_generated
+from tests.test_gen import random_tree
+
+
+def optimize(source):
+    peephole = Peephole()
+    instructions = peephole.run([
+        Instruction.parse(line)
+        for line in source.strip().splitlines()
+    ])
+    return '\n'.join(str(instruction) for instruction in instructions)
+
+
+class TestPeephole:
+    def test_folds_immediate_into_add(self):
+        assert optimize(
+            'mov x8, #2\n'
+            'mov x9, #3\n'
+            'add x8, x8, x9\n'
+            'svc #0x80\n'
+        ) == (
+            'mov x9, #3\n'
+            'add x8, x9, #2\n'
+            'svc #0x80'
+        )
+
+    def test_folds_commuted_add(self):
+        assert optimize(
+            'mov x9, #3\n'
+            'add x10, x9, x8\n'
+            'svc #0x80\n'
+        ) == (
+            'add x10, x8, #3\n'
+            'svc #0x80'
+        )
+
+    def test_does_not_commute_sub(self):
+        source = (
+            'mov x9, #3\n'
+            'sub x8, x9, x8\n'
+            'svc #0x80'
+        )
+
+        assert optimize(source) == source
+
+    def test_flips_negative_immediate(self):
+        assert optimize(
+            'mov x9, #-6\n'
+            'add x8, x8, x9\n'
+            'svc #0x80\n'
+        ) == (
+            'sub x8, x8, #6\n'
+            'svc #0x80'
+        )
+
+    def test_folds_shifted_immediate(self):
+        assert optimize(
+            'mov x9, #8192\n'
+            'sub x8, x8, x9\n'
+            'svc #0x80\n'
+        ) == (
+            'sub x8, x8, #2, lsl #12\n'
+            'svc #0x80'
+        )
+
+    def test_keeps_unencodable_immediate(self):
+        source = (
+            'mov x9, #4097\n'
+            'add x8, x8, x9\n'
+            'svc #0x80'
+        )
+
+        assert optimize(source) == source
+
+    def test_keeps_immediate_still_live(self):
+        source = (
+            'mov x9, #3\n'
+            'add x8, x8, x9\n'
+            'mul x8, x8, x9\n'
+            'svc #0x80'
+        )
+
+        assert optimize(source) == source
+
+    def test_keeps_immediate_read_by_svc(self):
+        source = (
+            'mov x1, #3\n'
+            'add x8, x8, x1\n'
+            'svc #0x80'
+        )
+
+        assert optimize(source) == source
+
+    def test_drops_self_move(self):
+        assert optimize('mov x8, x8\nsvc #0x80') == 'svc #0x80'
+
+    def test_drops_overwritten_move(self):
+        assert optimize(
+            'mov x8, #1\n'
+            'mov x8, #2\n'
+            'svc #0x80\n'
+        ) == (
+            'mov x8, #2\n'
+            'svc #0x80'
+        )
+
+    def test_keeps_move_read_by_overwrite(self):
+        source = (
+            'mov x8, #1\n'
+            'mul x8, x8, x9\n'
+            'svc #0x80'
+        )
+
+        assert optimize(source) == source
+
+    def test_keeps_move_at_end(self):
+        assert optimize('mov x8, #1') == 'mov x8, #1'
+
+    def test_unknown_instruction_is_barrier(self):
+        source = (
+            'mov x9, #3\n'
+            'bl _helper\n'
+            'add x8, x8, x9\n'
+            'svc #0x80'
+        )
+
+        assert optimize(source) == source
+
+    def test_merges_adjacent_arithmetic(self):
+        assert optimize(
+            'add x8, x8, #5\n'
+            'sub x8, x8, #2\n'
+            'svc #0x80\n'
+        ) == (
+            'add x8, x8, #3\n'
+            'svc #0x80'
+        )
+
+    def test_cancels_stack_adjustment(self):
+        assert optimize(
+            'sub sp, sp, #16\n'
+            'add sp, sp, #16\n'
+            'svc #0x80\n'
+        ) == 'svc #0x80'
+
+    def test_keeps_directives(self):
+        source = (
+            '.global _start\n'
+            '.align 4\n'
+            '_start:\n'
+            'svc #0x80'
+        )
+
+        assert optimize(source) == source
+
+    def test_stats(self):
+        peephole = Peephole()
+        peephole.run([
+            Instruction.parse('_start:'),
+            Instruction.parse('mov x9, #3'),
+            Instruction.parse('add x8, x8, x9'),
+        ])
+
+        assert peephole.stats() == {
+            'instructions before peephole': 2,
+            'instructions after peephole': 1,
+        }
+
+
+class TestPeepholeGenerator:
+    @pytest.mark.parametrize('seed', range(50))
+    def test_preserves_value(self, seed):
+        node = random_tree(random.Random(seed), 6)
+        _, expected = run_generated(node)
+        optimized, value = run_generated(node, peephole=True)
+
+        assert value == expected
+        stats = optimized.stats()
+        assert stats['instructions after peephole'] <= stats['instructions before peephole']
+
+    def test_without_peephole(self):
+        gen, _ = run_generated(random_tree(random.Random(0), 3))
+
+        assert 'instructions before peephole' not in gen.stats()
@@ -0,0 +1,138 @@
+import random
+
+import pytest
+
+from puroboros.asm.darwin.schedule import Scheduler, estimate_cycles, latency
+from puroboros.asm.instruction import Instruction
+from tests.emulator import run_generated
+from tests.test_gen import random_tree
+
+
+def parse(source):
+    return [Instruction.parse(line) for line in source.strip().splitlines()]
+
+
+def schedule(source):
+    return '\n'.join(str(instruction) for instruction in Scheduler().run(parse(source)))
+
+
+class TestLatency:
+    @pytest.mark.parametrize('line,expected', [
+        ('mov x8, #1', 1),
+        ('add x8, x8, x9', 1),
+        ('add x8, x8, #1, lsl #12', 1),
+        ('add x8, x16, x16, lsr #63', 2),
+        ('mul x8, x8, x9', 4),
+        ('sdiv x8, x8, x9', 12),
+        ('ldr x8, [sp, #0]', 4),
+    ])
+    def test_latency(self, line, expected):
+        assert latency(Instruction.parse(line)) == expected
+
+    def test_estimate_cycles(self):
+        assert estimate_cycles(parse(
+            'mov x8, #1\n'
+            'mov x9, #2\n'
+            'sdiv x8, x8, x9\n'
+            'add x8, x8, #1\n'
+        )) == 2 + 12 + 1
+
+    def test_estimate_skips_directives(self):
+        assert estimate_cycles(parse('.align 4\n_start:\nmov x8, #1')) == 1
+
+
+class TestScheduler:
+    def test_hides_latency(self):
+        assert schedule(
+            'mov x8, #6\n'
+            'mov x9, #3\n'
+            'sdiv x8, x8, x9\n'
+            'add x8, x8, #1\n'
+            'mov x10, #5\n'
+            'mov x11, #7\n'
+            'mul x10, x10, x11\n'
+        ) == (
+            'mov x8, #6\n'
+            'mov x9, #3\n'
+            'sdiv x8, x8, x9\n'
+            'mov x10, #5\n'
+            'mov x11, #7\n'
+            'mul x10, x10, x11\n'
+            'add x8, x8, #1'
+        )
+
+    def test_keeps_anti_dependency(self):
+        source = (
+            'mul x8, x9, x10\n'
+            'add x11, x8, #1\n'
+            'mov x8, #3\n'
+            'add x9, x8, #1'
+        )
+        instructions = schedule(source).splitlines()
+
+        assert instructions.index('add x11, x8, #1') < instructions.index('mov x8, #3')
+
+    def test_keeps_memory_order(self):
+        source = (
+            'str x8, [sp, #0]\n'
+            'ldr x9, [sp, #0]\n'
+            'str x10, [sp, #0]'
+        )
+
+        assert schedule(source) == source
+
+    def test_directives_are_barriers(self):
+        source = (
+            'sdiv x8, x8, x9\n'
+            'add x8, x8, #1\n'
+            '_label:\n'
+            'mov x10, #5'
+        )
+
+        assert schedule(source) == source
+
+    def test_svc_is_barrier(self):
+        source = (
+            'sdiv x8, x8, x9\n'
+            'mov x0, #0\n'
+            'svc #0x80\n'
+            'mov x10, #5'
+        )
+
+        assert schedule(source).splitlines()[2:] == ['svc #0x80', 'mov x10, #5']
+
+    def test_stats(self):
+        scheduler = Scheduler()
+        scheduler.run(parse(
+            'sdiv x8, x8, x9\n'
+            'add x8, x8, #1\n'
+            'mov x10, #5\n'
+        ))
+
+        assert scheduler.stats() == {
+            'estimated cycles before scheduling': 14,
+            'estimated cycles after scheduling': 13,
+        }
+
+    def test_window(self):
+        scheduler = Scheduler()
+        scheduler.WINDOW = 2
+        instructions = parse(
+            'sdiv x8, x8, x9\n'
+            'add x8, x8, #1\n'
+            'mov x10, #5\n'
+        )
+
+        assert scheduler.run(instructions) == instructions
+
+
+class TestSchedulerGenerator:
+    @pytest.mark.parametrize('seed', range(30))
+    def test_preserves_value(self, seed):
+        node = random_tree(random.Random(seed), 6)
+        _, expected = run_generated(node, peephole=True)
+        gen, value = run_generated(node, peephole=True, schedule=True)
+
+        assert value == expected
+        stats = gen.stats()
+        assert stats['estimated cycles after scheduling'] <= stats['estimated cycles before scheduling']
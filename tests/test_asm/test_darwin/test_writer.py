@@ -0,0 +1,139 @@
+import io
+import random
+import struct
+
+import pytest
+
+from puroboros.asm.darwin.arm64 import DarwinARM64
+from puroboros.asm.darwin.writer import (
+    BUILD_VERSION, CPU_TYPE_ARM64, HEADER, LC_SYMTAB, MH_MAGIC_64, MH_OBJECT,
+    NLIST, SECTION, SEGMENT, MachOWriter, RawWriter,
+)
+from puroboros.asm.instruction import Instruction
+from puroboros.exceptions import CodeGenerationError
+from puroboros.gen import CodeGenerator
+from tests.test_gen import random_tree
+
+
+def parse(source):
+    return [Instruction.parse(line) for line in source.strip().splitlines()]
+
+
+PROGRAM = '''
+    .global _start
+    .align 4
+    _start:
+    mov x0, #0
+    mov x16, #1
+    svc #0x80
+'''
+CODE = struct.pack('<III', 0xd2800000, 0xd2800030, 0xd4001001)
+
+
+class TestRawWriter:
+    def test_write(self):
+        stream = io.BytesIO()
+        writer = RawWriter(stream)
+        instructions = parse(PROGRAM)
+        writer.write(instructions[:4])
+        writer.write(instructions[4:])
+        writer.flush()
+
+        assert stream.getvalue() == CODE
+
+
+class TestMachOWriter:
+    def read(self, image):
+        header = HEADER.unpack_from(image)
+        segment = SEGMENT.unpack_from(image, HEADER.size)
+        section = struct.unpack_from('<16s16sQQI', image, HEADER.size + SEGMENT.size)
+        return header, segment, section
+
+    def test_object_file(self):
+        stream = io.BytesIO()
+        writer = MachOWriter(stream)
+        writer.write(parse(PROGRAM))
+
+        # The code is written at once; the header waits for the sizes.
+        assert stream.getvalue().endswith(CODE)
+        assert stream.getvalue()[:HEADER.size] == bytes(HEADER.size)
+
+        writer.flush()
+        image = stream.getvalue()
+        header, segment, section = self.read(image)
+
+        assert header[:5] == (MH_MAGIC_64, CPU_TYPE_ARM64, 0, MH_OBJECT, 4)
+        assert section[:2] == (b'__text'.ljust(16, b'\0'), b'__TEXT'.ljust(16, b'\0'))
+        size, offset = section[3], section[4]
+        assert size == len(CODE)
+        assert image[offset:offset + size] == CODE
+
+    def test_symbols(self):
+        stream = io.BytesIO()
+        writer = MachOWriter(stream)
+        writer.write(parse(PROGRAM))
+        writer.flush()
+        image = stream.getvalue()
+
+        # LC_SYMTAB follows the segment and LC_BUILD_VERSION.
+        symtab = HEADER.size + SEGMENT.size + SECTION.size + BUILD_VERSION.size
+        command, _, symoff, nsyms, stroff, _ = struct.unpack_from('<6I', image, symtab)
+        strx, kind, sect, _, value = NLIST.unpack_from(image, symoff)
+        name = image[stroff + strx:image.index(b'\0', stroff + strx)]
+
+        assert (command, nsyms) == (LC_SYMTAB, 1)
+        assert (name, kind, sect, value) == (b'_start', 0xf, 1, 0)
+
+    def test_unseekable_stream(self):
+        class Pipe:
+            def __init__(self):
+                self.chunks = []
+
+            def write(self, data):
+                self.chunks.append(data)
+
+        pipe, stream = Pipe(), io.BytesIO()
+        for sink in (pipe, stream):
+            writer = MachOWriter(sink)
+            instructions = parse(PROGRAM)
+            writer.write(instructions[:4])
+            writer.write(instructions[4:])
+            writer.flush()
+
+        assert len(pipe.chunks) == 1
+        assert pipe.chunks[0] == stream.getvalue()
+
+    def test_alignment_raised_after_code(self):
+        writer = MachOWriter(io.BytesIO())
+        writer.write(parse('mov x0, #0'))
+        writer.write(parse('.align 12'))
+
+        with pytest.raises(CodeGenerationError):
+            writer.flush()
+
+
+class TestGeneratorOutput:
+    def test_binary_matches_assembly(self):
+        rng = random.Random(5)
+        node = random_tree(rng, 6)
+        text = io.StringIO()
+        CodeGenerator('Darwin', 'arm64', sink=text).generate(node)
+        binary = io.BytesIO()
+        CodeGenerator('Darwin', 'arm64', sink=binary, output_format='bin').generate(node)
+        instructions = [
+            instruction for instruction in parse(text.getvalue())
+            if not instruction.directive
+        ]
+
+        assert len(binary.getvalue()) == 4 * len(instructions)
+        assert binary.getvalue()[-4:] == (0xd4001001).to_bytes(4, 'little')
+
+    def test_object_streams_in_chunks(self, monkeypatch):
+        node = random_tree(random.Random(5), 8)
+        whole = io.BytesIO()
+        CodeGenerator('Darwin', 'arm64', sink=whole, output_format='obj').generate(node)
+        monkeypatch.setattr(DarwinARM64, 'FLUSH_THRESHOLD', 16)
+        chunked = io.BytesIO()
+        CodeGenerator('Darwin', 'arm64', sink=chunked, output_format='obj').generate(node)
+
+        assert chunked.getvalue() == whole.getvalue()
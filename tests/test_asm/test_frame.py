@@ -0,0 +1,50 @@
+from puroboros.asm.frame import StackFrame
+
+
+class TestStackFrame:
+    def test_initial(self):
+        frame = StackFrame()
+
+        assert frame.stats() == {
+            'spills': 0,
+            'reloads': 0,
+            'stack slots': 0,
+            'frame size': 0,
+        }
+
+    def test_allocate_new_slots(self):
+        frame = StackFrame()
+
+        assert [frame.allocate() for _ in range(3)] == [0, 1, 2]
+        assert frame.slots == 3
+        assert frame.spills == 3
+
+    def test_reuse_released_slot(self):
+        frame = StackFrame()
+        frame.allocate()
+        slot = frame.allocate()
+        frame.release(slot)
+
+        assert frame.allocate() == slot
+        assert frame.slots == 2
+        assert frame.reloads == 1
+
+    def test_grow_in_aligned_steps(self):
+        frame = StackFrame()
+        frame.allocate()
+
+        assert frame.grow() == 16
+        assert frame.grow() == 0
+        frame.allocate()
+        assert frame.grow() == 0
+        frame.allocate()
+        assert frame.grow() == 16
+        assert frame.size == 32
+
+    def test_offset(self):
+        frame = StackFrame()
+        for _ in range(3):
+            frame.allocate()
+            frame.grow()
+
+        assert [frame.offset(slot) for slot in range(3)] == [24, 16, 8]
@@ -0,0 +1,43 @@
+import pytest
+
+from puroboros.asm.instruction import Instruction
+
+
+class TestInstruction:
+    @pytest.mark.parametrize('line,opcode,operands', [
+        ('svc #0x80', 'svc', ('#0x80',)),
+        ('mov x8, #5', 'mov', ('x8', '#5')),
+        ('add sp, sp, #1, lsl #12', 'add', ('sp', 'sp', '#1', 'lsl #12')),
+        ('str x8, [sp, #16]', 'str', ('x8', '[sp, #16]')),
+        ('ldr x9, [sp, x17]', 'ldr', ('x9', '[sp, x17]')),
+        ('_start:', '_start:', ()),
+    ])
+    def test_parse(self, line, opcode, operands):
+        instruction = Instruction.parse(line)
+
+        assert instruction.opcode == opcode
+        assert instruction.operands == operands
+
+    @pytest.mark.parametrize('line', [
+        'svc #0x80',
+        'add sp, sp, #1, lsl #12',
+        'str x8, [sp, #16]',
+        '.global _start',
+    ])
+    def test_round_trip(self, line):
+        assert str(Instruction.parse(line)) == line
+
+    @pytest.mark.parametrize('line,directive', [
+        ('.global _start', True),
+        ('_start:', True),
+        ('mov x8, #5', False),
+    ])
+    def test_directive(self, line, directive):
+        assert Instruction.parse(line).directive is directive
+
+    def test_equality(self):
+        assert Instruction('mov', 'x8', '#5') == Instruction.parse('mov x8, #5')
+        assert Instruction('mov', 'x8', '#5') != Instruction('mov', 'x8', '#6')
+
+    def test_slots(self):
+        assert not hasattr(Instruction('svc', '#0x80'), '__dict__')
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from puroboros.asm.magic import signed_magic
+
+
+def divide(dividend, divisor):
+    magic, shift = signed_magic(divisor)
+    quotient = dividend * magic >> 64
+    if divisor > 0 and magic < 0:
+        quotient += dividend
+    elif divisor < 0 and magic > 0:
+        quotient -= dividend
+    quotient >>= shift
+    return quotient + (quotient < 0)
+
+
+def truncate(dividend, divisor):
+    quotient = abs(dividend) // abs(divisor)
+    return -quotient if (dividend < 0) != (divisor < 0) else quotient
+
+
+class TestSignedMagic:
+    @pytest.mark.parametrize('divisor,expected', [
+        (3, (0x5555555555555556, 0)),
+        (5, (0x6666666666666667, 1)),
+        (7, (0x4924924924924925, 1)),
+        (-3, (0x5555555555555555, 1)),
+    ])
+    def test_known_values(self, divisor, expected):
+        assert signed_magic(divisor) == expected
+
+    @pytest.mark.parametrize('divisor', [-1, 0, 1])
+    def test_trivial_divisor(self, divisor):
+        with pytest.raises(ValueError):
+            signed_magic(divisor)
+
+    @pytest.mark.parametrize('divisor', [
+        1 << 63, -(1 << 63), (1 << 64) + 1, -(1 << 64) - 1,
+    ])
+    def test_divisor_too_wide(self, divisor):
+        with pytest.raises(ValueError):
+            signed_magic(divisor)
+
+    def test_matches_truncating_division(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            divisor = rng.choice([
+                rng.randrange(3, 1000),
+                rng.randrange(3, 1 << 63),
+            ]) * rng.choice([1, -1])
+            dividend = rng.randrange(-(1 << 63), 1 << 63)
+
+            assert divide(dividend, divisor) == truncate(dividend, divisor)
@@ -63,10 +63,10 @@ class TestRegisterManager:
     def test_free_all(self):
         manager = RegisterManager(['x0', 'x1'])
         for register in manager.pool:
-            register.free = True
+            register.free = False
         manager.free_all()
 
-        return all(
+        assert all(
             register.free is True
             for register in manager.pool
         )
@@ -94,6 +94,73 @@ class TestRegisterManager:
 
         assert str(e.value) == 'Out of registers'
 
+    def test_allocate_lowest_free(self):
+        manager = RegisterManager(['x0', 'x1', 'x2'])
+        registers = [manager.allocate() for _ in range(3)]
+        manager.free(registers[2])
+        manager.free(registers[0])
+
+        assert manager.allocate().name == 'x0'
+        assert manager.allocate().name == 'x2'
+
+    def test_out_of_registers_after_allocations(self):
+        manager = RegisterManager(['x0', 'x1'])
+        manager.allocate()
+        manager.allocate()
+
+        with pytest.raises(RegisterError):
+            manager.allocate()
+
+    def test_free_all_resets_pool(self):
+        manager = RegisterManager(['x0', 'x1'])
+        manager.allocate()
+        manager.allocate()
+        manager.free_all()
+
+        assert manager.available == 2
+        assert manager.allocate().name == 'x0'
+
+    def test_free_foreign_register(self):
+        manager = RegisterManager(['x0'])
+        register = Register('x0', False)
+        manager.free(register)
+
+        assert register.free is True
+        assert manager.available == 1
+        assert manager.pool[0].free is True
+
+    def test_available_and_in_use(self):
+        manager = RegisterManager(['x0', 'x1', 'x2'])
+        register = manager.allocate()
+        manager.allocate()
+        manager.free(register)
+
+        assert manager.available == 2
+        assert manager.in_use == 1
+
+    def test_stats(self):
+        manager = RegisterManager(['x0', 'x1', 'x2'])
+        first = manager.allocate()
+        second = manager.allocate()
+        manager.free(first)
+        manager.free(second)
+        manager.allocate()
+
+        assert manager.stats() == {
+            'register allocations': 3,
+            'registers high water': 2,
+        }
+
+    def test_large_register_file(self):
+        names = [f'x{i}' for i in range(31)]
+        manager = RegisterManager(names)
+        registers = [manager.allocate() for _ in names]
+
+        assert [register.name for register in registers] == names
+        assert manager.available == 0
+        manager.free(registers[17])
+        assert manager.allocate() is registers[17]
+        assert manager.high_water == 31
 
 
 class TestRegisterMeta:
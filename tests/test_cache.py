@@ -0,0 +1,117 @@
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from puroboros.cache import CompilationCache, source_digest
+
+
+def key(source=b'1 + 2', **options):
+    return CompilationCache.key(io.BytesIO(source), **{'system': 'Darwin', **options})
+
+
+class TestCompilationCache:
+    def test_key(self):
+        assert key() == key()
+        assert key() != key(b'1 + 3')
+        assert key() != key(optimize=1)
+        assert key() != key(system='Linux')
+
+    def test_key_includes_version(self):
+        before = key()
+        with patch('puroboros.cache.__version__', '0.0.0'):
+            assert key() != before
+
+    def test_key_includes_compiler_source(self):
+        before = key()
+        with patch('puroboros.cache.source_digest', return_value='0' * 64):
+            assert key() != before
+
+    def test_source_digest_follows_package_files(self, tmp_path):
+        (tmp_path / 'opt').mkdir()
+        (tmp_path / 'opt' / 'fold.py').write_text('LIMIT = 1\n')
+        with patch('puroboros.cache.__file__', str(tmp_path / 'cache.py')):
+            before = source_digest.__wrapped__()
+            (tmp_path / 'README').write_text('not code\n')
+            unchanged = source_digest.__wrapped__()
+            (tmp_path / 'opt' / 'fold.py').write_text('LIMIT = 2\n')
+
+            assert unchanged == before
+            assert source_digest.__wrapped__() != before
+
+    def test_large_source(self):
+        source = b'1 + ' * CompilationCache.CHUNK_SIZE + b'1'
+
+        assert key(source) != key(source[:-1] + b'2')
+
+    def test_miss_then_hit(self, tmp_path):
+        cache = CompilationCache(str(tmp_path), 1 << 20)
+
+        assert cache.get(key()) is None
+
+        cache.put(key(), b'mov x0, #0\n')
+
+        assert cache.get(key()) == b'mov x0, #0\n'
+        assert cache.stats() == {'cache hits': 1, 'cache misses': 1, 'cache evictions': 0}
+
+    def test_no_temporary_files_left(self, tmp_path):
+        cache = CompilationCache(str(tmp_path), 1 << 20)
+        cache.put(key(), b'data')
+
+        assert sorted(os.listdir(tmp_path)) == sorted([CompilationCache.STATE, key()])
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = CompilationCache(str(tmp_path), 10)
+        keys = [key(str(i).encode()) for i in range(3)]
+        cache.put(keys[0], b'aaaa')
+        cache.put(keys[1], b'bbbb')
+        # Make the order of use explicit instead of relying on timing.
+        os.utime(tmp_path / keys[1], ns=(1, 1))
+        os.utime(tmp_path / keys[0], ns=(2, 2))
+        cache.put(keys[2], b'cccc')
+
+        assert cache.evictions == 1
+        assert sorted(os.listdir(tmp_path)) == sorted([CompilationCache.STATE, keys[0], keys[2]])
+
+    def test_eviction_scans_are_amortized(self, tmp_path):
+        cache = CompilationCache(str(tmp_path), 1000)
+        with patch.object(cache, 'evict', wraps=cache.evict) as evict:
+            for i in range(200):
+                cache.put(key(str(i).encode()), b'x' * 10)
+
+        # One scan to start, then one per 100 bytes over the low-water mark.
+        assert evict.call_count < 30
+        assert sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)) <= 1000
+
+    def test_removes_stale_temporary_files(self, tmp_path):
+        (tmp_path / '.stale').write_bytes(b'partial')
+        (tmp_path / '.fresh').write_bytes(b'partial')
+        old = time.time_ns() - 2 * CompilationCache.STALE_SECONDS * 10 ** 9
+        os.utime(tmp_path / '.stale', ns=(old, old))
+        cache = CompilationCache(str(tmp_path), 1 << 20)
+        cache.put(key(), b'data')
+
+        assert sorted(os.listdir(tmp_path)) == sorted(['.fresh', CompilationCache.STATE, key()])
+
+    def test_hit_refreshes_entry(self, tmp_path):
+        cache = CompilationCache(str(tmp_path), 1 << 20)
+        cache.put(key(), b'data')
+        os.utime(tmp_path / key(), ns=(1, 1))
+        cache.get(key())
+
+        assert os.stat(tmp_path / key()).st_mtime_ns > 1
+
+    def test_concurrent_writers(self, tmp_path):
+        def work(i):
+            cache = CompilationCache(str(tmp_path), 64)
+            cache.put(key(str(i % 8).encode()), b'x' * 16)
+            return cache.get(key(str(i % 8).encode()))
+
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(work, range(64)))
+
+        # Every read sees a complete entry or none at all.
+        assert set(results) <= {b'x' * 16, None}
+        entries = [name for name in os.listdir(tmp_path) if not name.startswith('.')]
+        assert sum(os.path.getsize(tmp_path / name) for name in entries) <= 64
@@ -1,4 +1,6 @@
+import random
 from io import StringIO
+from types import SimpleNamespace
 from unittest.mock import patch
 
 import pytest
@@ -241,3 +243,110 @@ class TestBinaryExpression:
                 intvalue=3,
             )
         )
+
+
+class RecursiveParser(Parser):
+    def bin_expr(self, precedence: int = 0) -> ASTNode:
+        left_token = self.scanner.scan()
+        left_node = self.primary(left_token)
+        op_token = self.scanner.scan()
+
+        while (
+            op_token.type != Token.Type.T_EOF and
+            self.op_precedence(op_token.type) > precedence
+        ):
+            right_node, next_op_token = self.bin_expr(self.op_precedence(op_token.type))
+            left_node = ASTNode(
+                op=self.arith_op(op_token.type),
+                left=left_node,
+                right=right_node,
+            )
+            op_token = next_op_token
+
+        return left_node, op_token
+
+
+def parse(parser_class, source, precedence=0):
+    context = Context()
+    parser = parser_class(Scanner(context))
+    with patch.object(context, 'infile', StringIO(source)):
+        try:
+            return parser.bin_expr(precedence)
+        except ParserError as e:
+            return str(e)
+
+
+class TestIterativeBinaryExpression:
+    @pytest.mark.parametrize('source', [
+        '1 + 2 * 3 - 4 / 5 * 6 + 7',
+        '1 * 2 * 3 + 4 * 5 * 6 - 7 / 8 / 9',
+        '1 - 2 - 3 - 4',
+        '',
+        '1 +',
+        '1 2',
+        '+ 1',
+        '1 * * 2',
+    ])
+    @pytest.mark.parametrize('precedence', [0, 10, 20])
+    def test_matches_recursive_parser(self, source, precedence):
+        expected = parse(RecursiveParser, source, precedence)
+
+        assert parse(Parser, source, precedence) == expected
+
+    def test_matches_recursive_parser_on_random_input(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            terms = [str(rng.randrange(100)) for _ in range(rng.randrange(1, 30))]
+            source = ' '.join(
+                f'{term} {rng.choice("+-*/")}' for term in terms
+            )[:-2]
+
+            assert parse(Parser, source) == parse(RecursiveParser, source)
+
+    def test_million_terms(self):
+        terms = 10 ** 6
+        one = Token(Token.Type.T_INTLIT, 1)
+        plus = Token(Token.Type.T_PLUS)
+        tokens = [one, plus] * (terms - 1) + [one, Token(Token.Type.T_EOF)]
+        scanner = SimpleNamespace(context=Context(), scan=iter(tokens).__next__)
+        node, op_token = Parser(scanner).bin_expr()
+
+        assert op_token == Token(Token.Type.T_EOF)
+        depth = 0
+        while node.op == ASTNode.Type.A_ADD:
+            assert node.right.intvalue == 1
+            node = node.left
+            depth += 1
+        assert depth == terms - 1
+        assert node.intvalue == 1
+
+    def test_mixed_precedence_terms(self):
+        r"""
+                  -
+                 / \
+               ...  *
+               /   / \
+              -  ...  99999
+             / \
+            *   *
+           / \ / \
+          0  1 2  3
+        """
+        terms = 10 ** 5
+        tokens = []
+        for i in range(terms):
+            tokens.append(Token(Token.Type.T_INTLIT, i))
+            tokens.append(Token(Token.Type.T_MINUS if i % 2 else Token.Type.T_STAR))
+        tokens[-1] = Token(Token.Type.T_EOF)
+        scanner = SimpleNamespace(context=Context(), scan=iter(tokens).__next__)
+        node, _ = Parser(scanner).bin_expr()
+
+        for i in reversed(range(2, terms, 2)):
+            assert node.op == ASTNode.Type.A_SUBTRACT
+            assert node.right.op == ASTNode.Type.A_MULTIPLY
+            assert node.right.left.intvalue == i
+            assert node.right.right.intvalue == i + 1
+            node = node.left
+        assert node.op == ASTNode.Type.A_MULTIPLY
+        assert node.left.intvalue == 0
+        assert node.right.intvalue == 1
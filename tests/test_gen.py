@@ -1,11 +1,18 @@
+import io
+import random
 from unittest.mock import Mock, call, patch
 
 import pytest
 
+from puroboros.asm.base import AssemblyBase
+from puroboros.asm.darwin.arm64 import DarwinARM64
 from puroboros.asm.factory import AssemblyFactory
 from puroboros.defs import ASTNode
-from puroboros.exceptions import CodeGenerationError
+from puroboros.exceptions import CodeGenerationError, OptimizationError, RegisterError
 from puroboros.gen import CodeGenerator
+from puroboros.opt.fold import ConstantFolding, evaluate
+from puroboros.tree import ASTArena, ObjectTree
+from tests.emulator import ARM64Emulator, run_generated
 
 
 @patch.object(AssemblyFactory, 'create')
@@ -42,6 +49,7 @@ class TestGenerator:
                 intvalue=2,
             ),
         )
+        m_create.return_value.accepts_immediate.return_value = False
         gen = CodeGenerator()
         gen.generate(node)
 
@@ -50,6 +58,55 @@ class TestGenerator:
             call(1), call(2),
         ])
 
+    @pytest.mark.parametrize('node_type,method_name', [
+        (ASTNode.Type.A_MULTIPLY, 'mul_immediate'),
+        (ASTNode.Type.A_DIVIDE, 'div_immediate'),
+    ])
+    def test_generate_ast_immediate(self, m_create, node_type, method_name):
+        node = ASTNode(
+            op=node_type,
+            left=ASTNode(op=ASTNode.Type.A_INTLIT, intvalue=1),
+            right=ASTNode(op=ASTNode.Type.A_INTLIT, intvalue=2),
+        )
+        m_create.return_value.accepts_immediate.side_effect = (
+            lambda operation, value: value == 2
+        )
+        gen = CodeGenerator()
+        gen.generate(node)
+
+        gen.assembly.load.assert_called_once_with(1)
+        getattr(gen.assembly, method_name).assert_called_once_with(gen.assembly.load.return_value, 2)
+
+    def test_generate_ast_commuted_immediate(self, m_create):
+        node = ASTNode(
+            op=ASTNode.Type.A_MULTIPLY,
+            left=ASTNode(op=ASTNode.Type.A_INTLIT, intvalue=4),
+            right=ASTNode(op=ASTNode.Type.A_INTLIT, intvalue=3),
+        )
+        m_create.return_value.accepts_immediate.side_effect = (
+            lambda operation, value: value == 4
+        )
+        gen = CodeGenerator()
+        gen.generate(node)
+
+        gen.assembly.load.assert_called_once_with(3)
+        gen.assembly.mul_immediate.assert_called_once_with(gen.assembly.load.return_value, 4)
+
+    def test_generate_ast_no_commuted_division(self, m_create):
+        node = ASTNode(
+            op=ASTNode.Type.A_DIVIDE,
+            left=ASTNode(op=ASTNode.Type.A_INTLIT, intvalue=4),
+            right=ASTNode(op=ASTNode.Type.A_INTLIT, intvalue=3),
+        )
+        m_create.return_value.accepts_immediate.side_effect = (
+            lambda operation, value: value == 4
+        )
+        gen = CodeGenerator()
+        gen.generate(node)
+
+        assert gen.assembly.div.call_count == 1
+        assert gen.assembly.div_immediate.call_count == 0
+
     def test_generate_ast_unknown_operator(self, m_create):
         node = Mock(op='mock', left=None, right=None)
         gen = CodeGenerator()
@@ -57,3 +114,360 @@ class TestGenerator:
             gen.generate(node)
 
         assert str(e.value) == 'Unknown AST operator mock'
+
+    def test_generate_arena(self, m_create):
+        arena = ASTArena()
+        node = arena.binary(
+            ASTNode.Type.A_SUBTRACT,
+            arena.intlit(1),
+            arena.binary(
+                ASTNode.Type.A_MULTIPLY,
+                arena.intlit(2),
+                arena.intlit(3),
+            ),
+        )
+        m_create.return_value.accepts_immediate.return_value = False
+        gen = CodeGenerator()
+        gen.generate(node, arena)
+
+        # The multiplication needs more registers, so it goes first.
+        gen.assembly.load.assert_has_calls([
+            call(2), call(3), call(1),
+        ])
+        assert gen.assembly.mul.call_count == 1
+        assert gen.assembly.sub.call_count == 1
+
+
+class RecursiveCodeGenerator(CodeGenerator):
+    def _label(self, node):
+        if node.op == ASTNode.Type.A_INTLIT:
+            return 1
+        if (operand := self._immediate_operand(node, node.left, node.right)) is not None:
+            return self._label(operand[0])
+        left, right = self._label(node.left), self._label(node.right)
+        return left + 1 if left == right else max(left, right)
+
+    def _generate_ast(self, node):
+        if node.op == ASTNode.Type.A_INTLIT:
+            return self.assembly.load(node.intvalue)
+        if (operand := self._immediate_operand(node, node.left, node.right)) is not None:
+            child, value = operand
+            return self._generate_immediate(node, self._generate_ast(child), value)
+        if self._label(node.right) > self._label(node.left):
+            right_reg = self._generate_ast(node.right)
+            left_reg = self._generate_ast(node.left)
+        else:
+            left_reg = self._generate_ast(node.left)
+            right_reg = self._generate_ast(node.right)
+        return self._generate_node(node, left_reg, right_reg)
+
+
+def random_tree(rng, depth):
+    if depth == 0 or rng.random() < 0.3:
+        return ASTNode(op=ASTNode.Type.A_INTLIT, intvalue=rng.randrange(100))
+    return ASTNode(
+        op=rng.choice(list(ASTNode.Type)[:4]),
+        left=random_tree(rng, depth - 1),
+        right=random_tree(rng, depth - 1),
+    )
+
+
+def left_deep_chain(tree, length):
+    node = tree.intlit(0)
+    for i in range(1, length):
+        node = tree.binary(ASTNode.Type.A_ADD, node, tree.intlit(i))
+    return node
+
+
+@pytest.fixture
+def registers_only():
+    # Keep every operand in a register, as before immediate selection.
+    with patch.object(DarwinARM64, 'accepts_immediate', return_value=False):
+        yield
+
+
+class TestIterativeGenerator:
+    def generate(self, generator_class, node, tree=None):
+        gen = generator_class('Darwin', 'arm64')
+        try:
+            gen.generate(node, tree)
+        except RegisterError as e:
+            return str(e)
+        return gen.assembly.output
+
+    def test_matches_recursive_generator(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            node = random_tree(rng, 4)
+            expected = self.generate(RecursiveCodeGenerator, node)
+            if expected == 'Out of registers':
+                continue
+
+            assert self.generate(CodeGenerator, node) == expected
+
+    @pytest.mark.usefixtures('registers_only')
+    @pytest.mark.parametrize('tree_class', [ObjectTree, ASTArena])
+    def test_deep_tree(self, tree_class):
+        length = 10 ** 5
+        tree = tree_class()
+        node = left_deep_chain(tree, length)
+        output = self.generate(CodeGenerator, node, tree).splitlines()
+
+        assert sum(line.startswith('add ') for line in output) == length - 1
+        # Literals past 16 bits are built from a movz/movk pair.
+        assert output[-6:-4] == ['movz x9, #0x869f', 'movk x9, #0x1, lsl #16']
+        assert output[3:6] == ['mov x8, #0', 'mov x9, #1', 'add x8, x8, x9']
+        assert output[-4] == 'add x8, x8, x9'
+
+
+def right_deep_chain(tree, length, op=ASTNode.Type.A_SUBTRACT):
+    node = tree.intlit(length - 1)
+    for i in reversed(range(length - 1)):
+        node = tree.binary(op, tree.intlit(i), node)
+    return node
+
+
+def balanced_tree(tree, depth, op=ASTNode.Type.A_SUBTRACT):
+    nodes = [tree.intlit(i) for i in range(2 ** depth)]
+    while len(nodes) > 1:
+        nodes = [
+            tree.binary(op, nodes[i], nodes[i + 1])
+            for i in range(0, len(nodes), 2)
+        ]
+    return nodes[0]
+
+
+@pytest.mark.usefixtures('registers_only')
+class TestEvaluationOrder:
+    def registers_used(self, gen):
+        return len({
+            operand.strip()
+            for line in gen.assembly.output.splitlines()
+            for operand in line.partition(' ')[2].split(',')
+            if operand.strip() in gen.assembly._meta['registers']
+        })
+
+    def test_evaluates_heavier_subtree_first(self):
+        """
+          -
+         / \
+        1   *
+           / \
+          3   5
+        """
+        tree = ObjectTree()
+        node = tree.binary(
+            ASTNode.Type.A_SUBTRACT,
+            tree.intlit(1),
+            tree.binary(ASTNode.Type.A_MULTIPLY, tree.intlit(3), tree.intlit(5)),
+        )
+        gen, value = run_generated(node)
+
+        assert gen.assembly.output.splitlines()[3:-3] == [
+            'mov x8, #3',
+            'mov x9, #5',
+            'mul x8, x8, x9',
+            'mov x9, #1',
+            'sub x9, x9, x8',
+        ]
+        assert value == -14
+
+    def test_keeps_division_operand_order(self):
+        tree = ObjectTree()
+        node = tree.binary(
+            ASTNode.Type.A_DIVIDE,
+            tree.intlit(-100),
+            tree.binary(ASTNode.Type.A_DIVIDE, tree.intlit(7), tree.intlit(2)),
+        )
+        gen, value = run_generated(node)
+
+        assert gen.assembly.output.splitlines()[-4] == 'sdiv x9, x9, x8'
+        assert value == -33
+
+    @pytest.mark.parametrize('op', [
+        ASTNode.Type.A_SUBTRACT,
+        ASTNode.Type.A_MULTIPLY,
+    ])
+    def test_right_deep_chain_needs_two_registers(self, op):
+        tree = ObjectTree()
+        node = right_deep_chain(tree, 50, op)
+        gen, value = run_generated(node)
+
+        assert self.registers_used(gen) == 2
+        assert gen.assembly.frame.spills == 0
+        assert value == ConstantFolding().run(tree, node).intvalue
+
+    @pytest.mark.parametrize('depth', [1, 2, 3])
+    def test_balanced_tree(self, depth):
+        tree = ObjectTree()
+        node = balanced_tree(tree, depth)
+        gen, value = run_generated(node)
+
+        assert self.registers_used(gen) == depth + 1
+        assert value == ConstantFolding().run(tree, node).intvalue
+
+
+@pytest.mark.usefixtures('registers_only')
+class TestSpilling:
+    @pytest.mark.parametrize('depth,spills', [(4, 1), (5, 3), (6, 7)])
+    def test_balanced_tree(self, depth, spills):
+        tree = ObjectTree()
+        node = balanced_tree(tree, depth)
+        gen, value = run_generated(node)
+
+        assert value == ConstantFolding().run(tree, node).intvalue
+        assert gen.assembly.frame.spills == spills
+        assert gen.assembly.frame.reloads == spills
+        assert gen.assembly.output.count('str ') == spills
+
+    def test_no_spills_within_register_file(self):
+        gen, _ = run_generated(balanced_tree(ObjectTree(), 3))
+
+        assert gen.assembly.frame.stats() == {
+            'spills': 0,
+            'reloads': 0,
+            'stack slots': 0,
+            'frame size': 0,
+        }
+        assert 'sp' not in gen.assembly.output
+
+    def test_frame_is_released(self):
+        gen, _ = run_generated(balanced_tree(ObjectTree(), 7))
+        output = gen.assembly.output.splitlines()
+
+        assert output.count('sub sp, sp, #16') == gen.assembly.frame.size // 16
+        assert output[-4] == f'add sp, sp, #{gen.assembly.frame.size}'
+
+    def test_random_trees(self):
+        rng = random.Random(1)
+        for _ in range(300):
+            tree = ObjectTree()
+            node = random_tree(rng, 7)
+            try:
+                expected = ConstantFolding().run(tree, node).intvalue
+            except OptimizationError:
+                continue
+            _, value = run_generated(node)
+
+            assert value == expected
+
+    def test_deep_arena_tree(self):
+        arena = ASTArena()
+        node = balanced_tree(arena, 12, ASTNode.Type.A_ADD)
+        gen, value = run_generated(node, arena)
+
+        assert value == sum(range(2 ** 12))
+        assert gen.assembly.frame.slots == 12 + 1 - 4
+
+
+class TestImmediateOperands:
+    @pytest.mark.parametrize('value,expected', [
+        (4095, ['mov x8, #7', 'sub x8, x8, #4095']),
+        (4096, ['mov x8, #7', 'sub x8, x8, #1, lsl #12']),
+        (4097, ['mov x8, #7', 'mov x9, #4097', 'sub x8, x8, x9']),
+    ])
+    def test_encoding_limits(self, value, expected):
+        tree = ObjectTree()
+        node = tree.binary(ASTNode.Type.A_SUBTRACT, tree.intlit(7), tree.intlit(value))
+        gen, result = run_generated(node, tree)
+
+        assert gen.assembly.output.splitlines()[3:-3] == expected
+        assert result == 7 - value
+
+    def test_commuted_add(self):
+        tree = ObjectTree()
+        node = tree.binary(ASTNode.Type.A_ADD, tree.intlit(5), tree.intlit(70000))
+        gen, result = run_generated(node, tree)
+
+        assert gen.assembly.output.splitlines()[3:-3] == [
+            'movz x8, #0x1170',
+            'movk x8, #0x1, lsl #16',
+            'add x8, x8, #5',
+        ]
+        assert result == 70005
+
+    @pytest.mark.parametrize('ir', [False, True])
+    @pytest.mark.parametrize('op,left,right', [
+        (ASTNode.Type.A_MULTIPLY, 5, 1 << 64),
+        (ASTNode.Type.A_MULTIPLY, 5, (1 << 64) + 4),
+        (ASTNode.Type.A_MULTIPLY, 5, 1 << 63),
+        (ASTNode.Type.A_DIVIDE, 5, (1 << 64) + 1),
+        (ASTNode.Type.A_DIVIDE, 5, (1 << 64) - 1),
+        (ASTNode.Type.A_DIVIDE, 5, (1 << 64) + 3),
+        (ASTNode.Type.A_DIVIDE, -(1 << 63), 1 << 63),
+        (ASTNode.Type.A_DIVIDE, 5, 1 << 63),
+        (ASTNode.Type.A_DIVIDE, 5, (1 << 63) + 3),
+        (ASTNode.Type.A_SUBTRACT, 5, 1 << 63),
+        (ASTNode.Type.A_ADD, 5, (1 << 64) + 4095),
+    ])
+    def test_wide_literals_wrap(self, op, left, right, ir):
+        tree = ObjectTree()
+        node = tree.binary(op, tree.intlit(left), tree.intlit(right))
+        _, result = run_generated(node, tree, ir=ir)
+
+        assert result == evaluate(op, left, right)
+
+    @pytest.mark.parametrize('ir', [False, True])
+    @pytest.mark.parametrize('divisor', [1 << 64, 1 << 65])
+    def test_divisor_wrapping_to_zero(self, divisor, ir):
+        tree = ObjectTree()
+        node = tree.binary(ASTNode.Type.A_DIVIDE, tree.intlit(5), tree.intlit(divisor))
+        gen, result = run_generated(node, tree, ir=ir)
+
+        assert 'sdiv x8, x8, x9' in gen.assembly.output
+        assert result == 0
+
+    def test_balanced_tree_needs_fewer_registers(self):
+        tree = ObjectTree()
+        node = balanced_tree(tree, 4, ASTNode.Type.A_ADD)
+        gen, result = run_generated(node, tree)
+
+        # Register operands alone need five registers here and spill.
+        assert gen.assembly.registers.high_water == 4
+        assert gen.assembly.frame.spills == 0
+        assert result == sum(range(16))
+
+    def test_random_trees(self):
+        rng = random.Random(2)
+        for _ in range(300):
+            tree = ObjectTree()
+            node = random_tree(rng, 7)
+            try:
+                expected = ConstantFolding().run(tree, node).intvalue
+            except OptimizationError:
+                continue
+            _, value = run_generated(node)
+
+            assert value == expected
+
+
+class TestStreaming:
+    def generate(self, node, sink=None, **options):
+        gen = CodeGenerator('Darwin', 'arm64', sink=sink, **options)
+        register = gen.generate(node)
+        return gen, register
+
+    def test_sink_matches_output(self):
+        rng = random.Random(3)
+        node = random_tree(rng, 6)
+        gen, _ = self.generate(node)
+        sink = io.StringIO()
+        streamed, _ = self.generate(node, sink)
+
+        assert sink.getvalue() == gen.assembly.output
+        assert streamed.assembly.output == ''
+
+    @patch.object(AssemblyBase, 'FLUSH_THRESHOLD', 8)
+    def test_optimized_chunks(self):
+        rng = random.Random(4)
+        for _ in range(100):
+            node = random_tree(rng, 5)
+            try:
+                expected = ConstantFolding().run(ObjectTree(), node).intvalue
+            except OptimizationError:
+                continue
+            sink = io.StringIO()
+            _, register = self.generate(node, sink, peephole=True, schedule=True)
+            emulator = ARM64Emulator().run(sink.getvalue())
+
+            assert emulator.value(register.name) == expected
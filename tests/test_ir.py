@@ -0,0 +1,166 @@
+import random
+from unittest.mock import patch
+
+import pytest
+
+from puroboros.asm.darwin.arm64 import DarwinARM64
+from puroboros.defs import ASTNode
+from puroboros.exceptions import CodeGenerationError, OptimizationError
+from puroboros.gen import CodeGenerator
+from puroboros.ir import IR, IRBuilder, LocalValueNumbering, Lowering, Quad
+from puroboros.opt.fold import ConstantFolding
+from puroboros.tree import ASTArena, ObjectTree
+from tests.emulator import ARM64Emulator
+from tests.test_gen import balanced_tree, random_tree
+
+
+def product(tree, left, right):
+    return tree.binary(ASTNode.Type.A_MULTIPLY, tree.intlit(left), tree.intlit(right))
+
+
+def run(ir):
+    asm = DarwinARM64()
+    register = Lowering(asm).lower(ir)
+    return asm, ARM64Emulator().run(asm.output).value(register.name)
+
+
+class TestIRBuilder:
+    def test_dump(self):
+        tree = ObjectTree()
+        node = tree.binary(ASTNode.Type.A_SUBTRACT, tree.intlit(1), product(tree, 2, 3))
+        ir = IRBuilder(tree).build(node)
+
+        assert str(ir) == (
+            'v0 = const 2\n'
+            'v1 = const 3\n'
+            'v2 = mul v0, v1\n'
+            'v3 = const 1\n'
+            'v4 = sub v3, v2\n'
+            'return v4'
+        )
+
+    def test_single_literal(self):
+        tree = ObjectTree()
+        ir = IRBuilder(tree).build(tree.intlit(7))
+
+        assert ir.instructions == [Quad(Quad.Op.CONST, 0, value=7)]
+        assert ir.result == 0
+
+    def test_arena(self):
+        arena = ASTArena()
+        ir = IRBuilder(arena).build(product(arena, 2, 3))
+
+        assert [quad.op for quad in ir.instructions] == [
+            Quad.Op.CONST, Quad.Op.CONST, Quad.Op.MUL,
+        ]
+
+    def test_unknown_operator(self):
+        node = ASTNode(op='mock')
+        with pytest.raises(CodeGenerationError) as e:
+            IRBuilder(ObjectTree()).build(node)
+
+        assert str(e.value) == 'Unknown AST operator mock'
+
+
+class TestLocalValueNumbering:
+    def test_repeated_subexpression(self):
+        tree = ObjectTree()
+        node = tree.binary(ASTNode.Type.A_ADD, product(tree, 2, 3), product(tree, 2, 3))
+        numbering = LocalValueNumbering()
+        ir = numbering.run(IRBuilder(tree).build(node))
+
+        assert str(ir) == (
+            'v0 = const 2\n'
+            'v1 = const 3\n'
+            'v2 = mul v0, v1\n'
+            'v6 = add v2, v2\n'
+            'return v6'
+        )
+        assert numbering.stats() == {'redundant values removed': 3}
+
+    def test_commutative(self):
+        tree = ObjectTree()
+        node = tree.binary(ASTNode.Type.A_SUBTRACT, product(tree, 2, 3), product(tree, 3, 2))
+        ir = LocalValueNumbering().run(IRBuilder(tree).build(node))
+
+        assert [quad.op for quad in ir.instructions].count(Quad.Op.MUL) == 1
+
+    def test_not_commutative(self):
+        tree = ObjectTree()
+        node = tree.binary(
+            ASTNode.Type.A_ADD,
+            tree.binary(ASTNode.Type.A_DIVIDE, tree.intlit(6), tree.intlit(2)),
+            tree.binary(ASTNode.Type.A_DIVIDE, tree.intlit(2), tree.intlit(6)),
+        )
+        ir = LocalValueNumbering().run(IRBuilder(tree).build(node))
+
+        assert [quad.op for quad in ir.instructions].count(Quad.Op.DIV) == 2
+
+    def test_renames_result(self):
+        ir = IR()
+        ir.emit(Quad.Op.CONST, value=1)
+        ir.result = ir.emit(Quad.Op.CONST, value=1)
+        ir = LocalValueNumbering().run(ir)
+
+        assert str(ir) == 'v0 = const 1\nreturn v0'
+
+
+class TestLowering:
+    def test_immediate_operand(self):
+        tree = ObjectTree()
+        node = tree.binary(ASTNode.Type.A_ADD, product(tree, 5, 7), tree.intlit(9))
+        asm, value = run(IRBuilder(tree).build(node))
+
+        assert asm.output.splitlines() == [
+            'mov x8, #5',
+            'mov x9, #7',
+            'mul x8, x8, x9',
+            'add x8, x8, #9',
+        ]
+        assert value == 44
+
+    def test_shared_value_is_copied(self):
+        tree = ObjectTree()
+        node = tree.binary(ASTNode.Type.A_MULTIPLY, product(tree, 5, 7), product(tree, 5, 7))
+        asm, value = run(LocalValueNumbering().run(IRBuilder(tree).build(node)))
+
+        assert asm.output.count('mul ') == 2
+        assert value == 35 * 35
+
+    def test_spills_under_pressure(self):
+        tree = ObjectTree()
+        node = balanced_tree(tree, 6)
+        with patch.object(DarwinARM64, 'accepts_immediate', return_value=False):
+            asm, value = run(IRBuilder(tree).build(node))
+
+        assert asm.frame.spills > 0
+        assert asm.frame.spills == asm.frame.reloads
+        assert value == ConstantFolding().run(tree, node).intvalue
+
+    @pytest.mark.parametrize('numbering', [False, True])
+    def test_random_trees(self, numbering):
+        rng = random.Random(3)
+        for _ in range(200):
+            tree = ObjectTree()
+            node = random_tree(rng, 7)
+            ir = IRBuilder(tree).build(node)
+            try:
+                expected = ConstantFolding().run(tree, node).intvalue
+            except OptimizationError:
+                continue
+            if numbering:
+                ir = LocalValueNumbering().run(ir)
+
+            assert run(ir)[1] == expected
+
+
+class TestGeneratorIR:
+    def test_stats(self):
+        tree = ObjectTree()
+        node = tree.binary(ASTNode.Type.A_ADD, product(tree, 2, 3), product(tree, 2, 3))
+        gen = CodeGenerator('Darwin', 'arm64', ir=True)
+        register = gen.generate(node, tree)
+
+        assert gen.stats()['ir instructions'] == 4
+        assert gen.stats()['redundant values removed'] == 3
+        assert ARM64Emulator().run(gen.assembly.output).value(register.name) == 12
@@ -0,0 +1,299 @@
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import main
+from puroboros.exceptions import CodeGenerationError
+
+
+def arguments(**options):
+    return argparse.Namespace(**{
+        'system': 'Darwin',
+        'arch': 'arm64',
+        'optimize': 0,
+        'output_format': 'asm',
+        'cache_dir': None,
+        'cache_size': 1 << 20,
+        'mmap': False,
+        'scanner': 'auto',
+        'arena': False,
+        'rebalance': False,
+        'intern': False,
+        'ir': False,
+        'peephole': False,
+        'schedule': False,
+        'dump_ir': False,
+        'stats': False,
+        **options,
+    })
+
+
+def single(tmp_path, source='2 + 3', **options):
+    infile = tmp_path / 'input.c'
+    infile.write_text(source)
+    return arguments(**{'file': str(infile), 'output': str(tmp_path / 'a.out'), **options})
+
+
+class TestGenerate:
+    def test_writes_output(self, tmp_path):
+        args = single(tmp_path)
+        main.generate(args)
+
+        with open(args.output) as outfile:
+            assert 'add x8, x8, #3' in outfile.read()
+
+    def test_failure_removes_output(self, tmp_path):
+        args = single(tmp_path, system='Plan9')
+        with open(args.output, 'w') as outfile:
+            outfile.write('previous build\n')
+
+        with pytest.raises(CodeGenerationError):
+            main.generate(args)
+
+        assert not (tmp_path / 'a.out').exists()
+
+    def test_failed_open_is_not_cleaned_up(self, tmp_path):
+        args = single(tmp_path, output=str(tmp_path / 'missing' / 'a.out'))
+
+        with pytest.raises(FileNotFoundError) as error:
+            main.generate(args)
+
+        # The open failed, so there was nothing to remove.
+        assert error.value.__context__ is None
+
+
+class TestCompile:
+    def test_hit_skips_generation(self, tmp_path):
+        args = single(tmp_path, cache_dir=str(tmp_path / 'cache'))
+        stats = main.compile(args)
+        output = (tmp_path / 'a.out').read_bytes()
+        (tmp_path / 'a.out').unlink()
+
+        assert stats['cache misses'] == 1
+        with patch('main.generate') as generate:
+            stats = main.compile(args)
+
+        generate.assert_not_called()
+        assert stats == {'cache hits': 1, 'cache misses': 0, 'cache evictions': 0}
+        assert (tmp_path / 'a.out').read_bytes() == output
+
+    @pytest.mark.parametrize('option,value', [
+        ('output_format', 'obj'),
+        ('rebalance', True),
+        ('intern', True),
+        ('ir', True),
+        ('peephole', True),
+        ('schedule', True),
+        ('optimize', 1),
+        ('system', 'Linux'),
+    ])
+    def test_options_are_part_of_key(self, tmp_path, option, value):
+        main.compile(single(tmp_path, cache_dir=str(tmp_path / 'cache')))
+        args = single(tmp_path, cache_dir=str(tmp_path / 'cache'), **{option: value})
+        with patch('main.generate', return_value={}) as generate:
+            main.compile(args)
+
+        generate.assert_called_once_with(args)
+
+    def test_misses_do_not_each_scan_the_cache(self, tmp_path):
+        with patch('puroboros.cache.os.scandir', wraps=os.scandir) as scandir:
+            for i in range(40):
+                main.compile(single(tmp_path, str(i), cache_dir=str(tmp_path / 'cache')))
+
+        # Every compile uses a fresh cache, like separate runs of the CLI.
+        assert scandir.call_count == 1
+
+    def test_dump_ir_bypasses_cache(self, tmp_path):
+        args = single(tmp_path, cache_dir=str(tmp_path / 'cache'), dump_ir=True)
+        with patch('main.generate', return_value={}) as generate:
+            main.compile(args)
+
+        generate.assert_called_once_with(args)
+        assert not (tmp_path / 'cache').exists()
+
+
+class TestExpand:
+    def test_patterns(self, tmp_path):
+        for name in ('b.c', 'a.c', 'c.s'):
+            (tmp_path / name).touch()
+
+        assert main.expand([str(tmp_path / '*.c')]) == [
+            str(tmp_path / 'a.c'),
+            str(tmp_path / 'b.c'),
+        ]
+
+    def test_unmatched_pattern_is_kept(self, tmp_path):
+        pattern = str(tmp_path / '*.c')
+
+        assert main.expand([pattern]) == [pattern]
+
+    def test_duplicates_are_dropped(self, tmp_path):
+        (tmp_path / 'a.c').touch()
+        path = str(tmp_path / 'a.c')
+
+        assert main.expand([path, str(tmp_path / '*.c'), path]) == [path]
+
+    def test_manifest(self, tmp_path):
+        (tmp_path / 'src').mkdir()
+        (tmp_path / 'src' / 'a.c').touch()
+        (tmp_path / 'b.c').touch()
+        manifest = tmp_path / 'inputs.txt'
+        manifest.write_text('# inputs\nsrc/*.c\n\n  b.c  \nmissing.c\n')
+
+        assert main.expand([str(tmp_path / 'b.c')], str(manifest)) == [
+            str(tmp_path / 'b.c'),
+            str(tmp_path / 'src' / 'a.c'),
+            str(tmp_path / 'missing.c'),
+        ]
+
+
+class TestOutputPath:
+    @pytest.mark.parametrize('output_format,expected', [
+        ('asm', 'src/a.s'),
+        ('obj', 'src/a.o'),
+        ('bin', 'src/a.bin'),
+    ])
+    def test_next_to_input(self, output_format, expected):
+        args = argparse.Namespace(output_format=output_format, output_dir=None)
+
+        assert main.output_path('src/a.c', args) == expected
+
+    def test_output_dir(self):
+        args = argparse.Namespace(output_format='asm', output_dir='build')
+
+        assert main.output_path('src/a.c', args) == 'build/a.s'
+
+
+class TestBatch:
+    def batch(self, tmp_path, sources, **options):
+        for name, source in sources.items():
+            (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / name).write_text(source)
+        args = arguments(**{
+            'file': [str(tmp_path / '**' / '*.c')],
+            'manifest': None,
+            'output_dir': None,
+            'jobs': 1,
+            **options,
+        })
+        return main.batch(args)
+
+    def test_compiles_every_input(self, tmp_path):
+        failed = self.batch(tmp_path, {'a.c': '1 + 2', 'b.c': '3 * 4'})
+
+        assert failed == 0
+        assert 'add x8, x8, #2' in (tmp_path / 'a.s').read_text()
+        assert 'lsl x8, x8, #2' in (tmp_path / 'b.s').read_text()
+
+    def test_reports_failures_per_file(self, tmp_path, capsys):
+        failed = self.batch(tmp_path, {'a.c': '1 + 2', 'bad.c': '1 +', 'c.c': '5'})
+
+        assert failed == 1
+        assert (tmp_path / 'a.s').exists()
+        assert (tmp_path / 'c.s').exists()
+        assert not (tmp_path / 'bad.s').exists()
+        assert capsys.readouterr().err.startswith(f'{tmp_path / "bad.c"}: ParserError')
+
+    @pytest.mark.parametrize('jobs', [1, 2])
+    def test_undecodable_input_fails_alone(self, tmp_path, capsys, jobs):
+        (tmp_path / 'latin1.c').write_bytes(b'1 + 2 \xe9\xff')
+        failed = self.batch(
+            tmp_path,
+            {'a.c': '1 + 2', 'bad.c': '1 +', 'c.c': '5'},
+            jobs=jobs,
+        )
+        errors = capsys.readouterr().err
+
+        assert failed == 2
+        assert (tmp_path / 'a.s').exists()
+        assert (tmp_path / 'c.s').exists()
+        assert f'{tmp_path / "bad.c"}: ParserError' in errors
+        assert f'{tmp_path / "latin1.c"}: ScannerError: Cannot decode input' in errors
+
+    def test_colliding_outputs_fail(self, tmp_path, capsys):
+        failed = self.batch(
+            tmp_path,
+            {'x/a.c': '1', 'y/a.c': '2', 'b.c': '3'},
+            output_dir=str(tmp_path / 'build'),
+        )
+
+        assert failed == 2
+        assert sorted(path.name for path in (tmp_path / 'build').iterdir()) == ['b.s']
+        assert capsys.readouterr().err.count('2 inputs would write') == 2
+
+    @pytest.mark.parametrize('output_format,name', [('asm', 'x.s'), ('obj', 'x.o')])
+    def test_output_overwriting_an_input_fails(self, tmp_path, capsys, output_format, name):
+        (tmp_path / name).write_text('1 + 2')
+        failed = self.batch(
+            tmp_path,
+            {'a.c': '3'},
+            file=[str(tmp_path / '*.*')],
+            output_format=output_format,
+        )
+
+        assert failed == 1
+        assert (tmp_path / name).read_text() == '1 + 2'
+        assert f'{tmp_path / name}: Output' in capsys.readouterr().err
+
+
+class TestCommandLine:
+    def run(self, *argv):
+        return subprocess.run(
+            [sys.executable, str(Path(main.__file__)), *argv],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+
+    def stats(self, tmp_path, source, *argv):
+        (tmp_path / 'input.c').write_text(source)
+        result = self.run(
+            str(tmp_path / 'input.c'),
+            '-o', str(tmp_path / 'a.s'),
+            '-s', 'Darwin',
+            '-a', 'arm64',
+            '--stats',
+            *argv,
+        )
+        assert result.returncode == 0, result.stderr
+        return dict(line.split(': ') for line in result.stderr.splitlines())
+
+    def test_peephole_without_folding(self, tmp_path):
+        stats = self.stats(tmp_path, '1 + 2 + 3', '--peephole')
+
+        assert stats['instructions before peephole'] == '6'
+        assert stats['instructions after peephole'] == '5'
+
+    def test_schedule_without_folding(self, tmp_path):
+        stats = self.stats(tmp_path, '2 + 3 * 5 - 8 / 3', '--schedule')
+
+        assert stats['estimated cycles before scheduling'] == '23'
+        assert stats['estimated cycles after scheduling'] == '17'
+
+    def test_compiles_do_not_import_the_server(self):
+        result = subprocess.run(
+            [sys.executable, '-c', 'import sys, main; print(sorted(sys.modules))'],
+            cwd=Path(main.__file__).parent,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+
+        assert 'asyncio' not in result.stdout
+        assert 'puroboros.server' not in result.stdout
+
+    @pytest.mark.parametrize('argv', [
+        ['--batch', '-j', '0', 'a.c'],
+        ['--batch', '-j', '-2', 'a.c'],
+        ['serve', '-j', '0'],
+    ])
+    def test_jobs_must_be_positive(self, argv):
+        result = self.run(*argv)
+
+        assert result.returncode == 2
+        assert '--jobs must be at least 1' in result.stderr
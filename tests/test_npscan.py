@@ -0,0 +1,71 @@
+from io import BytesIO, StringIO, TextIOWrapper
+from unittest.mock import patch
+
+import pytest
+
+from puroboros.context import Context
+from puroboros.defs import Token
+from puroboros.exceptions import ScannerError
+from puroboros.scan import Scanner
+
+pytest.importorskip('numpy')
+from puroboros.npscan import NumpyScanner  # noqa: E402
+
+
+def scan_all(scanner_class, source: bytes, **attrs):
+    context = Context()
+    context.buffer = source
+    scanner = scanner_class(context)
+    for name, value in attrs.items():
+        setattr(scanner, name, value)
+
+    tokens = []
+    try:
+        for token in scanner.tokens():
+            tokens.append((token, context.line))
+    except ScannerError as e:
+        tokens.append(str(e))
+    return tokens
+
+
+class TestNumpyScanner:
+    @pytest.mark.parametrize('source', [
+        b'',
+        b'1',
+        b'\n\n',
+        b'2 + 3 * 5 - 8 / 3',
+        b'13 -6+  4*\n5\n       +\n08 / 3',
+        b'12 34 + -56 * / - - 8 + * 2',
+        b'23 +\n18 -\n45.6 * 2\n/ 18',
+        b'23 * 456abcdefg',
+        '1 +\n\t2 \xe9'.encode(),
+        b'123456789012345678 + 1234567890123456789012345',
+        b'000 + 0012',
+    ])
+    @pytest.mark.parametrize('block_size', [NumpyScanner.BLOCK_SIZE, 1, 4])
+    def test_matches_regex_scanner(self, source, block_size):
+        expected = scan_all(Scanner, source)
+        tokens = scan_all(NumpyScanner, source, BLOCK_SIZE=block_size)
+
+        assert tokens == expected
+
+    def test_undecodable_input(self):
+        context = Context()
+        context.infile = TextIOWrapper(BytesIO(b'1 + \xff'), encoding='utf-8')
+
+        with pytest.raises(ScannerError):
+            list(NumpyScanner(context).tokens())
+
+    def test_text_input(self):
+        context = Context()
+        scanner = NumpyScanner(context)
+        with patch.object(context, 'infile', StringIO('1 +\n22')):
+            tokens = list(scanner.tokens())
+
+        assert tokens == [
+            Token(Token.Type.T_INTLIT, 1),
+            Token(Token.Type.T_PLUS),
+            Token(Token.Type.T_INTLIT, 22),
+            Token(Token.Type.T_EOF),
+        ]
+        assert context.line == 2
@@ -0,0 +1,139 @@
+import pytest
+
+from puroboros.defs import ASTNode
+from puroboros.exceptions import OptimizationError
+from puroboros.opt.fold import ConstantFolding, evaluate, wrap
+from puroboros.tree import ASTArena, ObjectTree
+
+
+INT64_MAX = (1 << 63) - 1
+INT64_MIN = -(1 << 63)
+
+
+class TestWrap:
+    @pytest.mark.parametrize('value,expected', [
+        (0, 0),
+        (-1, -1),
+        (INT64_MAX, INT64_MAX),
+        (INT64_MIN, INT64_MIN),
+        (INT64_MAX + 1, INT64_MIN),
+        (INT64_MIN - 1, INT64_MAX),
+        (1 << 64, 0),
+        ((1 << 64) + 5, 5),
+    ])
+    def test_wrap(self, value, expected):
+        assert wrap(value) == expected
+
+
+class TestEvaluate:
+    @pytest.mark.parametrize('op,left,right,expected', [
+        (ASTNode.Type.A_ADD, 2, 3, 5),
+        (ASTNode.Type.A_ADD, INT64_MAX, 1, INT64_MIN),
+        (ASTNode.Type.A_SUBTRACT, 2, 3, -1),
+        (ASTNode.Type.A_SUBTRACT, INT64_MIN, 1, INT64_MAX),
+        (ASTNode.Type.A_MULTIPLY, 6, 7, 42),
+        (ASTNode.Type.A_MULTIPLY, 1 << 32, 1 << 32, 0),
+        (ASTNode.Type.A_MULTIPLY, INT64_MAX, 2, -2),
+        (ASTNode.Type.A_DIVIDE, 7, 2, 3),
+        (ASTNode.Type.A_DIVIDE, -7, 2, -3),
+        (ASTNode.Type.A_DIVIDE, 7, -2, -3),
+        (ASTNode.Type.A_DIVIDE, -7, -2, 3),
+        (ASTNode.Type.A_DIVIDE, 1, 2, 0),
+        (ASTNode.Type.A_DIVIDE, INT64_MIN, -1, INT64_MIN),
+        (ASTNode.Type.A_DIVIDE, 1 << 64, 3, 0),
+    ])
+    def test_evaluate(self, op, left, right, expected):
+        assert evaluate(op, left, right) == expected
+
+    def test_division_by_zero(self):
+        with pytest.raises(OptimizationError) as e:
+            evaluate(ASTNode.Type.A_DIVIDE, 1, 0)
+
+        assert str(e.value) == 'Division by zero in constant expression'
+
+    def test_unknown_operator(self):
+        with pytest.raises(OptimizationError) as e:
+            evaluate(ASTNode.Type.A_INTLIT, 1, 0)
+
+        assert str(e.value) == ('Cannot evaluate AST operator '
+                                f'{ASTNode.Type.A_INTLIT}')
+
+
+class TestConstantFolding:
+    def test_intlit(self):
+        tree = ObjectTree()
+        node = tree.intlit(5)
+
+        assert ConstantFolding().run(tree, node) is node
+
+    def test_fold_expression(self):
+        """
+            -
+           / \\
+          +   /
+         / \\ / \\
+        2  * 8  3
+          / \\
+         3   5
+        """
+        tree = ObjectTree()
+        node = tree.binary(
+            ASTNode.Type.A_SUBTRACT,
+            tree.binary(
+                ASTNode.Type.A_ADD,
+                tree.intlit(2),
+                tree.binary(ASTNode.Type.A_MULTIPLY, tree.intlit(3), tree.intlit(5)),
+            ),
+            tree.binary(ASTNode.Type.A_DIVIDE, tree.intlit(8), tree.intlit(3)),
+        )
+
+        assert ConstantFolding().run(tree, node) == ASTNode(
+            op=ASTNode.Type.A_INTLIT,
+            intvalue=15,
+        )
+
+    def test_fold_arena(self):
+        arena = ASTArena()
+        node = arena.binary(
+            ASTNode.Type.A_MULTIPLY,
+            arena.intlit(INT64_MAX),
+            arena.binary(ASTNode.Type.A_ADD, arena.intlit(1), arena.intlit(1)),
+        )
+        folded = ConstantFolding().run(arena, node)
+
+        assert arena.op(folded) == ASTNode.Type.A_INTLIT
+        assert arena.intvalue(folded) == -2
+
+    def test_division_by_zero(self):
+        tree = ObjectTree()
+        node = tree.binary(
+            ASTNode.Type.A_DIVIDE,
+            tree.intlit(1),
+            tree.binary(ASTNode.Type.A_SUBTRACT, tree.intlit(2), tree.intlit(2)),
+        )
+
+        with pytest.raises(OptimizationError):
+            ConstantFolding().run(tree, node)
+
+    def test_keeps_unfoldable_subtrees(self):
+        tree = ObjectTree()
+        leaf = ASTNode(op='variable')
+        node = tree.binary(
+            ASTNode.Type.A_ADD,
+            leaf,
+            tree.binary(ASTNode.Type.A_ADD, tree.intlit(1), tree.intlit(2)),
+        )
+        folded = ConstantFolding().run(tree, node)
+
+        assert folded.left is leaf
+        assert folded.right == tree.intlit(3)
+
+    def test_deep_tree(self):
+        tree = ObjectTree()
+        node = tree.intlit(0)
+        for i in range(1, 10 ** 5):
+            node = tree.binary(ASTNode.Type.A_ADD, node, tree.intlit(i))
+
+        folded = ConstantFolding().run(tree, node)
+
+        assert folded.intvalue == sum(range(10 ** 5))
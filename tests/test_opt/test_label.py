@@ -0,0 +1,46 @@
+from puroboros.defs import ASTNode
+from puroboros.opt.label import registers_needed, sethi_ullman
+from puroboros.tree import ObjectTree
+
+
+def immediate_right(node, left, right):
+    if right.op == ASTNode.Type.A_INTLIT:
+        return left, right.intvalue
+    return None
+
+
+class TestSethiUllman:
+    def test_leaf(self):
+        tree = ObjectTree()
+
+        assert registers_needed(tree, tree.intlit(1)) == 1
+
+    def test_balanced(self):
+        tree = ObjectTree()
+        node = tree.binary(
+            ASTNode.Type.A_ADD,
+            tree.binary(ASTNode.Type.A_ADD, tree.intlit(1), tree.intlit(2)),
+            tree.binary(ASTNode.Type.A_ADD, tree.intlit(3), tree.intlit(4)),
+        )
+
+        assert registers_needed(tree, node) == 3
+
+    def test_immediate_leaf_needs_no_register(self):
+        tree = ObjectTree()
+        right = tree.intlit(2)
+        node = tree.binary(ASTNode.Type.A_ADD, tree.intlit(1), right)
+        labels = sethi_ullman(tree, node, immediate_right)
+
+        assert labels[tree.key(right)] == 0
+        assert labels[tree.key(node)] == 1
+
+    def test_immediate_leaves_in_balanced_tree(self):
+        tree = ObjectTree()
+        node = tree.binary(
+            ASTNode.Type.A_ADD,
+            tree.binary(ASTNode.Type.A_ADD, tree.intlit(1), tree.intlit(2)),
+            tree.binary(ASTNode.Type.A_ADD, tree.intlit(3), tree.intlit(4)),
+        )
+        labels = sethi_ullman(tree, node, immediate_right)
+
+        assert labels[tree.key(node)] == 2
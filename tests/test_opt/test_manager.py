@@ -0,0 +1,46 @@
+from unittest.mock import Mock
+
+from puroboros.defs import ASTNode
+from puroboros.opt.fold import ConstantFolding
+from puroboros.opt.manager import PassManager
+from puroboros.tree import ObjectTree
+
+
+class TestPassManager:
+    def test_run_in_order(self):
+        first = Mock()
+        second = Mock()
+        manager = PassManager([first, second])
+        tree = ObjectTree()
+
+        result = manager.run(tree, 'node')
+
+        first.run.assert_called_once_with(tree, 'node')
+        second.run.assert_called_once_with(tree, first.run.return_value)
+        assert result == second.run.return_value
+
+    def test_level_0(self):
+        tree = ObjectTree()
+        node = tree.binary(ASTNode.Type.A_ADD, tree.intlit(1), tree.intlit(2))
+
+        assert PassManager.for_level(0).passes == []
+        assert PassManager.for_level(0).run(tree, node) is node
+
+    def test_level_1(self):
+        tree = ObjectTree()
+        node = tree.binary(ASTNode.Type.A_ADD, tree.intlit(1), tree.intlit(2))
+        manager = PassManager.for_level(1)
+
+        assert [type(p) for p in manager.passes] == [ConstantFolding]
+        assert manager.run(tree, node) == tree.intlit(3)
+
+    def test_stats(self):
+        first = Mock()
+        first.stats.return_value = {'a': 1}
+        second = Mock()
+        second.stats.return_value = {'b': 2}
+
+        assert PassManager([first, second]).stats() == {'a': 1, 'b': 2}
+
+    def test_stats_default(self):
+        assert PassManager([ConstantFolding()]).stats() == {}
@@ -0,0 +1,126 @@
+import random
+
+import pytest
+
+from puroboros.defs import ASTNode
+from puroboros.exceptions import OptimizationError
+from puroboros.opt.fold import ConstantFolding
+from puroboros.opt.rebalance import Rebalance, depth
+from puroboros.tree import ASTArena, InterningObjectTree, ObjectTree
+from tests.emulator import run_generated
+from tests.test_gen import left_deep_chain, random_tree
+
+
+def chain(tree, op, values):
+    node = tree.intlit(values[0])
+    for value in values[1:]:
+        node = tree.binary(op, node, tree.intlit(value))
+    return node
+
+
+def leaves(tree, node):
+    values = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if tree.left(node) is None:
+            values.append(tree.intvalue(node))
+            continue
+        stack.append(tree.right(node))
+        stack.append(tree.left(node))
+    return values
+
+
+class TestDepth:
+    def test_leaf(self):
+        tree = ObjectTree()
+
+        assert depth(tree, tree.intlit(1)) == 1
+
+    def test_chain(self):
+        tree = ObjectTree()
+
+        assert depth(tree, left_deep_chain(tree, 10)) == 10
+
+
+@pytest.mark.parametrize('tree_class', [ObjectTree, ASTArena])
+class TestRebalance:
+    def test_balances_chain(self, tree_class):
+        tree = tree_class()
+        node = Rebalance().run(tree, left_deep_chain(tree, 8))
+
+        assert depth(tree, node) == 4
+        assert leaves(tree, node) == list(range(8))
+
+    def test_deep_chain(self, tree_class):
+        tree = tree_class()
+        node = Rebalance().run(tree, left_deep_chain(tree, 10 ** 5))
+
+        assert depth(tree, node) == 18
+        assert tree.intvalue(ConstantFolding().run(tree, node)) == sum(range(10 ** 5))
+
+    def test_keeps_non_associative_operators(self, tree_class):
+        tree = tree_class()
+        node = chain(tree, ASTNode.Type.A_SUBTRACT, list(range(8)))
+
+        assert Rebalance().run(tree, node) == node
+
+    def test_stops_at_other_operators(self, tree_class):
+        tree = tree_class()
+        product = chain(tree, ASTNode.Type.A_MULTIPLY, [2, 3, 4, 5])
+        node = tree.binary(
+            ASTNode.Type.A_ADD,
+            tree.binary(ASTNode.Type.A_ADD, tree.intlit(1), product),
+            tree.intlit(6),
+        )
+        assert depth(tree, node) == 6
+        node = Rebalance().run(tree, node)
+
+        # Only the product is reshaped; it stays below the sum.
+        assert depth(tree, node) == 5
+        assert tree.op(tree.right(tree.left(node))) == ASTNode.Type.A_MULTIPLY
+
+    def test_stats(self, tree_class):
+        tree = tree_class()
+        rebalance = Rebalance()
+        rebalance.run(tree, left_deep_chain(tree, 16))
+
+        assert rebalance.stats() == {
+            'tree depth before rebalancing': 16,
+            'tree depth after rebalancing': 5,
+            'registers needed before rebalancing': 2,
+            'registers needed after rebalancing': 5,
+        }
+
+
+class TestRebalanceSemantics:
+    def test_wraparound_multiplication(self):
+        tree = ObjectTree()
+        values = [2 ** 40 + 7, 3 ** 30, -12345, 2 ** 33 - 1, 99, 1 << 20]
+        node = chain(tree, ASTNode.Type.A_MULTIPLY, values)
+        expected = ConstantFolding().run(tree, node).intvalue
+        node = Rebalance().run(tree, node)
+
+        assert run_generated(node, tree)[1] == expected
+
+    def test_random_trees(self):
+        rng = random.Random(4)
+        for _ in range(200):
+            tree = ObjectTree()
+            node = random_tree(rng, 7)
+            try:
+                expected = ConstantFolding().run(tree, node).intvalue
+            except OptimizationError:
+                continue
+            node = Rebalance().run(tree, node)
+
+            assert run_generated(node, tree)[1] == expected
+
+    def test_dag(self):
+        tree = InterningObjectTree()
+        node = tree.intlit(1)
+        for _ in range(60):
+            node = tree.binary(ASTNode.Type.A_ADD, node, node)
+        node = Rebalance().run(tree, node)
+
+        assert ConstantFolding().run(tree, node).intvalue == 2 ** 60
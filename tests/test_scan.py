@@ -1,4 +1,4 @@
-from io import StringIO
+from io import BytesIO, StringIO, TextIOWrapper
 from unittest.mock import patch
 
 import pytest
@@ -6,7 +6,7 @@ import pytest
 from puroboros.context import Context
 from puroboros.defs import Token
 from puroboros.exceptions import ScannerError
-from puroboros.scan import Scanner
+from puroboros.scan import Scanner, ScannerFactory
 
 
 class TestScan:
@@ -51,3 +51,242 @@ class TestScan:
             scanner.scan()
 
         assert str(e.value) == 'Unrecognized character "#" on line 1'
+
+    def test_scan_counts_lines_in_whitespace_runs(self):
+        context = Context()
+        scanner = Scanner(context)
+        with patch.object(context, 'infile', StringIO(' \n\n 1 \n + \n')):
+            tokens = [scanner.scan() for _ in range(3)]
+
+        assert tokens == [
+            Token(Token.Type.T_INTLIT, 1),
+            Token(Token.Type.T_PLUS),
+            Token(Token.Type.T_EOF),
+        ]
+        assert context.line == 5
+
+    @patch.object(Scanner, 'CHUNK_SIZE', 2)
+    def test_scan_across_chunk_boundaries(self):
+        context = Context()
+        scanner = Scanner(context)
+        with patch.object(context, 'infile', StringIO('123 \n\n  + 45')):
+            tokens = [scanner.scan() for _ in range(4)]
+
+        assert tokens == [
+            Token(Token.Type.T_INTLIT, 123),
+            Token(Token.Type.T_PLUS),
+            Token(Token.Type.T_INTLIT, 45),
+            Token(Token.Type.T_EOF),
+        ]
+        assert context.line == 3
+
+    def test_scan_large_integer(self):
+        context = Context()
+        scanner = Scanner(context)
+        with patch.object(context, 'infile', StringIO('123456789012345678901234567890')):
+            token = scanner.scan()
+
+        assert token == Token(Token.Type.T_INTLIT, 123456789012345678901234567890)
+
+    def test_scan_after_eof(self):
+        context = Context()
+        scanner = Scanner(context)
+        with patch.object(context, 'infile', StringIO('1')):
+            tokens = [scanner.scan() for _ in range(3)]
+
+        assert tokens == [
+            Token(Token.Type.T_INTLIT, 1),
+            Token(Token.Type.T_EOF),
+            Token(Token.Type.T_EOF),
+        ]
+
+
+class TestTokens:
+    def test_tokens(self):
+        context = Context()
+        scanner = Scanner(context)
+        with patch.object(context, 'infile', StringIO('12 *\n3 - 4 / 5')):
+            tokens = list(scanner.tokens())
+
+        assert tokens == [
+            Token(Token.Type.T_INTLIT, 12),
+            Token(Token.Type.T_STAR),
+            Token(Token.Type.T_INTLIT, 3),
+            Token(Token.Type.T_MINUS),
+            Token(Token.Type.T_INTLIT, 4),
+            Token(Token.Type.T_SLASH),
+            Token(Token.Type.T_INTLIT, 5),
+            Token(Token.Type.T_EOF),
+        ]
+        assert context.line == 2
+
+    def test_tokens_stop_at_unrecognized_character(self):
+        context = Context()
+        scanner = Scanner(context)
+        tokens = []
+        with (
+            patch.object(context, 'infile', StringIO('1 +\n2a')),
+            pytest.raises(ScannerError) as e
+        ):
+            for token in scanner.tokens():
+                tokens.append(token)
+
+        assert tokens == [
+            Token(Token.Type.T_INTLIT, 1),
+            Token(Token.Type.T_PLUS),
+            Token(Token.Type.T_INTLIT, 2),
+        ]
+        assert str(e.value) == 'Unrecognized character "a" on line 2'
+
+    def test_undecodable_input(self):
+        context = Context()
+        context.infile = TextIOWrapper(BytesIO(b'1 + \xff'), encoding='utf-8')
+        scanner = Scanner(context)
+
+        with pytest.raises(ScannerError) as e:
+            list(scanner.tokens())
+
+        assert str(e.value).startswith('Cannot decode input as utf-8')
+
+
+class TestLookahead:
+    def test_peek(self):
+        context = Context()
+        scanner = Scanner(context)
+        with patch.object(context, 'infile', StringIO('1 +')):
+            peeked = scanner.peek()
+            scanned = scanner.scan()
+
+        assert peeked == scanned == Token(Token.Type.T_INTLIT, 1)
+
+    def test_putback(self):
+        context = Context()
+        scanner = Scanner(context)
+        with patch.object(context, 'infile', StringIO('1 + 2')):
+            first = scanner.scan()
+            second = scanner.scan()
+            scanner.putback(second)
+            scanner.putback(first)
+            tokens = [scanner.scan() for _ in range(4)]
+
+        assert tokens == [
+            Token(Token.Type.T_INTLIT, 1),
+            Token(Token.Type.T_PLUS),
+            Token(Token.Type.T_INTLIT, 2),
+            Token(Token.Type.T_EOF),
+        ]
+
+
+class TestBufferScan:
+    @pytest.mark.parametrize('source', [
+        '',
+        '1',
+        ' 12 +\n\n 3*4 \r\n/ 5 - 678\n',
+        '\n\n\t',
+    ])
+    @pytest.mark.parametrize('wrap', [bytes, bytearray, memoryview])
+    def test_tokens_match_text_path(self, source, wrap):
+        text_context = Context()
+        text_scanner = Scanner(text_context)
+        with patch.object(text_context, 'infile', StringIO(source)):
+            text_tokens = list(text_scanner.tokens())
+
+        buffer_context = Context()
+        buffer_context.buffer = wrap(source.encode())
+        buffer_tokens = list(Scanner(buffer_context).tokens())
+
+        assert buffer_tokens == text_tokens
+        assert buffer_context.line == text_context.line
+
+    @pytest.mark.parametrize('source,character', [
+        (b'1 +\n2 # 3', '#'),
+        ('1 +\n2 é'.encode(), 'é'),
+    ])
+    def test_raises_scanner_error(self, source, character):
+        context = Context()
+        context.buffer = source
+        scanner = Scanner(context)
+        with pytest.raises(ScannerError) as e:
+            list(scanner.tokens())
+
+        assert str(e.value) == (f'Unrecognized character "{character}"'
+                                f' on line 2')
+
+
+class TestScannerFactory:
+    def test_create_python(self):
+        context = Context()
+        context.buffer = b' ' * ScannerFactory.NUMPY_THRESHOLD
+
+        assert type(ScannerFactory.create(context, 'python')) is Scanner
+
+    def test_create_auto_small_input(self):
+        context = Context()
+        context.buffer = b'1 + 2'
+
+        assert type(ScannerFactory.create(context)) is Scanner
+
+    def test_create_auto_text_input(self):
+        context = Context()
+        context.infile = StringIO('1 + 2')
+
+        assert type(ScannerFactory.create(context)) is Scanner
+
+    def test_create_auto_large_input(self):
+        pytest.importorskip('numpy')
+        from puroboros.npscan import NumpyScanner
+
+        context = Context()
+        context.buffer = b' ' * ScannerFactory.NUMPY_THRESHOLD
+
+        assert type(ScannerFactory.create(context)) is NumpyScanner
+
+    def test_create_auto_large_file(self, tmp_path):
+        pytest.importorskip('numpy')
+        from puroboros.npscan import NumpyScanner
+
+        path = tmp_path / 'input'
+        path.write_text(' ' * ScannerFactory.NUMPY_THRESHOLD)
+        context = Context()
+        with open(path, 'rt') as infile:
+            context.infile = infile
+
+            assert type(ScannerFactory.create(context)) is NumpyScanner
+
+    def test_create_auto_large_file_without_numpy(self, tmp_path):
+        path = tmp_path / 'input'
+        path.write_text(' ' * ScannerFactory.NUMPY_THRESHOLD)
+        context = Context()
+        with open(path, 'rt') as infile, patch('puroboros.scan.find_spec', return_value=None):
+            context.infile = infile
+
+            assert type(ScannerFactory.create(context)) is Scanner
+
+    def test_create_unknown(self):
+        with pytest.raises(ScannerError) as e:
+            ScannerFactory.create(Context(), 'x')
+
+        assert str(e.value) == 'Unknown scanner backend x'
+
+
+class TestSharedTokens:
+    def test_operator_tokens_are_shared(self):
+        context = Context()
+        scanner = Scanner(context)
+        with patch.object(context, 'infile', StringIO('1 + 2 + 3')):
+            tokens = list(scanner.tokens())
+
+        assert tokens[1] is tokens[3] is Scanner.OPERATORS['T_PLUS']
+        assert tokens[-1] is Scanner.EOF
+
+    def test_eof_is_shared_after_end_of_input(self):
+        context = Context()
+        scanner = Scanner(context)
+        with patch.object(context, 'infile', StringIO('')):
+            tokens = [scanner.scan() for _ in range(2)]
+
+        assert tokens[0] is tokens[1] is Scanner.EOF
+
+    def test_tokens_are_immutable(self):
+        with pytest.raises(AttributeError):
+            Scanner.EOF.type = Token.Type.T_PLUS
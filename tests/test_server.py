@@ -0,0 +1,160 @@
+import asyncio
+import base64
+import contextlib
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from puroboros.client import Client
+from puroboros.server import CompileServer, compile_request
+
+
+TARGET = {'system': 'Darwin', 'arch': 'arm64'}
+
+
+class TestCompileRequest:
+    def test_assembly(self):
+        response = compile_request({'source': '2 + 3'}, 'Darwin', 'arm64')
+
+        assert response['output'].splitlines()[3:5] == ['mov x8, #2', 'add x8, x8, #3']
+
+    def test_request_overrides_target(self):
+        response = compile_request({'source': '2 + 3', **TARGET}, 'Linux', 'x86_64')
+
+        assert 'output' in response
+
+    def test_binary(self):
+        response = compile_request(
+            {'source': '2', 'output_format': 'bin', **TARGET}, None, None,
+        )
+
+        assert response['encoding'] == 'base64'
+        assert base64.b64decode(response['output'])[:4] == (0xd2800048).to_bytes(4, 'little')
+
+    @pytest.mark.parametrize('request_', [
+        '2 + 3',
+        {'text': '2 + 3'},
+        {'source': '2 + 3', 'optimize': '1'},
+        {'source': '2 + 3', 'optimize': True},
+        {'source': '2 + 3', 'optimize': 9},
+        {'source': '2 + 3', 'output': 'a.s'},
+        {'source': '2 + \ud800'},
+    ])
+    def test_invalid_request(self, request_):
+        response = compile_request(request_, 'Darwin', 'arm64')
+
+        assert response['error'].startswith('Invalid request')
+
+    def test_peephole(self):
+        plain = compile_request({'source': '1 + 2 + 3'}, 'Darwin', 'arm64')
+        optimized = compile_request({'source': '1 + 2 + 3', 'peephole': True}, 'Darwin', 'arm64')
+
+        assert 'add x8, x8, #5' in optimized['output']
+        assert len(optimized['output']) < len(plain['output'])
+
+    def test_schedule(self):
+        request = {'source': '2 + 3 * 5 - 8 / 3', **TARGET}
+        plain = compile_request(request, None, None)
+        scheduled = compile_request({**request, 'schedule': True}, None, None)
+
+        assert scheduled['output'] != plain['output']
+        assert sorted(scheduled['output'].splitlines()) == sorted(plain['output'].splitlines())
+
+    def test_compile_error(self):
+        response = compile_request({'source': '2 +'}, 'Darwin', 'arm64')
+
+        assert response == {'error': 'ParserError: Syntax error on line 1'}
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = CompileServer(str(tmp_path / 'server.sock'))
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    task = loop.create_task(server.serve(started.set))
+
+    def run():
+        with contextlib.suppress(asyncio.CancelledError):
+            loop.run_until_complete(task)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    started.wait(5)
+    yield server
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+    loop.close()
+    assert not os.path.exists(server.path)
+
+
+class TestCompileServer:
+    def test_requests_share_connection(self, server):
+        with Client(server.path) as client:
+            first = client.compile('1 + 2', **TARGET)
+            second = client.compile('1 +', **TARGET)
+
+        assert first['output'].startswith('.global _start\n')
+        assert second == {'error': 'ParserError: Syntax error on line 1'}
+        assert server.requests == 2
+
+    def test_invalid_json(self, server):
+        with Client(server.path) as client:
+            client.stream.write(b'{\n')
+            client.stream.flush()
+
+            assert b'Invalid request' in client.stream.readline()
+            assert 'output' in client.compile('1', **TARGET)
+
+    def test_lone_surrogate(self, server):
+        with Client(server.path) as client:
+            response = client.compile('1 + \ud800', **TARGET)
+
+            assert response['error'].startswith('Invalid request')
+            assert 'output' in client.compile('1', **TARGET)
+
+    def test_last_line_without_newline(self, server):
+        with Client(server.path) as client:
+            client.stream.write(b'{"source": "1", "system": "Darwin", "arch": "arm64"}')
+            client.stream.flush()
+            client.socket.shutdown(socket.SHUT_WR)
+
+            assert b'"output"' in client.stream.readline()
+
+    def test_concurrent_clients(self, server):
+        def work(value):
+            with Client(server.path) as client:
+                return [
+                    client.compile(f'{value} * {i}', **TARGET)['output']
+                    for i in range(10)
+                ]
+
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(work, range(4)))
+
+        assert all(len(outputs) == 10 for outputs in results)
+        assert server.requests == 40
+
+    def test_binary_output(self, server):
+        with Client(server.path) as client:
+            response = client.compile('1', output_format='obj', **TARGET)
+
+        assert response['output'][:4] == (0xfeedfacf).to_bytes(4, 'little')
+
+    def test_already_listening(self, server):
+        with pytest.raises(OSError):
+            asyncio.run(CompileServer(server.path).serve())
+
+
+class TestStaleSocket:
+    def test_removed(self, tmp_path):
+        path = str(tmp_path / 'server.sock')
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+        server = CompileServer(path)
+        server._remove_stale_socket()
+
+        assert not os.path.exists(path)
@@ -0,0 +1,192 @@
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+
+from puroboros.context import Context
+from puroboros.defs import ASTNode
+from puroboros.expr import Parser
+from puroboros.gen import CodeGenerator
+from puroboros.ir import IRBuilder
+from puroboros.opt.fold import ConstantFolding
+from puroboros.opt.label import registers_needed
+from puroboros.scan import Scanner
+from puroboros.tree import (
+    ASTArena,
+    InterningArena,
+    InterningObjectTree,
+    ObjectTree,
+    rebuild,
+)
+from tests.emulator import ARM64Emulator
+
+
+def parse(source, tree=None):
+    context = Context()
+    parser = Parser(Scanner(context), tree)
+    with patch.object(context, 'infile', StringIO(source)):
+        node, _ = parser.bin_expr()
+    return node
+
+
+class TestObjectTree:
+    def test_intlit(self):
+        tree = ObjectTree()
+        node = tree.intlit(5)
+
+        assert node == ASTNode(op=ASTNode.Type.A_INTLIT, intvalue=5)
+        assert tree.op(node) == ASTNode.Type.A_INTLIT
+        assert tree.intvalue(node) == 5
+        assert tree.left(node) is None
+        assert tree.right(node) is None
+
+    def test_binary(self):
+        tree = ObjectTree()
+        left, right = tree.intlit(1), tree.intlit(2)
+        node = tree.binary(ASTNode.Type.A_ADD, left, right)
+
+        assert tree.op(node) == ASTNode.Type.A_ADD
+        assert tree.left(node) is left
+        assert tree.right(node) is right
+        assert tree.key(node) != tree.key(left)
+
+
+class TestASTArena:
+    def test_intlit(self):
+        arena = ASTArena()
+        node = arena.intlit(5)
+
+        assert node == 0
+        assert len(arena) == 1
+        assert arena.op(node) == ASTNode.Type.A_INTLIT
+        assert arena.intvalue(node) == 5
+        assert arena.left(node) is None
+        assert arena.right(node) is None
+
+    def test_binary(self):
+        arena = ASTArena()
+        left, right = arena.intlit(1), arena.intlit(2)
+        node = arena.binary(ASTNode.Type.A_DIVIDE, left, right)
+
+        assert node == 2
+        assert arena.op(node) == ASTNode.Type.A_DIVIDE
+        assert arena.left(node) == 0
+        assert arena.right(node) == 1
+        assert arena.intvalue(node) is None
+        assert arena.key(node) == 2
+
+    @pytest.mark.parametrize('value', [2 ** 63, -2 ** 63 - 1, 10 ** 30])
+    def test_wide_intlit(self, value):
+        arena = ASTArena()
+        arena.intlit(1)
+        node = arena.intlit(value)
+
+        assert arena.intvalue(node) == value
+        assert arena.intvalue(0) == 1
+
+    def test_parse_into_arena(self):
+        source = '1 * 2 + 3 - 4 / 5 * 6'
+        arena = ASTArena()
+        node = parse(source, arena)
+
+        assert len(arena) == 11
+        assert rebuild(arena, node, ObjectTree()) == parse(source)
+
+
+class TestRebuild:
+    def test_rebuild_into_arena(self):
+        node = parse('1 + 2 * 3')
+        arena = ASTArena()
+        index = rebuild(ObjectTree(), node, arena)
+
+        assert arena.op(index) == ASTNode.Type.A_ADD
+        assert arena.intvalue(arena.left(index)) == 1
+        assert arena.op(arena.right(index)) == ASTNode.Type.A_MULTIPLY
+        assert rebuild(arena, index, ObjectTree()) == node
+
+    def test_rebuild_deep_tree(self):
+        tree = ObjectTree()
+        node = tree.intlit(0)
+        for i in range(1, 100000):
+            node = tree.binary(ASTNode.Type.A_ADD, node, tree.intlit(i))
+
+        arena = ASTArena()
+        index = rebuild(tree, node, arena)
+
+        assert len(arena) == 199999
+        assert arena.intvalue(arena.right(index)) == 99999
+
+
+def doubling_dag(tree, depth):
+    # 2**depth paths from the root; only depth + 1 distinct nodes.
+    node = tree.intlit(1)
+    for _ in range(depth):
+        node = tree.binary(ASTNode.Type.A_ADD, node, node)
+    return node
+
+
+@pytest.mark.parametrize('tree_class', [InterningObjectTree, InterningArena])
+class TestInterning:
+    def test_shares_literals(self, tree_class):
+        tree = tree_class()
+
+        assert tree.key(tree.intlit(5)) == tree.key(tree.intlit(5))
+        assert tree.key(tree.intlit(5)) != tree.key(tree.intlit(6))
+
+    def test_shares_binary_nodes(self, tree_class):
+        tree = tree_class()
+        first = tree.binary(ASTNode.Type.A_MULTIPLY, tree.intlit(2), tree.intlit(3))
+        second = tree.binary(ASTNode.Type.A_MULTIPLY, tree.intlit(2), tree.intlit(3))
+
+        assert tree.key(first) == tree.key(second)
+        assert tree.stats() == {'unique nodes': 3, 'shared nodes': 3}
+
+    def test_distinguishes_structure(self, tree_class):
+        tree = tree_class()
+        two, three = tree.intlit(2), tree.intlit(3)
+        nodes = {
+            tree.key(tree.binary(ASTNode.Type.A_MULTIPLY, two, three)),
+            tree.key(tree.binary(ASTNode.Type.A_MULTIPLY, three, two)),
+            tree.key(tree.binary(ASTNode.Type.A_ADD, two, three)),
+        }
+
+        assert len(nodes) == 3
+
+    def test_many_nodes(self, tree_class):
+        tree = tree_class()
+        values = [*range(-500, 500), 1 << 64, -(1 << 70)]
+        literals = [tree.key(tree.intlit(value)) for value in values]
+        chain = tree.intlit(0)
+        for value in values:
+            chain = tree.binary(ASTNode.Type.A_ADD, chain, tree.intlit(value))
+
+        assert [tree.key(tree.intlit(value)) for value in values] == literals
+        assert [tree.intvalue(tree.intlit(value)) for value in values] == values
+        assert tree.stats()['unique nodes'] == 2 * len(values)
+
+    def test_parse(self, tree_class):
+        tree = tree_class()
+        parse('2 * 3 + 2 * 3 + 2 * 3', tree)
+
+        assert tree.stats() == {'unique nodes': 5, 'shared nodes': 6}
+
+    def test_fold_dag(self, tree_class):
+        tree = tree_class()
+        node = ConstantFolding().run(tree, doubling_dag(tree, 100))
+
+        assert tree.intvalue(node) == 0
+
+    def test_label_dag(self, tree_class):
+        tree = tree_class()
+
+        assert registers_needed(tree, doubling_dag(tree, 100)) == 101
+
+    def test_generate_dag(self, tree_class):
+        tree = tree_class()
+        node = doubling_dag(tree, 40)
+        gen = CodeGenerator('Darwin', 'arm64', ir=True)
+        register = gen.generate(node, tree)
+
+        assert len(IRBuilder(tree).build(node).instructions) == 41
+        assert gen.assembly.output.count('add ') == 40
+        assert ARM64Emulator().run(gen.assembly.output).value(register.name) == 2 ** 40
@@ -1,14 +1,17 @@
 .global _start
 .align 4
 _start:
-mov x8, #2
-mov x9, #3
-mov x10, #5
-mul x9, x9, x10
-add x8, x8, x9
+mov x8, #3
+mov x9, #5
+mul x8, x8, x9
+add x8, x8, #2
 mov x9, #8
-mov x10, #3
-sdiv x9, x9, x10
+movz x16, #0x5556
+movk x16, #0x5555, lsl #16
+movk x16, #0x5555, lsl #32
+movk x16, #0x5555, lsl #48
+smulh x16, x9, x16
+add x9, x16, x16, lsr #63
 sub x8, x8, x9
 mov x0, #0
 mov x16, #1